@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark chi phí mỗi bước lấy mẫu: vòng lặp cũ (argsort + np.random.choice
++ inverse_transform 1x1) so với kernel dùng chung trong lottery_sampling.py
+"""
+
+import os
+import sys
+import time
+import numpy as np # type: ignore
+from sklearn.preprocessing import MinMaxScaler # type: ignore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lottery_sampling import temperature_softmax, sample_top_k, index_to_value
+
+def legacy_step(pred_row, scaler, temperature=3.0, top_k=10):
+    """Một bước lấy mẫu theo cách cũ, cho một chuỗi"""
+    pred_scaled = pred_row / temperature
+    pred_probs = np.exp(pred_scaled) / np.sum(np.exp(pred_scaled))
+    top_indices = np.argsort(pred_probs)[-top_k:][::-1]
+    top_probs = pred_probs[top_indices]
+    chosen_idx = np.random.choice(top_indices, p=top_probs/np.sum(top_probs))
+    return int(scaler.inverse_transform([[chosen_idx / 999.0]])[0][0])
+
+def kernel_step(pred, scaler, rng, temperature=3.0, top_k=10):
+    """Một bước lấy mẫu bằng kernel dùng chung, cho cả batch chuỗi"""
+    pred_probs = temperature_softmax(pred, temperature)
+    chosen = sample_top_k(pred_probs, top_k, rng)
+    return index_to_value(chosen, scaler, 999.0)
+
+def time_per_step(fn, steps):
+    """Thời gian trung bình mỗi bước (micro giây)"""
+    start = time.perf_counter()
+    for _ in range(steps):
+        fn()
+    return (time.perf_counter() - start) / steps * 1e6
+
+def run(chains=4, steps=2000):
+    """Chạy benchmark và trả về kết quả (micro giây mỗi bước cho toàn bộ chuỗi)"""
+    scaler = MinMaxScaler().fit(np.arange(1000).reshape(-1, 1))
+    rng = np.random.default_rng(0)
+    logits = rng.random((chains, 1000))
+    pred = logits / logits.sum(axis=1, keepdims=True)
+
+    legacy_us = time_per_step(lambda: [legacy_step(row, scaler) for row in pred], steps)
+    kernel_us = time_per_step(lambda: kernel_step(pred, scaler, rng), steps)
+
+    return {
+        "chains": chains,
+        "steps": steps,
+        "legacy_us_per_step": legacy_us,
+        "kernel_us_per_step": kernel_us,
+        "speedup": legacy_us / kernel_us,
+    }
+
+def main():
+    """Hàm chính"""
+    print("=== BENCHMARK KERNEL LẤY MẪU ===\n")
+    for chains in (1, 4, 64):
+        result = run(chains=chains)
+        print(f"Chuỗi: {chains:3d} | cũ: {result['legacy_us_per_step']:9.1f} µs/bước"
+              f" | kernel: {result['kernel_us_per_step']:8.1f} µs/bước"
+              f" | nhanh hơn: {result['speedup']:.1f}x")
+
+if __name__ == "__main__":
+    main()
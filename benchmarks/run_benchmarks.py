@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bộ benchmark cho các bước nặng của hệ thống, chạy trên dữ liệu tổng hợp
+với lịch sử gấp 1x-10.000x dữ liệu hiện tại
+
+    python benchmarks/run_benchmarks.py                       # scale 1, 10, 100
+    python benchmarks/run_benchmarks.py --scales 1 10 1000 10000 --heavy-max-scale 10
+    python benchmarks/run_benchmarks.py --save-baseline       # lưu làm baseline trên máy này
+
+Mỗi scale chạy trong một thư mục tạm riêng (các script dùng đường dẫn tương
+đối). Kết quả (giây mỗi bước, kèm thông tin máy) được ghi ra file JSON để
+thấy bước nào vỡ trước khi lịch sử tăng. Baseline phụ thuộc máy nên không
+được commit: chạy --save-baseline trước thay đổi rồi chạy lại sau thay đổi
+trên cùng máy để so sánh. Các bước tốn O(N) phép tính mạng nơ-ron
+(augmentation, một epoch) chỉ chạy đến --heavy-max-scale, các scale lớn hơn
+ghi là null.
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+from datetime import datetime, timedelta
+
+import numpy as np # type: ignore
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+BASELINE_FILE = os.path.join(REPO_DIR, "benchmarks", "baseline.json")
+DEFAULT_OUTPUT = "bench_output.json"
+SEQUENCE_LENGTH = 10
+BATCH_SIZE = 32
+
+# Bước chỉ chạy đến --heavy-max-scale
+HEAVY_STAGES = ("augmentation", "train_epoch")
+
+# Số ngày lịch sử kết quả trong results.json: README ghi một kết quả mỗi ngày,
+# không tăng theo số kết quả trong data-dacbiet.txt
+README_HISTORY_DAYS = 365
+
+def current_history_length():
+    """Số kết quả trong lịch sử thật (mốc cho scale 1x)"""
+    from draw_store import load_numbers
+    return len(load_numbers(os.path.join(REPO_DIR, "data-dacbiet.txt")))
+
+def generate_draws(count, seed=0):
+    """Dãy kết quả tổng hợp 000-999 (phân phối đều, uint16)"""
+    return np.random.default_rng(seed).integers(0, 1000, size=count, dtype=np.uint16)
+
+def write_dataset(directory, draws):
+    """Ghi data-dacbiet.txt (một số 3 chữ số mỗi dòng) và các file README cần
+    
+    Lịch sử theo ngày cho README giới hạn ở README_HISTORY_DAYS ngày gần nhất,
+    nên bước readme có cùng kích thước ở mọi scale.
+    """
+    with open(os.path.join(directory, "data-dacbiet.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(f"{n:03d}" for n in draws))
+        f.write("\n")
+
+    # Đầu vào của update_readme.py: dự đoán mới nhất và lịch sử kết quả theo ngày
+    today = datetime.now()
+    formatted = [f"{n:03d}" for n in generate_draws(255, seed=1)]
+    with open(os.path.join(directory, "data-predict.json"), "w", encoding="utf-8") as f:
+        json.dump({"date": today.strftime("%Y-%m-%d"), "formatted_numbers": formatted}, f)
+
+    results = [{
+        "date": (today - timedelta(days=i)).strftime("%Y-%m-%d"),
+        "special_number": f"{int(n):03d}",
+        "status": "trúng" if n % 4 == 0 else "trật",
+    } for i, n in enumerate(draws[:-README_HISTORY_DAYS - 1:-1])]
+    with open(os.path.join(directory, "results.json"), "w", encoding="utf-8") as f:
+        json.dump({"results": results}, f)
+
+    prize6 = [{
+        "date": r["date"],
+        "prize6_numbers": [r["special_number"]] * 3,
+        "trung": 0,
+    } for r in results]
+    with open(os.path.join(directory, "results-giai6.json"), "w", encoding="utf-8") as f:
+        json.dump({"results": prize6}, f)
+
+    shutil.copy(os.path.join(REPO_DIR, "README.md"), os.path.join(directory, "README.md"))
+
+def quiet():
+    """Ẩn output của các bước chuẩn bị không tính giờ"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+def timed(func, repeat=1):
+    """Thời gian nhỏ nhất (giây) qua `repeat` lần chạy, ẩn output của bước"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        with quiet():
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def run_scale(scale, base_count, heavy_max_scale, repeat=1):
+    """Chạy tất cả các bước cho một scale, trả về dict bước -> giây (None = bỏ qua)"""
+    from draw_store import store_path_for
+    from lottery_prediction_model import LotteryDataProcessor, LotteryLSTMModel
+    from lottery_dataset import make_training_dataset
+    from lottery_inference import LotterySession
+    import predict_255_unique_from_model
+    import update_readme
+    import check_models
+
+    count = base_count * scale
+    timings = {}
+    heavy = scale <= heavy_max_scale
+    workdir = tempfile.mkdtemp(prefix=f"3cang-bench-{scale}x-")
+    cwd = os.getcwd()
+
+    try:
+        os.chdir(workdir)
+        draws = generate_draws(count)
+        write_dataset(workdir, draws)
+
+        # Đọc dữ liệu: lần đầu phân tích file .txt và tạo kho .bin, các lần sau chỉ map file
+        processor = LotteryDataProcessor("data-dacbiet.txt")
+        timings["load_data_cold"], _ = timed(processor.load_data)
+        timings["load_data"], numbers = timed(processor.load_data, repeat)
+
+        normalized = processor.scaler.fit_transform(np.asarray(numbers).reshape(-1, 1)).flatten()
+        timings["create_sequences"], _ = timed(lambda: processor.create_sequences(normalized, SEQUENCE_LENGTH), repeat)
+        timings["prepare_raw_numbers_data"], _ = timed(
+            lambda: processor.prepare_raw_numbers_data(SEQUENCE_LENGTH, sparse_labels=True), repeat)
+        timings["prepare_sum_data"], _ = timed(
+            lambda: processor.prepare_sum_data(SEQUENCE_LENGTH, sparse_labels=True), repeat)
+        timings["prepare_counts_data"], _ = timed(
+            lambda: processor.prepare_counts_data(SEQUENCE_LENGTH, sparse_labels=True), repeat)
+
+        # Dữ liệu raw_numbers dùng cho augmentation, huấn luyện và dự đoán
+        with quiet():
+            _, y, scaler = processor.prepare_raw_numbers_data(SEQUENCE_LENGTH, sparse_labels=True)
+        indices = np.arange(len(y))
+
+        builder = LotteryLSTMModel((SEQUENCE_LENGTH, 1), 1000, "raw_numbers", sparse_labels=True)
+        builder.scaler = scaler
+        with quiet():
+            builder.build_model()
+
+        if heavy:
+            # Augmentation: một lượt qua pipeline tf.data (gather + nhiễu + xoay), không huấn luyện
+            def augmentation():
+                dataset = make_training_dataset(processor.series, y, indices, SEQUENCE_LENGTH,
+                                                batch_size=BATCH_SIZE, model_type="raw_numbers")
+                for _ in dataset:
+                    pass
+            timings["augmentation"], _ = timed(augmentation)
+
+            def train_epoch():
+                dataset = make_training_dataset(processor.series, y, indices, SEQUENCE_LENGTH,
+                                                batch_size=BATCH_SIZE, model_type="raw_numbers")
+                builder.model.fit(dataset, epochs=1, verbose=0)
+            timings["train_epoch"], _ = timed(train_epoch)
+        else:
+            for stage in HEAVY_STAGES:
+                timings[stage] = None
+
+        # Dự đoán 4 x 255 số (phiên dùng chung, hàm predict đã biên dịch)
+        session = LotterySession(builder.model, scaler)
+        recent = [int(n) for n in numbers[-SEQUENCE_LENGTH:]]
+        with quiet():
+            # Lần gọi đầu biên dịch hàm predict, không tính vào thời gian
+            predict_255_unique_from_model.predict_unique_numbers_batched(session, recent, num_chains=1, num_numbers=5)
+        timings["predict_255_unique_numbers"], _ = timed(
+            lambda: predict_255_unique_from_model.predict_unique_numbers_batched(session, recent, num_chains=4), repeat)
+        timings["predict_255_gumbel"], _ = timed(
+            lambda: predict_255_unique_from_model.predict_unique_numbers_gumbel(session, recent, num_chains=4), repeat)
+
+        # Sinh lại README (lịch sử kết quả cố định README_HISTORY_DAYS ngày)
+        timings["readme"], _ = timed(update_readme.main, repeat)
+
+        # check_models: lưu mô hình vào registry của thư mục tạm rồi kiểm tra
+        with quiet():
+            builder.save_model("lottery_model_raw_numbers_20000101_000000.keras")
+        timings["check_models"], _ = timed(check_models.main, repeat)
+
+        timings["draws"] = count
+        timings["data_file_mb"] = os.path.getsize("data-dacbiet.txt") / (1024 * 1024)
+        timings["store_file_mb"] = os.path.getsize(store_path_for("data-dacbiet.txt")) / (1024 * 1024)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return timings
+
+def machine_info():
+    """Thông tin máy để so sánh kết quả giữa các lần chạy"""
+    info = {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+    try:
+        import tensorflow as tf # type: ignore
+        info["tensorflow"] = tf.__version__
+    except ImportError:
+        info["tensorflow"] = None
+    try:
+        with open("/proc/meminfo", "r") as f:
+            info["memory_mb"] = int(f.readline().split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        info["memory_mb"] = None
+    return info
+
+def compare(results, baseline, threshold):
+    """Tỉ lệ hiện tại / baseline cho mỗi scale và bước (> threshold là chậm đi)"""
+    comparison = {}
+    for scale, timings in results.items():
+        base_timings = baseline.get("results", {}).get(scale, {})
+        for stage, seconds in timings.items():
+            base_seconds = base_timings.get(stage)
+            if stage in ("draws", "data_file_mb", "store_file_mb") or not seconds or not base_seconds:
+                continue
+            ratio = seconds / base_seconds
+            comparison.setdefault(scale, {})[stage] = {
+                "baseline": base_seconds,
+                "current": seconds,
+                "ratio": ratio,
+                "regression": ratio > threshold,
+            }
+    return comparison
+
+def print_table(results, comparison):
+    stages = [s for s in next(iter(results.values())) if s not in ("draws", "data_file_mb", "store_file_mb")]
+    scales = list(results)
+    print(f"\n{'Bước':<28}" + "".join(f"{scale + 'x':>14}" for scale in scales))
+    print("-" * (28 + 14 * len(scales)))
+    for stage in stages:
+        row = f"{stage:<28}"
+        for scale in scales:
+            seconds = results[scale][stage]
+            cell = "bỏ qua" if seconds is None else f"{seconds * 1000:.1f} ms"
+            if comparison.get(scale, {}).get(stage, {}).get("regression"):
+                cell = "⚠️ " + cell
+            row += f"{cell:>14}"
+        print(row)
+
+def main():
+    """Hàm chính"""
+    parser = argparse.ArgumentParser(description="Benchmark các bước của hệ thống 3cang")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100],
+                        help="Bội số so với lịch sử hiện tại (1-10000)")
+    parser.add_argument("--heavy-max-scale", type=int, default=10,
+                        help="Scale lớn nhất còn chạy augmentation và một epoch huấn luyện")
+    parser.add_argument("--repeat", type=int, default=1, help="Số lần lặp (lấy thời gian nhỏ nhất)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="File JSON kết quả")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="File baseline để so sánh")
+    parser.add_argument("--save-baseline", action="store_true", help="Lưu kết quả làm baseline mới")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Tỉ lệ chậm đi bị coi là regression")
+    args = parser.parse_args()
+
+    print("=== BENCHMARK HỆ THỐNG DỰ ĐOÁN 3 CÀNG ===\n")
+    base_count = current_history_length()
+    print(f"📊 Lịch sử hiện tại: {base_count} kết quả (scale 1x)")
+
+    results = {}
+    for scale in args.scales:
+        print(f"⏳ Scale {scale}x ({base_count * scale:,} kết quả)...")
+        results[str(scale)] = run_scale(scale, base_count, args.heavy_max_scale, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    comparison = compare(results, baseline, args.threshold)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": machine_info(),
+        "base_count": base_count,
+        "results": results,
+        "baseline_machine": baseline.get("machine"),
+        "comparison": comparison,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print_table(results, comparison)
+    print(f"\n💾 Đã lưu kết quả: {args.output}")
+
+    regressions = [(scale, stage) for scale, stages in comparison.items()
+                   for stage, entry in stages.items() if entry["regression"]]
+    if not baseline:
+        print("ℹ️  Chưa có baseline để so sánh (dùng --save-baseline)")
+    elif regressions:
+        print(f"⚠️  {len(regressions)} bước chậm hơn baseline quá {args.threshold}x:")
+        for scale, stage in regressions:
+            print(f"   {stage} @ {scale}x: {comparison[scale][stage]['ratio']:.2f}x")
+    else:
+        print("✅ Không có bước nào chậm hơn baseline")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"📌 Đã lưu baseline: {args.baseline}")
+
+if __name__ == "__main__":
+    main()
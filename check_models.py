@@ -5,19 +5,141 @@ Script kiểm tra và hiển thị thông tin về các mô hình đã huấn lu
 """
 
 import os
-import glob
-import numpy as np
-import tensorflow as tf
+import sys
+import json
+import hashlib
+import zipfile
+import numpy as np # type: ignore
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
-def get_model_info():
-    """Lấy thông tin về các mô hình đã huấn luyện"""
+from draw_store import open_store, is_valid_line
+from model_registry import ModelRegistry
+from feature_store import load_feature_store
+
+# Cache kết quả kiểm tra sâu (--deep) theo hash nội dung file mô hình
+DEEP_CHECK_CACHE = ".check-models-cache.json"
+
+def read_keras_archive(model_path):
+    """Đọc config.json và metadata.json trong file .keras (zip) mà không dựng mô hình"""
+    with zipfile.ZipFile(model_path) as archive:
+        config = json.loads(archive.read("config.json"))
+        metadata = json.loads(archive.read("metadata.json")) if "metadata.json" in archive.namelist() else {}
+    return config, metadata
+
+def _layer_params(layer):
+    """Số tham số (trainable, non-trainable) của một lớp tính từ config
+    
+    Dùng kích thước đầu vào trong build_config; trả về None với lớp không
+    hỗ trợ (khi đó tổng tham số được báo là không xác định).
+    """
+    class_name = layer["class_name"]
+    config = layer["config"]
+    input_shape = (layer.get("build_config") or {}).get("input_shape")
+    
+    if class_name in ("InputLayer", "GaussianNoise", "Dropout", "Flatten", "Reshape", "Activation"):
+        return 0, 0
+    if not input_shape:
+        return None
+    
+    if class_name == "DigitHead":
+        # Ba Dense(10); với chained, chữ số thứ hai/ba nhận thêm one-hot 10/20 chiều
+        chained = config.get("chained", False)
+        units = input_shape[0][-1] if chained else input_shape[-1]
+        return 3 * (units * 10 + 10) + (300 if chained else 0), 0
+    
+    input_dim = input_shape[-1]
+    bias = 1 if config.get("use_bias", True) else 0
+    if class_name == "LSTM":
+        units = config["units"]
+        return 4 * units * (input_dim + units + bias), 0
+    if class_name == "Dense":
+        units = config["units"]
+        return units * (input_dim + bias), 0
+    if class_name == "BatchNormalization":
+        trainable = input_dim * (int(config.get("center", True)) + int(config.get("scale", True)))
+        return trainable, 2 * input_dim
+    return None
+
+def summarize_keras_config(config):
+    """Kiến trúc và số tham số của mô hình từ config JSON"""
+    layers = config.get("config", {}).get("layers", [])
+    summary = {"architecture": [], "trainable_params": 0, "non_trainable_params": 0}
+    
+    for layer in layers:
+        class_name = layer["class_name"]
+        units = layer["config"].get("units")
+        if class_name not in ("InputLayer", "GaussianNoise", "Dropout"):
+            summary["architecture"].append(f"{class_name}({units})" if units else class_name)
+        
+        params = _layer_params(layer)
+        if params is None or summary["trainable_params"] is None:
+            summary["trainable_params"] = summary["non_trainable_params"] = None
+        else:
+            summary["trainable_params"] += params[0]
+            summary["non_trainable_params"] += params[1]
+    
+    input_layer = next((l for l in layers if l["class_name"] == "InputLayer"), None)
+    summary["input_shape"] = input_layer["config"].get("batch_shape") if input_layer else None
+    summary["loss"] = (config.get("compile_config") or {}).get("loss")
+    return summary
+
+def file_hash(path):
+    """sha256 nội dung file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _deep_check_worker(model_path):
+    """Tải đầy đủ mô hình trong tiến trình con (chỉ tiến trình con import TensorFlow)"""
+    try:
+        import tensorflow as tf # type: ignore
+        import digit_head # noqa: F401  (đăng ký lớp DigitHead cho load_model)
+        model = tf.keras.models.load_model(model_path)
+        return {"ok": True, "params": int(model.count_params())}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+def deep_check_models(model_paths, max_workers=None):
+    """Kiểm tra load đầy đủ các mô hình song song, có cache theo hash file
+    
+    File không đổi nội dung sẽ lấy kết quả từ cache, không tải lại.
+    Trả về dict đường dẫn -> kết quả.
+    """
+    try:
+        with open(DEEP_CHECK_CACHE, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    
+    hashes = {path: file_hash(path) for path in model_paths}
+    pending = [path for path in model_paths if hashes[path] not in cache]
+    
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for path, result in zip(pending, executor.map(_deep_check_worker, pending)):
+                cache[hashes[path]] = result
+        
+        tmp_path = f"{DEEP_CHECK_CACHE}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, DEEP_CHECK_CACHE)
+    
+    return {path: cache[hashes[path]] for path in model_paths}
+
+def get_model_info(deep=False):
+    """Lấy thông tin về các mô hình đã huấn luyện
+    
+    Mặc định chỉ đọc registry và config trong file .keras (không import
+    TensorFlow). deep=True tải đầy đủ từng mô hình trong process pool.
+    """
     print("=== KIỂM TRA MÔ HÌNH ĐÃ HUẤN LUYỆN ===\n")
     
-    # Tìm tất cả các file mô hình
-    keras_models = glob.glob("lottery_model_*.keras")
-    h5_models = glob.glob("lottery_model_*.h5")
-    all_models = keras_models + h5_models
+    # Các mô hình đã đăng ký, mới nhất trước
+    registry = ModelRegistry()
+    all_models = registry.entries()
     
     if not all_models:
         print("❌ Không tìm thấy mô hình nào đã huấn luyện!")
@@ -27,56 +149,82 @@ def get_model_info():
     print(f"✅ Tìm thấy {len(all_models)} mô hình:")
     print("-" * 80)
     
-    for i, model_path in enumerate(all_models, 1):
+    model_type_names = {
+        "raw_numbers": "Raw Numbers (000-999)",
+        "sum": "Sum (0-27)",
+        "counts": "Digit Counts (0-9)",
+    }
+    
+    deep_results = {}
+    if deep:
+        existing = [e["model_path"] for e in all_models if os.path.exists(e["model_path"])]
+        print(f"🔬 Kiểm tra sâu {len(existing)} mô hình (tải đầy đủ, có cache theo hash file)...")
+        deep_results = deep_check_models(existing)
+    
+    for i, entry in enumerate(all_models, 1):
+        model_path = entry["model_path"]
+        if not os.path.exists(model_path):
+            print(f"{i}. {os.path.basename(model_path)}")
+            print(f"   Trạng thái: ❌ File mô hình không còn tồn tại")
+            print("-" * 80)
+            continue
+        
         # Lấy thông tin file
         file_size = os.path.getsize(model_path) / (1024 * 1024)  # MB
-        mod_time = datetime.fromtimestamp(os.path.getmtime(model_path))
-        
-        # Xác định loại mô hình
-        if "raw_numbers" in model_path:
-            model_type = "Raw Numbers (000-999)"
-        elif "sum" in model_path:
-            model_type = "Sum (0-27)"
-        elif "counts" in model_path:
-            model_type = "Digit Counts (0-9)"
-        else:
-            model_type = "Unknown"
+        created_at = datetime.fromisoformat(entry["created_at"])
+        model_type = model_type_names.get(entry["model_type"], "Unknown")
         
-        # Kiểm tra scaler
-        base_path = model_path.replace('.keras', '').replace('.h5', '')
-        scaler_path = f"{base_path}_scaler.npy"
-        has_scaler = os.path.exists(scaler_path)
+        # Scaler đã được ghép sẵn trong registry
+        scaler_path = entry["scaler_path"]
+        has_scaler = bool(scaler_path) and os.path.exists(scaler_path)
         
         print(f"{i}. {os.path.basename(model_path)}")
         print(f"   Loại: {model_type}")
         print(f"   Kích thước: {file_size:.2f} MB")
-        print(f"   Ngày tạo: {mod_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"   Ngày tạo: {created_at.strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"   Scaler: {'✅ Có' if has_scaler else '❌ Không có'}")
+        if entry.get("val_loss") is not None:
+            print(f"   Validation: loss {entry['val_loss']:.4f}, accuracy {entry['val_accuracy']:.4f}")
+        
+        # Kiến trúc và số tham số đọc từ config JSON trong file .keras
+        if model_path.endswith('.keras'):
+            try:
+                config, archive_metadata = read_keras_archive(model_path)
+                summary = summarize_keras_config(config)
+                print(f"   Kiến trúc: {' → '.join(summary['architecture'])}")
+                print(f"   Input: {summary['input_shape']}, loss: {summary['loss']}")
+                if summary["trainable_params"] is not None:
+                    total_params = summary["trainable_params"] + summary["non_trainable_params"]
+                    print(f"   Tham số: {total_params:,} (trainable {summary['trainable_params']:,})")
+                print(f"   Keras: {archive_metadata.get('keras_version', '?')}")
+                print(f"   Trạng thái: ✅ Config hợp lệ")
+            except Exception as e:
+                print(f"   Trạng thái: ❌ Lỗi đọc config: {str(e)}")
         
-        # Kiểm tra mô hình có load được không
-        try:
-            model = tf.keras.models.load_model(model_path)
-            model.summary()
-            print(f"   Trạng thái: ✅ Load thành công")
-        except Exception as e:
-            print(f"   Trạng thái: ❌ Lỗi load: {str(e)}")
+        # Kết quả tải đầy đủ (chỉ với --deep)
+        if model_path in deep_results:
+            result = deep_results[model_path]
+            if result["ok"]:
+                print(f"   Load đầy đủ: ✅ Thành công ({result['params']:,} tham số)")
+            else:
+                print(f"   Load đầy đủ: ❌ Lỗi load: {result['error']}")
         
         print("-" * 80)
     
     # Thống kê
     print("\n📊 THỐNG KÊ:")
     print(f"Tổng số mô hình: {len(all_models)}")
-    print(f"Mô hình .keras: {len(keras_models)}")
-    print(f"Mô hình .h5: {len(h5_models)}")
+    print(f"Mô hình .keras: {sum(e['model_path'].endswith('.keras') for e in all_models)}")
+    print(f"Mô hình .h5: {sum(e['model_path'].endswith('.h5') for e in all_models)}")
     
     # Kiểm tra scaler
-    scalers = glob.glob("lottery_model_*_scaler.npy")
+    scalers = [e for e in all_models if e["scaler_path"] and os.path.exists(e["scaler_path"])]
     print(f"Scaler có sẵn: {len(scalers)}")
     
     # Mô hình mới nhất
-    if all_models:
-        latest_model = max(all_models, key=os.path.getmtime)
-        print(f"Mô hình mới nhất: {os.path.basename(latest_model)}")
+    latest_model = registry.latest()
+    if latest_model:
+        print(f"Mô hình mới nhất: {os.path.basename(latest_model['model_path'])}")
 
 def check_data_file():
     """Kiểm tra file dữ liệu"""
@@ -87,48 +235,64 @@ def check_data_file():
         print(f"❌ Không tìm thấy file dữ liệu: {data_file}")
         return
     
-    # Đọc và phân tích dữ liệu
-    with open(data_file, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    # Lọc dữ liệu hợp lệ
-    valid_numbers = []
-    invalid_lines = []
-    
-    for i, line in enumerate(lines, 1):
-        line = line.strip()
-        if line.isdigit() and len(line) == 3:
-            valid_numbers.append(int(line))
-        elif line:  # Bỏ qua dòng trống
-            invalid_lines.append((i, line))
+    # Đọc từ kho nhị phân đi kèm (tự tạo lại nếu lệch với file .txt)
+    store = open_store(data_file)
+    header = store.read_header()
+    valid_numbers = store.numbers()
     
     print(f"✅ File dữ liệu: {data_file}")
-    print(f"Tổng số dòng: {len(lines)}")
-    print(f"Số hợp lệ: {len(valid_numbers)}")
-    print(f"Số không hợp lệ: {len(invalid_lines)}")
+    print(f"Kho nhị phân: {store.path}")
+    print(f"Checksum: {'✅ Hợp lệ' if store.verify() else '❌ Không khớp'}")
+    print(f"Tổng số dòng: {header['total_lines']}")
+    print(f"Số hợp lệ: {header['count']}")
+    print(f"Số không hợp lệ: {header['invalid_lines']}")
     
-    if valid_numbers:
-        print(f"Phạm vi số: {min(valid_numbers):03d} - {max(valid_numbers):03d}")
-        print(f"10 số gần nhất: {valid_numbers[-10:]}")
+    if len(valid_numbers):
+        print(f"Phạm vi số: {int(valid_numbers.min()):03d} - {int(valid_numbers.max()):03d}")
+        print(f"10 số gần nhất: {valid_numbers[-10:].tolist()}")
+        
+        # Thống kê đọc từ kho đặc trưng (chỉ tính thêm cho kết quả mới)
+        features = load_feature_store(data_file)
+        gaps = features.gaps()
+        longest = np.argsort(-gaps, kind="stable")[:5]
+        print(f"Lâu chưa về nhất: " + ", ".join(
+            f"{n:03d} ({'chưa về lần nào' if features.last_seen[n] < 0 else f'{gaps[n]} kỳ'})" for n in longest))
+        window = features.windows[1]
+        frequent = np.argsort(-features.rolling_counts[1], kind="stable")[:5]
+        print(f"Về nhiều nhất {window} kỳ gần đây: " +
+              ", ".join(f"{n:03d} ({features.rolling_counts[1][n]} lần)" for n in frequent))
+        position_freq = features.digit_position_frequencies()
+        for position, name in enumerate(("trăm", "chục", "đơn vị")):
+            top_digit = int(np.argmax(position_freq[position]))
+            print(f"Chữ số hàng {name} hay về nhất: {top_digit} ({position_freq[position][top_digit]:.1%})")
     
-    if invalid_lines:
+    if header['invalid_lines']:
+        # Chỉ đọc lại file .txt khi cần hiển thị chi tiết dòng lỗi
+        invalid_lines = []
+        with open(data_file, 'r', encoding='utf-8') as f:
+            for i, line in enumerate(f, 1):
+                if line.strip() and not is_valid_line(line):
+                    invalid_lines.append((i, line.strip()))
+                    if len(invalid_lines) == 5:
+                        break
+        
         print(f"\n⚠️  Các dòng không hợp lệ (5 dòng đầu):")
-        for i, (line_num, content) in enumerate(invalid_lines[:5]):
+        for line_num, content in invalid_lines:
             print(f"   Dòng {line_num}: '{content}'")
 
-def main():
-    """Hàm chính"""
+def main(deep=False):
+    """Hàm chính (deep=True: tải đầy đủ từng mô hình)"""
     print("🔍 KIỂM TRA HỆ THỐNG DỰ ĐOÁN XỔ SỐ\n")
     
-    # Kiểm tra mô hình
-    get_model_info()
+    # Kiểm tra mô hình (--deep: tải đầy đủ từng mô hình)
+    get_model_info(deep=deep)
     
     # Kiểm tra dữ liệu
     check_data_file()
     
     print("\n" + "="*80)
     print("🎯 HƯỚNG DẪN TIẾP THEO:")
-    if not glob.glob("lottery_model_*"):
+    if not ModelRegistry().entries():
         print("1. Chạy: python lottery_prediction_model.py")
         print("2. Chờ huấn luyện hoàn tất")
         print("3. Chạy: python predict_lottery.py")
@@ -138,4 +302,4 @@ def main():
     print("="*80)
 
 if __name__ == "__main__":
-    main()
+    main(deep="--deep" in sys.argv)
@@ -5,84 +5,71 @@ Script dọn dẹp các model cũ và scaler
 """
 
 import os
-import glob
 from datetime import datetime
 
+from model_registry import ModelRegistry
+
 def cleanup_old_models(model_type=None, keep_latest=True):
-    """Xóa các model cũ, chỉ giữ lại model mới nhất"""
+    """Xóa các model cũ, chỉ giữ lại model mới nhất (theo registry)"""
     print("=== DỌN DẸP MODEL CŨ ===\n")
     
     try:
+        registry = ModelRegistry()
         if model_type:
             # Dọn dẹp model cụ thể
-            model_pattern = f"lottery_model_{model_type}_*.keras"
-            scaler_pattern = f"lottery_model_{model_type}_*_scaler.npy"
             print(f"🧹 Đang dọn dẹp model {model_type}...")
         else:
             # Dọn dẹp tất cả model
-            model_pattern = "lottery_model_*.keras"
-            scaler_pattern = "*_scaler.npy"
             print("🧹 Đang dọn dẹp tất cả model...")
         
-        # Tìm tất cả file model và scaler
-        model_files = glob.glob(model_pattern)
-        scaler_files = glob.glob(scaler_pattern)
+        # Các mục trong registry, mới nhất trước (scaler/metadata đã ghép sẵn)
+        entries = registry.entries(model_type)
         
-        print(f"📁 Tìm thấy {len(model_files)} file model và {len(scaler_files)} file scaler")
+        print(f"📁 Tìm thấy {len(entries)} model trong registry")
         
-        if len(model_files) == 0:
+        if len(entries) == 0:
             print("✅ Không có model nào để dọn dẹp")
             return
         
-        if len(model_files) <= 1 and keep_latest:
+        if len(entries) <= 1 and keep_latest:
             print("✅ Chỉ có 1 model, không cần dọn dẹp")
             return
         
-        # Sắp xếp theo thời gian tạo (mới nhất trước)
-        model_files.sort(key=os.path.getmtime, reverse=True)
-        scaler_files.sort(key=os.path.getmtime, reverse=True)
-        
-        # Hiển thị danh sách file
-        print(f"\n📋 Danh sách file model:")
-        for i, file_path in enumerate(model_files):
-            file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-            status = "🆕 MỚI NHẤT" if i == 0 else "🗑️  SẼ XÓA"
-            print(f"  {i+1}. {os.path.basename(file_path)} - {file_time.strftime('%Y-%m-%d %H:%M:%S')} {status}")
-        
-        print(f"\n📋 Danh sách file scaler:")
-        for i, file_path in enumerate(scaler_files):
-            file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-            status = "🆕 MỚI NHẤT" if i == 0 else "🗑️  SẼ XÓA"
-            print(f"  {i+1}. {os.path.basename(file_path)} - {file_time.strftime('%Y-%m-%d %H:%M:%S')} {status}")
+        # Hiển thị danh sách model
+        print(f"\n📋 Danh sách model:")
+        for i, entry in enumerate(entries):
+            created_at = datetime.fromisoformat(entry["created_at"])
+            status = "🆕 MỚI NHẤT" if i == 0 and keep_latest else "🗑️  SẼ XÓA"
+            scaler_name = os.path.basename(entry["scaler_path"]) if entry["scaler_path"] else "không có scaler"
+            print(f"  {i+1}. {os.path.basename(entry['model_path'])} ({scaler_name}) - "
+                  f"{created_at.strftime('%Y-%m-%d %H:%M:%S')} {status}")
         
         # Xác nhận xóa
         if keep_latest:
-            files_to_delete = model_files[1:] + scaler_files[1:]
-            print(f"\n⚠️  Sẽ xóa {len(files_to_delete)} file cũ (giữ lại file mới nhất)")
+            entries_to_delete = entries[1:]
+            print(f"\n⚠️  Sẽ xóa {len(entries_to_delete)} model cũ (giữ lại model mới nhất)")
         else:
-            files_to_delete = model_files + scaler_files
-            print(f"\n⚠️  Sẽ xóa TẤT CẢ {len(files_to_delete)} file")
+            entries_to_delete = entries
+            print(f"\n⚠️  Sẽ xóa TẤT CẢ {len(entries_to_delete)} model")
         
-        if len(files_to_delete) == 0:
+        if len(entries_to_delete) == 0:
             print("✅ Không có file nào để xóa")
             return
         
-        # Xóa các file
+        # Xóa mô hình cùng scaler và metadata đi kèm
         deleted_count = 0
-        for file_path in files_to_delete:
+        for entry in entries_to_delete:
             try:
-                os.remove(file_path)
-                print(f"🗑️  Đã xóa: {os.path.basename(file_path)}")
-                deleted_count += 1
+                for file_path in registry.remove(entry["model_path"]):
+                    print(f"🗑️  Đã xóa: {os.path.basename(file_path)}")
+                    deleted_count += 1
             except Exception as e:
-                print(f"❌ Không thể xóa {os.path.basename(file_path)}: {str(e)}")
+                print(f"❌ Không thể xóa {os.path.basename(entry['model_path'])}: {str(e)}")
         
         print(f"\n✅ Đã xóa {deleted_count} file cũ")
         
-        # Hiển thị file còn lại
-        remaining_models = glob.glob(model_pattern)
-        remaining_scalers = glob.glob(scaler_pattern)
-        print(f"📁 Còn lại {len(remaining_models)} model và {len(remaining_scalers)} scaler")
+        # Hiển thị model còn lại
+        print(f"📁 Còn lại {len(registry.entries(model_type))} model")
         
     except Exception as e:
         print(f"❌ Lỗi khi dọn dẹp model cũ: {str(e)}")
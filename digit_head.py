@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Đầu ra phân rã theo chữ số cho mô hình raw_numbers
+
+Thay cho Dense(1000, softmax), DigitHead dự đoán ba chữ số (trăm, chục, đơn
+vị) bằng ba softmax 10 lớp, huấn luyện với ba loss sparse. Với chained=True,
+chữ số thứ hai dựa thêm vào chữ số thứ nhất và chữ số thứ ba dựa vào hai chữ
+số trước (teacher forcing khi huấn luyện), nên tổng ba loss đúng bằng
+-log P(số) của phân phối kết hợp.
+
+Khi suy luận có hai cách:
+- joint(): ghép lại phân phối 1000 lớp (chỉ số = trăm * 100 + chục * 10 +
+  đơn vị) để dùng chung mọi bộ lấy mẫu hiện có
+- DigitSampler: lấy mẫu lần lượt từng chữ số, mỗi bước O(30) thay vì O(1000)
+"""
+
+import numpy as np # type: ignore
+import tensorflow as tf # type: ignore
+from tensorflow import keras # type: ignore
+from tensorflow.keras import layers # type: ignore
+
+from lottery_sampling import sample_top_k
+
+HEADS = ("softmax", "digits", "digits_chained")
+OUTPUT_NAMES = ("digit_0", "digit_1", "digit_2")
+
+@keras.utils.register_keras_serializable(package="lottery")
+class DigitHead(layers.Layer):
+    """Ba softmax 10 lớp cho ba chữ số, tùy chọn nối chuỗi (chained)"""
+
+    def __init__(self, chained=False, **kwargs):
+        super().__init__(**kwargs)
+        self.chained = chained
+        self.digit_layers = [layers.Dense(10, name=name) for name in OUTPUT_NAMES]
+
+    def build(self, input_shape):
+        units = input_shape[0][-1] if self.chained else input_shape[-1]
+        for position, layer in enumerate(self.digit_layers):
+            # Chữ số thứ i nhận thêm one-hot của i chữ số trước khi chained
+            layer.build((None, units + (10 * position if self.chained else 0)))
+
+    def _inputs(self, h, previous):
+        """Đầu vào của từng đầu chữ số: h, [h, one-hot d0], [h, one-hot d0, one-hot d1]"""
+        if not self.chained:
+            return [h, h, h]
+        one_hot = [tf.one_hot(previous[..., i], 10, dtype=h.dtype) for i in range(2)]
+        return [h, tf.concat([h, one_hot[0]], -1), tf.concat([h, one_hot[0], one_hot[1]], -1)]
+
+    def call(self, inputs):
+        """Huấn luyện: inputs là h hoặc [h, hai chữ số đầu thật]; trả về ba vector xác suất"""
+        h, previous = (inputs[0], tf.cast(inputs[1], tf.int32)) if self.chained else (inputs, None)
+        return tuple(tf.nn.softmax(layer(x))
+                     for layer, x in zip(self.digit_layers, self._inputs(h, previous)))
+
+    def joint(self, h):
+        """Phân phối kết hợp 1000 lớp từ h dạng (batch, units)"""
+        batch = tf.shape(h)[0]
+        p0 = tf.nn.softmax(self.digit_layers[0](h))
+        if not self.chained:
+            p1 = tf.nn.softmax(self.digit_layers[1](h))
+            p2 = tf.nn.softmax(self.digit_layers[2](h))
+            joint = p0[:, :, None, None] * p1[:, None, :, None] * p2[:, None, None, :]
+        else:
+            # Xác suất có điều kiện cho mọi chữ số trước: 10 tổ hợp cho d1, 100 cho d2
+            eye = tf.eye(10, dtype=h.dtype)
+            h10 = tf.repeat(h[:, None, :], 10, axis=1)
+            in1 = tf.concat([h10, tf.broadcast_to(eye, (batch, 10, 10))], -1)
+            p1 = tf.nn.softmax(self.digit_layers[1](in1))
+            prefixes = tf.concat([tf.repeat(eye, 10, axis=0), tf.tile(eye, (10, 1))], -1)
+            h100 = tf.repeat(h[:, None, :], 100, axis=1)
+            in2 = tf.concat([h100, tf.broadcast_to(prefixes, (batch, 100, 20))], -1)
+            p2 = tf.reshape(tf.nn.softmax(self.digit_layers[2](in2)), (batch, 10, 10, 10))
+            joint = p0[:, :, None, None] * p1[:, :, :, None] * p2
+        return tf.reshape(joint, (batch, 1000))
+
+    def get_config(self):
+        config = super().get_config()
+        config["chained"] = self.chained
+        return config
+
+def find_digit_head(model):
+    """Lớp DigitHead của mô hình (None nếu là mô hình softmax 1000 lớp)"""
+    for layer in model.layers:
+        if isinstance(layer, DigitHead):
+            return layer
+    return None
+
+def window_input(model):
+    """Đầu vào cửa sổ (batch, thời gian, features) của mô hình"""
+    return model.inputs[0]
+
+def trunk_model(model):
+    """Mô hình con từ cửa sổ đến đầu vào h của DigitHead"""
+    head = find_digit_head(model)
+    h = head.input[0] if head.chained else head.input
+    return keras.Model(window_input(model), h)
+
+def joint_predict_fn(model):
+    """Hàm đã biên dịch: cửa sổ -> phân phối 1000 lớp, cho cả hai loại đầu ra"""
+    head = find_digit_head(model)
+    if head is None:
+        return tf.function(lambda x: model(x, training=False), reduce_retracing=True)
+    trunk = trunk_model(model)
+    return tf.function(lambda x: head.joint(trunk(x, training=False)), reduce_retracing=True)
+
+def split_digits(labels):
+    """Chỉ số lớp 0-999 -> ba chữ số (tensor), dùng để tạo nhãn huấn luyện"""
+    labels = tf.cast(labels, tf.int32)
+    return labels // 100, labels // 10 % 10, labels % 10
+
+class DigitSampler:
+    """Lấy mẫu lần lượt từng chữ số bằng NumPy từ trọng số của DigitHead
+
+    Mỗi bước chỉ tính ba tích (units x 10) và chọn trong 10 lớp mỗi chữ
+    số. Với mask (dạng (batch, 1000), True = số đã dùng), chữ số bị loại khi
+    mọi số bắt đầu bằng tiền tố đó đã dùng, nên kết quả luôn là số chưa dùng.
+    """
+
+    def __init__(self, head):
+        self.chained = head.chained
+        self.weights = [(layer.kernel.numpy(), layer.bias.numpy()) for layer in head.digit_layers]
+
+    def _probs(self, position, h, prefix, temperature=1.0):
+        """Xác suất của chữ số thứ `position` với temperature trên logit (p^(1/T) chuẩn hóa)"""
+        kernel, bias = self.weights[position]
+        x = h
+        if self.chained and position:
+            x = np.concatenate([h] + [np.eye(10)[prefix[:, i]] for i in range(position)], axis=-1)
+        logits = (x @ kernel + bias) / temperature
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        probs = np.exp(logits)
+        return probs / probs.sum(axis=-1, keepdims=True)
+
+    def sample(self, h, temperature, top_k, rngs, mask=None):
+        """Một số (chỉ số 0-999) cho mỗi hàng của h; rngs là một Generator mỗi hàng
+
+        top_k áp dụng cho từng chữ số (trong 10 lớp), nên nên nhỏ (2-3); với
+        top_k >= 10 bộ lọc không còn tác dụng.
+        """
+        h = np.asarray(h, dtype=np.float64)
+        batch = len(h)
+        prefix = np.zeros((batch, 3), dtype=np.int64)
+        rows = np.arange(batch)
+        if mask is not None:
+            used = np.asarray(mask).reshape(batch, 10, 10, 10)
+        for position in range(3):
+            position_mask = None
+            if mask is not None:
+                # Chữ số bị loại khi mọi số có tiền tố tương ứng đều đã dùng
+                if position == 0:
+                    position_mask = used.all(axis=(2, 3))
+                elif position == 1:
+                    position_mask = used[rows, prefix[:, 0]].all(axis=2)
+                else:
+                    position_mask = used[rows, prefix[:, 0], prefix[:, 1]]
+            probs = self._probs(position, h, prefix, temperature)
+            prefix[:, position] = sample_top_k(probs, min(top_k, 10), rngs, mask=position_mask)
+        return prefix @ np.array([100, 10, 1])
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kho dữ liệu nhị phân (uint16, memory-mapped) đi kèm data-dacbiet.txt
+
+File .txt vẫn là bản xuất dễ đọc cho người; file .bin chứa cùng dãy số
+dưới dạng mảng uint16 sau một header nhỏ có checksum, để mọi nơi đọc dữ
+liệu chỉ cần map file (O(1)) thay vì đọc và kiểm tra từng dòng.
+"""
+
+import os
+import struct
+import zlib
+import hashlib
+import numpy as np # type: ignore
+
+MAGIC = b"3CDB"
+VERSION = 2
+
+# magic, version, dự phòng, số lượng số, kích thước và mtime (ns) của file
+# .txt tương ứng, crc32 của dữ liệu, tổng số dòng, số dòng không hợp lệ
+HEADER_FORMAT = "<4sHHQQQIII4x"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+def store_path_for(text_path):
+    """Đường dẫn file .bin đi kèm một file dữ liệu .txt"""
+    base, _ = os.path.splitext(text_path)
+    return f"{base}.bin"
+
+def source_stat(text_path):
+    """(kích thước, mtime tính bằng ns) của file .txt, dùng để biết kho còn đồng bộ không"""
+    stat = os.stat(text_path)
+    return stat.st_size, stat.st_mtime_ns
+
+def is_valid_line(line):
+    """Dòng hợp lệ: đúng 3 chữ số (giống các bộ đọc cũ)"""
+    line = line.strip()
+    return line.isdigit() and len(line) == 3
+
+def tail_numbers(text_path, count, block_size=4096):
+    """Đọc `count` số hợp lệ cuối cùng của file .txt mà không đọc cả file
+
+    Đọc ngược từ cuối file theo từng khối cố định, bỏ qua dòng trống hoặc
+    không hợp lệ, và dừng ngay khi đủ số. Chi phí I/O không phụ thuộc vào
+    độ dài lịch sử. Trả về danh sách theo thứ tự cũ -> mới.
+    """
+    found = []
+    if count <= 0:
+        return found
+
+    with open(text_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        partial = b""
+
+        while position > 0 and len(found) < count:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            chunk = f.read(read_size) + partial
+
+            lines = chunk.split(b"\n")
+            # Dòng đầu khối có thể bị cắt dở, giữ lại để ghép với khối trước
+            if position > 0:
+                partial = lines[0]
+                lines = lines[1:]
+            else:
+                partial = b""
+
+            for line in reversed(lines):
+                text = line.decode("utf-8", errors="ignore")
+                if is_valid_line(text):
+                    found.append(int(text.strip()))
+                    if len(found) == count:
+                        break
+
+    found.reverse()
+    return found
+
+class DrawStore:
+    """Mảng uint16 các kết quả, lưu trong file có header và checksum"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def read_header(self):
+        """Đọc header, trả về dict hoặc None nếu file không hợp lệ"""
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read(HEADER_SIZE)
+        except OSError:
+            return None
+
+        if len(raw) != HEADER_SIZE:
+            return None
+
+        (magic, version, _, count, source_size, source_mtime,
+         crc, total_lines, invalid_lines) = struct.unpack(HEADER_FORMAT, raw)
+        if magic != MAGIC or version != VERSION:
+            return None
+
+        return {
+            "count": count,
+            "source_size": source_size,
+            "source_mtime": source_mtime,
+            "crc32": crc,
+            "total_lines": total_lines,
+            "invalid_lines": invalid_lines,
+        }
+
+    def _write_header(self, f, header):
+        f.seek(0)
+        f.write(struct.pack(
+            HEADER_FORMAT, MAGIC, VERSION, 0,
+            header["count"], header["source_size"], header["source_mtime"], header["crc32"],
+            header["total_lines"], header["invalid_lines"]
+        ))
+
+    def write(self, numbers, source_size=0, total_lines=None, invalid_lines=0, source_mtime=0):
+        """Ghi lại toàn bộ kho (ghi ra file tạm rồi thay thế nguyên tử)"""
+        data = np.asarray(numbers, dtype="<u2")
+        header = {
+            "count": len(data),
+            "source_size": source_size,
+            "source_mtime": source_mtime,
+            "crc32": zlib.crc32(data.tobytes()),
+            "total_lines": len(data) if total_lines is None else total_lines,
+            "invalid_lines": invalid_lines,
+        }
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            self._write_header(f, header)
+            f.write(data.tobytes())
+        os.replace(tmp_path, self.path)
+        return header
+
+    def append(self, number, source_size, valid=True, source_mtime=0):
+        """Thêm một dòng mới vào cuối kho, cập nhật header trong O(1)"""
+        header = self.read_header()
+        if header is None:
+            raise ValueError(f"Kho dữ liệu không hợp lệ: {self.path}")
+
+        with open(self.path, "r+b") as f:
+            header["total_lines"] += 1
+            if valid:
+                value = np.array([number], dtype="<u2").tobytes()
+                f.seek(HEADER_SIZE + 2 * header["count"])
+                f.write(value)
+                f.truncate()
+                header["count"] += 1
+                header["crc32"] = zlib.crc32(value, header["crc32"])
+            else:
+                header["invalid_lines"] += 1
+            header["source_size"] = source_size
+            header["source_mtime"] = source_mtime
+            self._write_header(f, header)
+        return header
+
+    def numbers(self):
+        """Toàn bộ dãy số dưới dạng memmap chỉ đọc (không sao chép)"""
+        header = self.read_header()
+        if header is None:
+            raise ValueError(f"Kho dữ liệu không hợp lệ: {self.path}")
+        if header["count"] == 0:
+            return np.empty(0, dtype="<u2")
+        return np.memmap(self.path, dtype="<u2", mode="r",
+                         offset=HEADER_SIZE, shape=(header["count"],))
+
+    def verify(self):
+        """Kiểm tra checksum của toàn bộ dữ liệu (O(N), chỉ dùng khi kiểm tra)"""
+        header = self.read_header()
+        if header is None:
+            return False
+        return zlib.crc32(np.asarray(self.numbers()).tobytes()) == header["crc32"]
+
+def build_from_text(text_path, store_path=None):
+    """Phân tích file .txt một lần và ghi lại kho nhị phân"""
+    store = DrawStore(store_path or store_path_for(text_path))
+
+    with open(text_path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+
+    numbers = []
+    invalid_lines = 0
+    for line in lines:
+        if is_valid_line(line):
+            numbers.append(int(line.strip()))
+        elif line.strip():
+            invalid_lines += 1
+
+    source_size, source_mtime = source_stat(text_path)
+    store.write(numbers, source_size=source_size, source_mtime=source_mtime,
+                total_lines=len(lines), invalid_lines=invalid_lines)
+    return store
+
+def open_store(text_path="data-dacbiet.txt"):
+    """Mở kho đi kèm file .txt, tự tạo lại nếu thiếu hoặc lệch với file .txt
+
+    Việc kiểm tra đồng bộ chỉ so sánh kích thước và mtime của file .txt với
+    giá trị lưu trong header (một lần stat, O(1)), nên file .txt sửa tay
+    (kể cả sửa một số mà không đổi kích thước) sẽ được phân tích lại đúng
+    một lần.
+    """
+    store = DrawStore(store_path_for(text_path))
+    header = store.read_header()
+    if header is None or (header["source_size"], header["source_mtime"]) != source_stat(text_path):
+        store = build_from_text(text_path, store.path)
+    return store
+
+def load_numbers(text_path="data-dacbiet.txt"):
+    """Toàn bộ kết quả dưới dạng mảng uint16 map từ kho nhị phân"""
+    return open_store(text_path).numbers()
+
+def content_hash(numbers):
+    """sha256 của dãy số (dạng uint16 little-endian), không phụ thuộc định dạng file .txt"""
+    return hashlib.sha256(np.ascontiguousarray(numbers, dtype="<u2").tobytes()).hexdigest()
+
+def append_number(data, text_path="data-dacbiet.txt"):
+    """Ghi thêm một kết quả vào file .txt và kho nhị phân đi kèm"""
+    stat_before = source_stat(text_path) if os.path.exists(text_path) else (0, 0)
+    store = DrawStore(store_path_for(text_path))
+    header = store.read_header()
+
+    with open(text_path, "a", encoding="utf-8") as f:
+        f.write(data + "\n")
+
+    if header is not None and (header["source_size"], header["source_mtime"]) == stat_before:
+        # Kho đang đồng bộ: chỉ cần nối thêm một giá trị
+        valid = is_valid_line(data)
+        source_size, source_mtime = source_stat(text_path)
+        store.append(int(data) if valid else 0, source_size, valid=valid, source_mtime=source_mtime)
+    else:
+        build_from_text(text_path, store.path)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kho đặc trưng cập nhật tăng dần đi kèm data-dacbiet.txt
+
+Giữ trạng thái dẫn xuất từ lịch sử kết quả và cập nhật O(1) cho mỗi kết
+quả mới (fetch.py gọi sau khi ghi số mới), thay vì quét lại toàn bộ lịch sử:
+- khoảng cách (gap) từ lần xuất hiện gần nhất của từng số 000-999
+- tần suất của từng số trong các cửa sổ trượt (vòng đệm các kết quả gần nhất)
+- tần suất chữ số theo từng vị trí (trăm, chục, đơn vị), toàn bộ và theo cửa sổ
+
+Ngoài trạng thái, mỗi kết quả có một hàng đặc trưng (FEATURE_NAMES) tính từ
+lịch sử ngay trước nó (không nhìn trước). check_models.py đọc kho này để
+thống kê dữ liệu; mô hình LSTM hiện chỉ dùng dãy số gốc làm đầu vào.
+
+Trạng thái (kích thước cố định, không phụ thuộc độ dài lịch sử) được lưu vào
+data-dacbiet.features.npz, các hàng đặc trưng được nối thêm vào file
+data-dacbiet.features.rows (float32 thô, chỉ ghi thêm), nên đọc, đồng bộ và
+lưu lại sau mỗi kết quả mới đều là O(số kết quả mới).
+"""
+
+import os
+import zlib
+import numpy as np # type: ignore
+
+from draw_store import open_store
+
+STORE_VERSION = 3
+NUM_VALUES = 1000
+WINDOWS = (10, 100, 1000)
+
+# Cột của ma trận đặc trưng theo từng kết quả
+FEATURE_NAMES = ("gap",) + tuple(f"freq_{w}" for w in WINDOWS) + ("digit0_freq", "digit1_freq", "digit2_freq")
+
+_POSITIONS = np.arange(3)
+
+def feature_path_for(text_path):
+    """Đường dẫn file đặc trưng đi kèm một file dữ liệu .txt"""
+    base, _ = os.path.splitext(text_path)
+    return f"{base}.features.npz"
+
+def rows_path_for(path):
+    """Đường dẫn file hàng đặc trưng đi kèm file trạng thái .npz"""
+    base, _ = os.path.splitext(path)
+    return f"{base}.rows"
+
+def _digits(number):
+    return np.array([number // 100, number // 10 % 10, number % 10])
+
+class FeatureStore:
+    """Trạng thái đặc trưng của dãy kết quả, mỗi append là O(1)"""
+
+    def __init__(self, windows=WINDOWS):
+        self.windows = tuple(windows)
+        self.count = 0
+        # Chỉ số kết quả gần nhất của từng số (-1: chưa xuất hiện)
+        self.last_seen = np.full(NUM_VALUES, -1, dtype=np.int64)
+        # Vòng đệm max(windows) kết quả gần nhất, kết quả t nằm ở ô t % kích thước
+        self.ring = np.zeros(max(self.windows), dtype=np.uint16)
+        self.rolling_counts = np.zeros((len(self.windows), NUM_VALUES), dtype=np.int64)
+        self.position_counts = np.zeros((3, 10), dtype=np.int64)
+        self.rolling_position_counts = np.zeros((len(self.windows), 3, 10), dtype=np.int64)
+        # Các hàng đặc trưng đã có trong file .rows (memmap) và các hàng thêm sau
+        # đó, hàng t nằm ở _rows[t - _saved_count] (dung lượng tăng gấp đôi khi đầy)
+        self._saved_rows = np.zeros((0, len(FEATURE_NAMES)), dtype=np.float32)
+        self._saved_count = 0
+        self._rows = np.zeros((0, len(FEATURE_NAMES)), dtype=np.float32)
+        # crc32 chạy của các kết quả đã xử lý (uint16 little-endian, giống header của
+        # kho .bin), nối thêm cho mỗi kết quả thay vì hash lại toàn bộ lịch sử
+        self.history_crc32 = 0
+
+    def _feature_row(self, number, number_digits):
+        """Đặc trưng của kết quả kế tiếp, chỉ dùng lịch sử trước nó"""
+        t = self.count
+        row = np.zeros(len(FEATURE_NAMES), dtype=np.float32)
+        row[0] = t - self.last_seen[number]
+        for i, window in enumerate(self.windows):
+            seen = min(window, t)
+            row[1 + i] = self.rolling_counts[i, number] / seen if seen else 0.0
+        if t:
+            row[1 + len(self.windows):] = self.position_counts[_POSITIONS, number_digits] / t
+        return row
+
+    def append(self, number):
+        """Thêm một kết quả mới (O(số cửa sổ))"""
+        number = int(number)
+        number_digits = _digits(number)
+        t = self.count
+        row = t - self._saved_count
+
+        if row == len(self._rows):
+            grown = np.zeros((max(2 * row, 1024), len(FEATURE_NAMES)), dtype=np.float32)
+            grown[:row] = self._rows
+            self._rows = grown
+        self._rows[row] = self._feature_row(number, number_digits)
+
+        size = len(self.ring)
+        for i, window in enumerate(self.windows):
+            if t >= window:
+                # Kết quả vừa ra khỏi cửa sổ (đọc trước khi ô vòng đệm bị ghi đè)
+                old = int(self.ring[(t - window) % size])
+                self.rolling_counts[i, old] -= 1
+                self.rolling_position_counts[i, _POSITIONS, _digits(old)] -= 1
+            self.rolling_counts[i, number] += 1
+            self.rolling_position_counts[i, _POSITIONS, number_digits] += 1
+
+        self.position_counts[_POSITIONS, number_digits] += 1
+        self.ring[t % size] = number
+        self.last_seen[number] = t
+        self.count += 1
+        self.history_crc32 = zlib.crc32(np.array([number], dtype="<u2").tobytes(), self.history_crc32)
+
+    def extend(self, numbers):
+        for number in numbers:
+            self.append(number)
+
+    def sync(self, numbers, crc32):
+        """Cập nhật theo dãy số đầy đủ: chỉ thêm các kết quả mới, tính lại nếu lịch sử bị sửa
+
+        `crc32` là checksum của toàn bộ `numbers` (header của kho .bin). Nối
+        crc32 chạy của phần đã xử lý với các kết quả mới phải ra đúng giá trị
+        này, nên sửa bất kỳ kết quả cũ nào cũng bị phát hiện mà chỉ cần đọc
+        các kết quả mới. Trả về số kết quả đã xử lý trong lần gọi này.
+        """
+        new_numbers = np.asarray(numbers[self.count:], dtype="<u2")
+        if self.count > len(numbers) or zlib.crc32(new_numbers.tobytes(), self.history_crc32) != crc32:
+            self.__init__(self.windows)
+            new_numbers = np.asarray(numbers, dtype="<u2")
+        start = self.count
+        self.extend(new_numbers)
+        return self.count - start
+
+    @property
+    def matrix(self):
+        """Ma trận đặc trưng (số kết quả, len(FEATURE_NAMES)), cột theo FEATURE_NAMES"""
+        new_rows = self._rows[:self.count - self._saved_count]
+        if not self._saved_count:
+            return new_rows
+        return np.concatenate([self._saved_rows, new_rows])
+
+    def gaps(self):
+        """Số kỳ kể từ lần xuất hiện gần nhất của từng số (chưa xuất hiện: count + 1)"""
+        return self.count - self.last_seen
+
+    def rolling_frequencies(self):
+        """Tần suất từng số trong mỗi cửa sổ, dạng (len(windows), 1000)"""
+        seen = np.minimum(np.array(self.windows), self.count)[:, np.newaxis]
+        return self.rolling_counts / np.maximum(seen, 1)
+
+    def digit_position_frequencies(self, window=None):
+        """Tần suất chữ số 0-9 ở từng vị trí, dạng (3, 10); window=None: toàn bộ lịch sử"""
+        if window is None:
+            return self.position_counts / max(self.count, 1)
+        i = self.windows.index(window)
+        return self.rolling_position_counts[i] / max(min(window, self.count), 1)
+
+    def save(self, path):
+        """Nối các hàng mới vào file .rows rồi ghi trạng thái ra file .npz
+
+        File .rows được cắt về số hàng đã lưu trước khi nối (bỏ phần thừa của
+        một lần ghi dở), trạng thái ghi ra file tạm rồi thay thế nguyên tử, nên
+        file .npz không bao giờ trỏ tới hàng chưa được ghi.
+        """
+        row_bytes = len(FEATURE_NAMES) * np.dtype("<f4").itemsize
+        rows_path = rows_path_for(path)
+        with open(rows_path, "r+b" if self._saved_count else "wb") as f:
+            f.truncate(self._saved_count * row_bytes)
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(self._rows[:self.count - self._saved_count], dtype="<f4").tobytes())
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                version=STORE_VERSION,
+                windows=np.array(self.windows),
+                count=self.count,
+                last_seen=self.last_seen,
+                ring=self.ring,
+                rolling_counts=self.rolling_counts,
+                position_counts=self.position_counts,
+                rolling_position_counts=self.rolling_position_counts,
+                history_crc32=self.history_crc32,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, windows=WINDOWS):
+        """Đọc trạng thái từ file .npz và map file .rows (không đọc các hàng)
+
+        None nếu thiếu, hỏng, khác phiên bản/cửa sổ hoặc file .rows ngắn hơn
+        số kết quả đã lưu.
+        """
+        try:
+            with np.load(path) as data:
+                if int(data["version"]) != STORE_VERSION or tuple(data["windows"].tolist()) != tuple(windows):
+                    return None
+                store = cls(windows)
+                store.count = int(data["count"])
+                store.last_seen = data["last_seen"]
+                store.ring = data["ring"]
+                store.rolling_counts = data["rolling_counts"]
+                store.position_counts = data["position_counts"]
+                store.rolling_position_counts = data["rolling_position_counts"]
+                store.history_crc32 = int(data["history_crc32"])
+            if store.count:
+                store._saved_rows = np.memmap(rows_path_for(path), dtype="<f4", mode="r",
+                                              shape=(store.count, len(FEATURE_NAMES)))
+                store._saved_count = store.count
+        except (OSError, ValueError, KeyError):
+            return None
+        return store
+
+def load_feature_store(text_path="data-dacbiet.txt", save=True):
+    """Kho đặc trưng đồng bộ với file dữ liệu; chỉ tính thêm các kết quả mới và lưu lại"""
+    path = feature_path_for(text_path)
+    store = FeatureStore.load(path) or FeatureStore()
+    draws = open_store(text_path)
+    if store.sync(draws.numbers(), draws.read_header()["crc32"]) and save:
+        store.save(path)
+    return store
@@ -8,6 +8,9 @@ import json
 from datetime import date, datetime, timezone, timedelta
 import requests # type: ignore
 
+from draw_store import append_number
+from feature_store import load_feature_store
+
 def get_data_dacbiet(url: str) -> str | None:
     try:
         file_path = 'last-data-dacbiet.txt'
@@ -35,14 +38,16 @@ def get_data_dacbiet(url: str) -> str | None:
 def save_data_dacbiet(data: str, filename: str = "data-dacbiet.txt"):
     # Chỉ ghi nếu hợp lệ (3 ký tự)
     if len(data) == 3:
-        with open(filename, "a", encoding="utf-8") as f:
-            f.write(data + "\n")
+        # Ghi vào file .txt và nối thêm vào kho nhị phân đi kèm (.bin)
+        append_number(data, filename)
+        # Cập nhật đặc trưng (gap, tần suất) chỉ cho kết quả mới
+        load_feature_store(filename)
         print(f"Đã ghi dữ liệu: {data}")
     else:
         print("Dữ liệu không hợp lệ, không ghi file")
 
 def main():
-    """Hàm chính"""
+    """Hàm chính, trả về kết quả vừa ghi (None nếu không lấy được)"""
     print("=== GỌI FETCH.PY VÀ CẬP NHẬT DATA-DACBIET.TXT ===\n")
     
     # Lấy 3 số cuối của giải đặc biệt
@@ -58,7 +63,7 @@ def main():
     else:
         print("Không hợp lệ hoặc lỗi")
         print("Chưa lấy được kết quả giải đặc biệt")
-        return
+        return None
     
     print()
     
@@ -71,6 +76,8 @@ def main():
         
     else:
         print(f"\n⚠️  Cập nhật không thành công")
+    
+    return special_numbers
 
 if __name__ == "__main__":
     main()
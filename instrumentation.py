@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Đo thời gian và bộ nhớ theo từng bước (span), ghi ra JSONL
+
+Bật bằng biến môi trường LOTTERY_TRACE (giá trị "1" ghi vào trace.jsonl,
+hoặc đường dẫn file .jsonl). Mỗi span ghi một dòng gồm wall time, CPU time,
+peak RSS của tiến trình và peak tracemalloc trong span. Khi tắt, span()
+trả về một nullcontext dùng chung nên gần như không tốn chi phí.
+
+    with span("load_data", draws=len(numbers)):
+        ...
+
+So sánh hai lần chạy:
+
+    python instrumentation.py trace-old.jsonl trace-new.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import contextlib
+from datetime import datetime
+
+TRACE_ENV = "LOTTERY_TRACE"
+DEFAULT_TRACE_FILE = "trace.jsonl"
+
+_NULL_SPAN = contextlib.nullcontext()
+
+def _trace_path():
+    value = os.environ.get(TRACE_ENV, "")
+    if value.lower() in ("", "0", "false", "no"):
+        return None
+    if value.lower() in ("1", "true", "yes"):
+        return DEFAULT_TRACE_FILE
+    return value
+
+TRACE_PATH = _trace_path()
+ENABLED = TRACE_PATH is not None
+RUN_ID = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+
+# Các span đang mở (để ghi span cha và giữ peak tracemalloc khi lồng nhau)
+_stack = []
+
+def _peak_rss_mb():
+    """Peak RSS của tiến trình (MB), None nếu hệ điều hành không hỗ trợ"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux trả về KB, macOS trả về byte
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except (ImportError, OSError):
+        return None
+
+class _Span:
+    """Một span đang đo; chỉ được tạo khi instrumentation bật"""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.child_peak = 0
+
+    def __enter__(self):
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if _stack:
+            # Giữ lại peak của span cha trước khi đặt lại bộ đếm peak
+            parent = _stack[-1]
+            parent.child_peak = max(parent.child_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self.traced_start = tracemalloc.get_traced_memory()[0]
+
+        self.parent = _stack[-1].name if _stack else None
+        self.depth = len(_stack)
+        _stack.append(self)
+        self.started_at = datetime.now().isoformat(timespec="milliseconds")
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        import tracemalloc
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+        peak = max(self.child_peak, tracemalloc.get_traced_memory()[1])
+
+        _stack.pop()
+        if _stack:
+            _stack[-1].child_peak = max(_stack[-1].child_peak, peak)
+
+        record = {
+            "run_id": RUN_ID,
+            "span": self.name,
+            "parent": self.parent,
+            "depth": self.depth,
+            "started_at": self.started_at,
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "peak_rss_mb": _peak_rss_mb(),
+            "tracemalloc_start_mb": round(self.traced_start / (1024 * 1024), 3),
+            "tracemalloc_peak_mb": round(peak / (1024 * 1024), 3),
+            "error": exc_type.__name__ if exc_type else None,
+        }
+        record.update(self.fields)
+        emit(record)
+        return False
+
+def span(name, **fields):
+    """Context manager đo một bước; nullcontext dùng chung khi tắt"""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name, fields)
+
+def emit(record):
+    """Ghi một bản ghi vào file JSONL (mở-ghi-đóng để an toàn khi tiến trình dừng giữa chừng)"""
+    if not ENABLED:
+        return
+    with open(TRACE_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+def keras_callbacks(prefix="train"):
+    """Danh sách callback Keras ghi một span cho mỗi epoch (rỗng khi tắt)"""
+    if not ENABLED:
+        return []
+
+    from tensorflow import keras # type: ignore
+
+    class InstrumentationCallback(keras.callbacks.Callback):
+        def on_epoch_begin(self, epoch, logs=None):
+            self._span = span(f"{prefix}.epoch", epoch=epoch)
+            self._span.__enter__()
+
+        def on_epoch_end(self, epoch, logs=None):
+            # Ghi kèm các chỉ số của epoch (loss, val_loss, ...)
+            self._span.fields.update({k: float(v) for k, v in (logs or {}).items()})
+            self._span.__exit__(None, None, None)
+
+    return [InstrumentationCallback()]
+
+def load_trace(path):
+    """Tổng hợp file JSONL theo tên span: số lần, tổng wall/CPU, peak bộ nhớ lớn nhất"""
+    summary = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            entry = summary.setdefault(record["span"], {"count": 0, "wall_s": 0.0, "cpu_s": 0.0,
+                                                        "peak_rss_mb": 0.0, "tracemalloc_peak_mb": 0.0})
+            entry["count"] += 1
+            entry["wall_s"] += record["wall_s"]
+            entry["cpu_s"] += record["cpu_s"]
+            entry["peak_rss_mb"] = max(entry["peak_rss_mb"], record.get("peak_rss_mb") or 0.0)
+            entry["tracemalloc_peak_mb"] = max(entry["tracemalloc_peak_mb"], record["tracemalloc_peak_mb"])
+    return summary
+
+def main():
+    """Hàm chính: in tổng hợp một file trace, hoặc so sánh hai file"""
+    if len(sys.argv) < 2:
+        print("Sử dụng: python instrumentation.py trace.jsonl [trace-moi.jsonl]")
+        return
+
+    old = load_trace(sys.argv[1])
+    new = load_trace(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    print(f"{'Span':<32}{'Lần':>6}{'Wall (s)':>12}{'CPU (s)':>12}{'RSS (MB)':>10}{'Malloc (MB)':>13}" +
+          (f"{'Wall mới':>12}{'Tỉ lệ':>9}" if new else ""))
+    for name in sorted(set(old) | set(new or {})):
+        entry = old.get(name)
+        row = f"{name:<32}"
+        if entry:
+            row += (f"{entry['count']:>6}{entry['wall_s']:>12.3f}{entry['cpu_s']:>12.3f}"
+                    f"{entry['peak_rss_mb']:>10.1f}{entry['tracemalloc_peak_mb']:>13.2f}")
+        else:
+            row += f"{'-':>6}{'-':>12}{'-':>12}{'-':>10}{'-':>13}"
+        if new:
+            new_entry = new.get(name)
+            if new_entry:
+                ratio = f"{new_entry['wall_s'] / entry['wall_s']:.2f}x" if entry and entry["wall_s"] else "-"
+                row += f"{new_entry['wall_s']:>12.3f}{ratio:>9}"
+            else:
+                row += f"{'-':>12}{'-':>9}"
+        print(row)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CLI thống nhất `3cang` cho toàn bộ hệ thống dự đoán
+
+    ./3cang fetch                 # Lấy kết quả mới, cập nhật data-dacbiet.txt
+    ./3cang train                 # Huấn luyện (hoặc huấn luyện tiếp) mô hình
+    ./3cang predict [--gumbel] [--digitwise] [--seed N]  # Dự đoán 4 x 255 số, ghi data-predict.json
+    ./3cang predict --sequence [--stateful]  # Dự đoán 255 số theo chuỗi (predict_lottery.py)
+    ./3cang check [--deep]        # Kiểm tra mô hình và dữ liệu
+    ./3cang cleanup [--all] [--type raw_numbers]
+    ./3cang readme                # Cập nhật phần dự đoán trong README.md
+    ./3cang pipeline [--force]    # fetch -> train -> predict -> readme trong một tiến trình
+
+Mỗi lệnh chỉ import module nó cần ngay khi chạy (TensorFlow chỉ được tải
+bởi train/predict), và in thời gian import của lệnh đó.
+"""
+
+import time
+import argparse
+import importlib
+
+def _import(module_name):
+    """Import module của một lệnh và in thời gian import"""
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"⏱️  Import {module_name}: {elapsed:.0f} ms")
+    return module
+
+def cmd_fetch(args):
+    _import("fetch").main()
+
+def cmd_train(args):
+    _import("lottery_prediction_model").main()
+
+def cmd_predict(args):
+    if args.sequence:
+        _import("predict_lottery").main(seed=args.seed, stateful=args.stateful)
+    else:
+        _import("predict_255_unique_from_model").main(use_gumbel=args.gumbel, seed=args.seed,
+                                                         digitwise=args.digitwise)
+
+def cmd_check(args):
+    _import("check_models").main(deep=args.deep)
+
+def cmd_cleanup(args):
+    _import("cleanup_models").cleanup_old_models(args.type, keep_latest=not args.all)
+
+def cmd_readme(args):
+    _import("update_readme").main()
+
+def cmd_pipeline(args):
+    _import("pipeline").main(force=args.force, use_gumbel=args.gumbel, seed=args.seed)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="3cang", description="Hệ thống dự đoán 3 càng sử dụng RNN-LSTM")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("fetch", help="Lấy kết quả mới và cập nhật dữ liệu").set_defaults(func=cmd_fetch)
+    subparsers.add_parser("train", help="Huấn luyện mô hình").set_defaults(func=cmd_train)
+
+    predict = subparsers.add_parser("predict", help="Dự đoán từ mô hình mới nhất")
+    predict.add_argument("--gumbel", action="store_true", help="Gumbel-top-k: một lần gọi mô hình cho cả 4 bộ số")
+    predict.add_argument("--sequence", action="store_true", help="Dự đoán 255 số theo chuỗi (predict_lottery.py)")
+    predict.add_argument("--stateful", action="store_true",
+                         help="Với --sequence: giữ trạng thái LSTM giữa các bước thay vì trượt cửa sổ")
+    predict.add_argument("--digitwise", action="store_true",
+                         help="Lấy mẫu từng chữ số (mô hình có đầu ra theo chữ số)")
+    predict.add_argument("--seed", type=int, default=None, help="Seed lấy mẫu (mặc định: theo ngày dự đoán)")
+    predict.set_defaults(func=cmd_predict)
+
+    check = subparsers.add_parser("check", help="Kiểm tra mô hình và dữ liệu")
+    check.add_argument("--deep", action="store_true", help="Tải đầy đủ từng mô hình (chậm hơn)")
+    check.set_defaults(func=cmd_check)
+
+    cleanup = subparsers.add_parser("cleanup", help="Dọn dẹp model cũ")
+    cleanup.add_argument("--all", action="store_true", help="Xóa tất cả model (kể cả mới nhất)")
+    cleanup.add_argument("--type", default=None, help="Chỉ dọn dẹp một loại (ví dụ raw_numbers)")
+    cleanup.set_defaults(func=cmd_cleanup)
+
+    subparsers.add_parser("readme", help="Cập nhật README.md").set_defaults(func=cmd_readme)
+
+    pipeline = subparsers.add_parser("pipeline", help="Chạy fetch -> train -> predict -> readme trong một tiến trình")
+    pipeline.add_argument("--force", action="store_true", help="Chạy lại mọi bước kể cả khi đầu vào không đổi")
+    pipeline.add_argument("--gumbel", action="store_true", help="Dự đoán bằng Gumbel-top-k")
+    pipeline.add_argument("--seed", type=int, default=None, help="Seed lấy mẫu (mặc định: theo ngày dự đoán)")
+    pipeline.set_defaults(func=cmd_pipeline)
+    return parser
+
+def main(argv=None):
+    """Hàm chính"""
+    args = build_parser().parse_args(argv)
+    start = time.perf_counter()
+    args.func(args)
+    print(f"⏱️  Tổng thời gian lệnh {args.command}: {time.perf_counter() - start:.2f} s")
+
+if __name__ == "__main__":
+    main()
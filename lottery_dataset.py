@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tạo cửa sổ dữ liệu (window) cho mô hình RNN mà không sao chép dữ liệu
+"""
+
+import numpy as np # type: ignore
+from numpy.lib.stride_tricks import sliding_window_view # type: ignore
+
+def sliding_windows(data, sequence_length):
+    """Tất cả cửa sổ đầu vào dưới dạng view chỉ đọc (không sao chép)
+
+    Cửa sổ thứ i là data[i:i + sequence_length], có dạng
+    (N - sequence_length, sequence_length) với dữ liệu 1 chiều hoặc
+    (N - sequence_length, sequence_length, features) với dữ liệu 2 chiều.
+    Bộ nhớ dùng vẫn là O(N) vì mọi cửa sổ trỏ vào cùng một mảng gốc.
+    """
+    data = np.asarray(data)
+    if len(data) <= sequence_length:
+        raise ValueError(f"Cần nhiều hơn {sequence_length} phần tử để tạo cửa sổ, chỉ có {len(data)}")
+
+    # Bỏ cửa sổ cuối cùng vì nó không có giá trị đích phía sau
+    windows = sliding_window_view(data, sequence_length, axis=0)[:-1]
+    if data.ndim > 1:
+        # sliding_window_view đặt trục cửa sổ ở cuối: (N, features, L) -> (N, L, features)
+        windows = np.moveaxis(windows, -1, 1)
+    return windows
+
+def window_targets(data, sequence_length):
+    """Giá trị đích của từng cửa sổ (phần tử ngay sau cửa sổ), dạng view"""
+    return np.asarray(data)[sequence_length:]
+
+# Cấu hình augmentation theo loại mô hình: độ lệch chuẩn nhiễu, độ xoay tối đa và
+# tỉ lệ cửa sổ được xoay (1/roll_fraction số cửa sổ)
+AUGMENTATION_CONFIG = {
+    "counts": {"noise_std": 0.01, "max_shift": 2, "roll_fraction": 2},
+    "default": {"noise_std": 0.005, "max_shift": 1, "roll_fraction": 3},
+}
+
+def augmentation_plan(indices, roll_fraction):
+    """Danh sách (chỉ số cửa sổ, kiểu augmentation) cho một epoch
+
+    Kiểu 0: cửa sổ gốc, 1: thêm nhiễu Gaussian, 2: xoay (np.roll) cửa sổ.
+    Chỉ lưu số nguyên nên kích thước là O(số mẫu), không phải O(N x L).
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    rolled = indices[:len(indices) // roll_fraction]
+    plan_indices = np.concatenate([indices, indices, rolled])
+    plan_modes = np.concatenate([
+        np.zeros(len(indices), dtype=np.int32),
+        np.ones(len(indices), dtype=np.int32),
+        np.full(len(rolled), 2, dtype=np.int32),
+    ])
+    return plan_indices, plan_modes
+
+def make_training_dataset(series, targets, indices, sequence_length, batch_size=32,
+                          model_type="raw_numbers", augment=True, shuffle=True,
+                          class_weight=None, head="softmax"):
+    """Pipeline tf.data sinh cửa sổ và augmentation theo từng batch
+
+    series: chuỗi đã chuẩn hóa dạng (N,) hoặc (N, features), targets: giá
+    trị đích của từng cửa sổ, indices: chỉ số cửa sổ dùng cho tập này.
+    Cửa sổ được gather từ series ngay trong map (vector hóa theo batch),
+    nhiễu và phép xoay được sinh mới ở mỗi epoch, nên dữ liệu sau
+    augmentation không bao giờ tồn tại trọn vẹn trong bộ nhớ.
+    class_weight (dict lớp -> trọng số) được chuyển thành sample weight.
+    head khác "softmax" (đầu ra theo chữ số của digit_head) tách nhãn thành
+    ba chữ số; với "digits_chained" đầu vào kèm thêm hai chữ số đầu của nhãn.
+    """
+    import tensorflow as tf # type: ignore
+    if head != "softmax":
+        from digit_head import OUTPUT_NAMES, split_digits
+
+    series = np.asarray(series, dtype=np.float32)
+    if series.ndim == 1:
+        series = series[:, np.newaxis]
+    config = AUGMENTATION_CONFIG.get(model_type, AUGMENTATION_CONFIG["default"])
+
+    if augment:
+        plan_indices, plan_modes = augmentation_plan(indices, config["roll_fraction"])
+    else:
+        plan_indices = np.asarray(indices, dtype=np.int64)
+        plan_modes = np.zeros(len(plan_indices), dtype=np.int32)
+
+    series_tensor = tf.constant(series)
+    targets_tensor = tf.constant(np.asarray(targets))
+    offsets = tf.range(sequence_length, dtype=tf.int64)
+    noise_std = config["noise_std"]
+    max_shift = config["max_shift"]
+
+    weight_tensor = None
+    if class_weight is not None:
+        weights = np.ones(max(class_weight) + 1, dtype=np.float32)
+        for label, weight in class_weight.items():
+            weights[label] = weight
+        weight_tensor = tf.constant(weights)
+
+    def gather_batch(window_index, mode):
+        # Xoay cửa sổ: vị trí t lấy phần tử (t - shift) mod L như np.roll
+        shift = tf.random.uniform(tf.shape(window_index), -max_shift, max_shift + 1, dtype=tf.int64)
+        shift = tf.where(mode == 2, shift, tf.zeros_like(shift))
+        positions = (offsets[tf.newaxis, :] - shift[:, tf.newaxis]) % sequence_length
+        x = tf.gather(series_tensor, window_index[:, tf.newaxis] + positions)
+
+        # Nhiễu Gaussian nhỏ, giữ trong khoảng [0, 1]
+        noise = tf.random.normal(tf.shape(x), stddev=noise_std)
+        noisy = tf.clip_by_value(x + noise, 0.0, 1.0)
+        x = tf.where((mode == 1)[:, tf.newaxis, tf.newaxis], noisy, x)
+
+        y = tf.gather(targets_tensor, window_index)
+        if head != "softmax":
+            digits = split_digits(y)
+            if head == "digits_chained":
+                x = (x, tf.stack(digits[:2], axis=-1))
+            y = dict(zip(OUTPUT_NAMES, digits))
+        if weight_tensor is None:
+            return x, y
+        labels = tf.argmax(y, axis=-1) if len(y.shape) > 1 else tf.cast(y, tf.int64)
+        return x, y, tf.gather(weight_tensor, labels)
+
+    dataset = tf.data.Dataset.from_tensor_slices((plan_indices, plan_modes))
+    if shuffle:
+        dataset = dataset.shuffle(len(plan_indices), reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.map(gather_batch, num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.prefetch(tf.data.AUTOTUNE)
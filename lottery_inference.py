@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Các công cụ suy luận (inference) dùng chung cho mô hình LSTM xổ số
+"""
+
+import numpy as np # type: ignore
+import tensorflow as tf # type: ignore
+from tensorflow.keras import layers # type: ignore
+import os
+
+from lottery_sampling import (temperature_softmax, tempered_log_probs, top_k_indices, sample_top_k,
+                               normalize, index_to_value, chain_generators)
+from lottery_scaler import find_scaler_path, load_scaler
+# Import cũng đăng ký lớp DigitHead để load_model đọc được mô hình đầu ra theo chữ số
+from digit_head import DigitHead, DigitSampler, find_digit_head, window_input, trunk_model, joint_predict_fn
+
+class LotteryStepModel:
+    """Chạy mô hình LotteryLSTMModel đã huấn luyện theo từng bước (stateful)
+
+    Thay vì chạy lại toàn bộ cửa sổ SEQUENCE_LENGTH qua 3 lớp LSTM ở mỗi
+    bước dự đoán, lớp này dùng lại trọng số của mô hình đã huấn luyện dưới
+    dạng hàm một bước: mồi (prime) trạng thái LSTM một lần trên cửa sổ gần
+    nhất, sau đó mỗi bước chỉ đưa vào một giá trị mới và giữ trạng thái
+    (h, c) của từng lớp LSTM giữa các lần gọi.
+
+    Hỗ trợ batch: mỗi hàng là một chuỗi (chain) độc lập.
+    """
+
+    # Các lớp chỉ có tác dụng khi huấn luyện, bỏ qua khi suy luận
+    _TRAINING_ONLY_LAYERS = (layers.GaussianNoise, layers.Dropout, layers.InputLayer)
+
+    def __init__(self, model):
+        self.model = model
+        self.layers = [layer for layer in model.layers
+                       if not isinstance(layer, self._TRAINING_ONLY_LAYERS)]
+
+        # Tách phần hồi quy (LSTM) và phần đầu ra (sau lớp LSTM cuối cùng)
+        lstm_positions = [i for i, layer in enumerate(self.layers)
+                          if isinstance(layer, layers.LSTM)]
+        if not lstm_positions:
+            raise ValueError("Mô hình không có lớp LSTM, không thể chạy theo từng bước")
+
+        self.recurrent_layers = self.layers[:lstm_positions[-1] + 1]
+        self.head_layers = self.layers[lstm_positions[-1] + 1:]
+        self.lstm_layers = [self.layers[i] for i in lstm_positions]
+        self.num_features = window_input(model).shape[-1]
+        self.states = None
+
+        self._step_fn = tf.function(self._step)
+
+    def initial_state(self, batch_size):
+        """Trạng thái (h, c) bằng 0 cho từng lớp LSTM"""
+        return [
+            [tf.zeros((batch_size, layer.cell.units)), tf.zeros((batch_size, layer.cell.units))]
+            for layer in self.lstm_layers
+        ]
+
+    def _step(self, x_t, states):
+        """Một bước thời gian: x_t có dạng (batch, features)"""
+        h = x_t
+        new_states = []
+        lstm_index = 0
+
+        for layer in self.recurrent_layers:
+            if isinstance(layer, layers.LSTM):
+                h, layer_state = layer.cell(h, states[lstm_index], training=False)
+                new_states.append(list(layer_state))
+                lstm_index += 1
+            else:
+                # Gọi trực tiếp call() vì input_spec của lớp được khai báo
+                # cho tensor 3 chiều (batch, thời gian, units)
+                h = layer.call(h, training=False)
+
+        for layer in self.head_layers:
+            if isinstance(layer, DigitHead):
+                # Đầu ra theo chữ số: ghép thành phân phối 1000 lớp
+                h = layer.joint(h)
+            else:
+                h = layer(h, training=False)
+
+        return h, new_states
+
+    def prime(self, window):
+        """Mồi trạng thái LSTM trên cửa sổ gần nhất
+
+        window có dạng (batch, thời gian, features) hoặc (batch, thời gian).
+        Trả về xác suất dự đoán cho bước tiếp theo, dạng (batch, output).
+        """
+        window = np.asarray(window, dtype=np.float32)
+        if window.ndim == 2:
+            window = window[..., np.newaxis]
+
+        states = self.initial_state(window.shape[0])
+        probs = None
+        for t in range(window.shape[1]):
+            probs, states = self._step_fn(tf.constant(window[:, t, :]), states)
+
+        self.states = states
+        return probs.numpy()
+
+    def step(self, values):
+        """Đưa một giá trị mới cho mỗi chuỗi và trả về xác suất bước tiếp theo"""
+        if self.states is None:
+            raise ValueError("Chưa mồi trạng thái, hãy gọi prime() trước")
+
+        values = np.asarray(values, dtype=np.float32).reshape(-1, self.num_features)
+        probs, self.states = self._step_fn(tf.constant(values), self.states)
+        return probs.numpy()
+
+class LotterySession:
+    """Phiên suy luận: tải mô hình, scaler và hàm predict đã biên dịch một lần
+
+    Dùng lại cho nhiều lần lấy mẫu (ví dụ 4 lần dự đoán của
+    predict_255_unique_from_model.py) để việc giải tuần tự hóa mô hình
+    không lặp lại ở mỗi lần gọi.
+    """
+
+    # Cache các phiên đã tải theo (đường dẫn mô hình, đường dẫn scaler, mtime)
+    _cache = {}
+
+    def __init__(self, model, scaler=None):
+        self.model = model
+        self.scaler = scaler
+        self.sequence_length = window_input(model).shape[1] or 10
+        # Luôn trả về phân phối 1000 lớp, kể cả với đầu ra theo chữ số
+        self.predict_fn = joint_predict_fn(model)
+        self.digit_head = find_digit_head(model)
+        self._trunk_fn = None
+        self._digit_sampler = None
+        self.last_steps = 0
+        self.last_model_draws = []
+        self._step_model = None
+        self._index_numbers = None
+
+    @classmethod
+    def load(cls, model_path, scaler_path=None):
+        """Tải (hoặc lấy từ cache) phiên cho một file mô hình"""
+        if scaler_path is None:
+            scaler_path = find_scaler_path(model_path)
+
+        key = (os.path.abspath(model_path), os.path.abspath(scaler_path), os.path.getmtime(model_path))
+        session = cls._cache.get(key)
+        if session is None:
+            model = tf.keras.models.load_model(model_path)
+            scaler = None
+            if os.path.exists(scaler_path):
+                scaler = load_scaler(scaler_path)
+            session = cls(model, scaler)
+            cls._cache[key] = session
+        return session
+
+    @property
+    def step_model(self):
+        """Mô hình từng bước (stateful) dựng từ cùng trọng số, tạo khi cần"""
+        if self._step_model is None:
+            self._step_model = LotteryStepModel(self.model)
+        return self._step_model
+
+    def _sample_digitwise(self, sequences, rows, temperature, top_k, rngs, mask):
+        """Lấy mẫu lần lượt từng chữ số cho các hàng `rows` (không ghép 1000 lớp)"""
+        if self._trunk_fn is None:
+            self._trunk_fn = tf.function(trunk_model(self.model), reduce_retracing=True)
+            self._digit_sampler = DigitSampler(self.digit_head)
+        h = self._trunk_fn(tf.constant(sequences[rows]), training=False).numpy()
+        return self._digit_sampler.sample(h, temperature, top_k, rngs, mask=mask)
+
+    def _index_to_number(self, scaler=None):
+        """Bảng tra chỉ số lớp (0-999) -> số nguyên gốc, tính một lần cho scaler của phiên"""
+        if scaler is not None and scaler is not self.scaler:
+            return index_to_value(np.arange(1000), scaler, 999.0)
+        if self._index_numbers is None:
+            self._index_numbers = index_to_value(np.arange(1000), self.scaler, 999.0)
+        return self._index_numbers
+
+    def sample(self, n, chains=1, seed=None, recent_numbers=None,
+               temperature=1.5, top_k=5, unique=False, masked=False, max_steps=None,
+               digitwise=False, scaler=None):
+        """Lấy mẫu n số cho mỗi chuỗi, tất cả các chuỗi chạy trong một batch
+
+        Mỗi bước chỉ gọi mô hình một lần cho toàn bộ các chuỗi. Với
+        unique=True, số trùng trong cùng một chuỗi bị loại và chuỗi đó
+        không tiến; sau một nửa số bước tối đa sẽ bổ sung số ngẫu nhiên.
+        Với unique=True và masked=True, các số đã dùng bị loại khỏi vector
+        xác suất trước khi chọn top-k, nên đúng n bước cho n số khác nhau,
+        tất cả đều lấy từ mô hình.
+        Mỗi chuỗi có luồng ngẫu nhiên riêng tách từ seed (chain_generators),
+        nên cùng seed cho kết quả giống hệt nhau.
+        Với digitwise=True và mô hình có đầu ra theo chữ số, mỗi số được lấy
+        lần lượt từng chữ số (top-k áp dụng cho từng chữ số) thay vì chọn
+        trong phân phối 1000 lớp.
+        scaler: dùng thay scaler của phiên cho riêng lần gọi này (phiên được
+        cache dùng chung nên không sửa thuộc tính của nó).
+        Trả về danh sách `chains` danh sách số nguyên; số lượng số lấy từ
+        mô hình của từng chuỗi được ghi vào last_model_draws.
+        """
+        if recent_numbers is None or len(recent_numbers) == 0:
+            raise ValueError("Cần dữ liệu gần nhất (recent_numbers) để lấy mẫu")
+        scaler = scaler or self.scaler
+        if scaler is None:
+            raise ValueError("Phiên chưa có scaler")
+
+        masked = unique and masked
+        digitwise = digitwise and self.digit_head is not None
+        rngs = chain_generators(seed, chains)
+        if max_steps is None:
+            max_steps = 4 * n if unique and not masked else n
+        fill_after = max_steps // 2
+
+        # Chuẩn hóa dữ liệu đầu vào và nhân bản cho từng chuỗi
+        numbers_normalized = normalize(recent_numbers, scaler)
+        window = numbers_normalized[-self.sequence_length:].reshape(1, -1, 1)
+        sequences = np.tile(window, (chains, 1, 1)).astype(np.float32)
+
+        index_numbers = self._index_to_number(scaler)
+        predictions = [[] for _ in range(chains)]
+        model_draws = [0] * chains
+        used_numbers = [set() for _ in range(chains)]
+
+        # Mặt nạ cấp phát sẵn: True = chỉ số lớp đã dùng trong chuỗi
+        used_mask = np.zeros((chains, 1000), dtype=bool) if masked else None
+
+        steps = 0
+        while steps < max_steps and any(len(p) < n for p in predictions):
+            steps += 1
+
+            active = np.array([len(p) < n for p in predictions])
+            rows = np.flatnonzero(active)
+            row_rngs = [rngs[row] for row in rows]
+            row_mask = used_mask[rows] if masked else None
+
+            # Một lần gọi mô hình cho toàn bộ các chuỗi
+            if digitwise:
+                chosen = self._sample_digitwise(sequences, rows, temperature, top_k, row_rngs, row_mask)
+            else:
+                pred = self.predict_fn(tf.constant(sequences)).numpy()
+                pred_probs = temperature_softmax(pred[rows], temperature)
+                chosen = sample_top_k(pred_probs, top_k, row_rngs, mask=row_mask)
+
+            accepted_rows = []
+            for chain, chosen_idx in zip(rows, chosen):
+                pred_original = int(index_numbers[chosen_idx])
+
+                if masked:
+                    used_mask[chain] |= index_numbers == pred_original
+                    accepted = True
+                else:
+                    accepted = not unique or pred_original not in used_numbers[chain]
+
+                if accepted:
+                    predictions[chain].append(pred_original)
+                    used_numbers[chain].add(pred_original)
+                    model_draws[chain] += 1
+                    accepted_rows.append((chain, chosen_idx / 999.0))
+
+                # Nếu đã thử quá nhiều lần mà không đủ số, thêm số ngẫu nhiên
+                if unique and not masked and steps > fill_after and len(predictions[chain]) < n:
+                    # Sắp xếp để thứ tự ứng viên (và kết quả) chỉ phụ thuộc vào seed
+                    remaining_numbers = sorted(set(range(1000)) - used_numbers[chain])
+                    if remaining_numbers:
+                        random_number = int(rngs[chain].choice(remaining_numbers))
+                        predictions[chain].append(random_number)
+                        used_numbers[chain].add(random_number)
+
+            # Cập nhật cửa sổ của các chuỗi vừa nhận số mới
+            if accepted_rows:
+                chain_ids = [chain for chain, _ in accepted_rows]
+                sequences[chain_ids, :-1] = sequences[chain_ids, 1:]
+                sequences[chain_ids, -1, 0] = [value for _, value in accepted_rows]
+
+        self.last_steps = steps
+        self.last_model_draws = model_draws
+        return predictions
+
+    def sample_gumbel_top_k(self, n, chains=1, seed=None, recent_numbers=None, temperature=3.0):
+        """Lấy n số khác nhau cho mỗi chuỗi chỉ với một lần gọi mô hình
+
+        Chạy mô hình một lần trên cửa sổ thật gần nhất, sau đó với mỗi chuỗi
+        cộng nhiễu Gumbel độc lập vào log-xác suất chia cho temperature
+        (log p / T) và lấy n chỉ số lớn nhất (Gumbel-top-k). Kết quả tương đương rút n
+        lớp không hoàn lại theo phân phối đó, toàn bộ tính bằng NumPy.
+        Các chỉ số lớp cho cùng một số gốc (index_to_value làm tròn xuống)
+        được gộp xác suất trước khi rút, nên n số trả về luôn khác nhau.
+        """
+        if recent_numbers is None or len(recent_numbers) == 0:
+            raise ValueError("Cần dữ liệu gần nhất (recent_numbers) để lấy mẫu")
+        if self.scaler is None:
+            raise ValueError("Phiên chưa có scaler")
+
+        rngs = chain_generators(seed, chains)
+
+        numbers_normalized = normalize(recent_numbers, self.scaler)
+        window = numbers_normalized[-self.sequence_length:].reshape(1, -1, 1).astype(np.float32)
+        pred = self.predict_fn(tf.constant(window)).numpy()[0]
+
+        # Gộp xác suất theo số gốc, rồi temperature scaling trên log-xác suất
+        numbers, number_of_index = np.unique(self._index_to_number(), return_inverse=True)
+        merged = np.bincount(number_of_index, weights=pred.astype(np.float64), minlength=len(numbers))
+        log_probs = tempered_log_probs(merged, temperature)
+
+        # Mỗi chuỗi một bộ nhiễu Gumbel từ luồng riêng, dạng (chains, số giá trị khác nhau)
+        noise = np.stack([rng.gumbel(size=log_probs.shape[0]) for rng in rngs])
+        keys = log_probs[np.newaxis, :] + noise
+
+        # n khóa lớn nhất mỗi hàng, sắp xếp giảm dần theo thứ tự rút
+        top = top_k_indices(keys, n)
+
+        self.last_steps = 1
+        self.last_model_draws = [n] * chains
+        return [numbers[row].tolist() for row in top]
@@ -6,56 +6,76 @@ Hỗ trợ các loại dự đoán: raw_numbers, sum, counts
 """
 
 import numpy as np # type: ignore
-import pandas as pd # type: ignore
 import tensorflow as tf # type: ignore
 from tensorflow import keras # type: ignore
 from tensorflow.keras import layers # type: ignore
-from sklearn.preprocessing import MinMaxScaler # type: ignore
-from sklearn.model_selection import train_test_split # type: ignore
-import matplotlib.pyplot as plt # type: ignore
-import seaborn as sns # type: ignore
 import warnings
 import os
-import glob
+import json
+import hashlib
 from datetime import datetime
 
+from draw_store import load_numbers, content_hash
+from digit_features import digit_sums, digit_counts
+from model_registry import ModelRegistry
+from training_config import training_settings
+from lottery_scaler import LotteryScaler, scaler_path_for
+from lottery_dataset import sliding_windows, window_targets, make_training_dataset
+from digit_head import DigitHead, OUTPUT_NAMES, HEADS, find_digit_head, window_input, joint_predict_fn
+from lottery_inference import LotterySession
+from lottery_sampling import temperature_softmax, sample_top_k, normalize, index_to_value
+from instrumentation import span, keras_callbacks
+
 warnings.filterwarnings('ignore')
 
 class LotteryDataProcessor:
     """Xử lý dữ liệu xổ số"""
     
-    def __init__(self, data_file):
+    def __init__(self, data_file, numbers=None):
         self.data_file = data_file
-        self.scaler = MinMaxScaler()
+        # Dãy số đã đọc sẵn (ví dụ do pipeline truyền vào), bỏ qua việc đọc file
+        self.numbers = numbers
+        self.scaler = LotteryScaler()
+        # Chuỗi đã chuẩn hóa của lần prepare_*_data gần nhất (nguồn cho tf.data)
+        self.series = None
         
     def load_data(self):
-        """Đọc dữ liệu từ file"""
-        print("Đang đọc dữ liệu từ file...")
-        with open(self.data_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+        """Đọc dữ liệu từ kho nhị phân đi kèm file (mảng uint16, không sao chép)"""
+        if self.numbers is not None:
+            return self.numbers
         
-        # Lọc và chuyển đổi dữ liệu
-        numbers = []
-        for line in lines:
-            line = line.strip()
-            if line.isdigit() and len(line) == 3:
-                numbers.append(int(line))
+        print("Đang đọc dữ liệu từ file...")
+        with span("load_data", data_file=self.data_file):
+            numbers = load_numbers(self.data_file)
         
         print(f"Đã đọc {len(numbers)} số xổ số")
         return numbers
     
     def create_sequences(self, data, sequence_length=10):
-        """Tạo chuỗi dữ liệu cho mô hình RNN"""
-        X, y = [], []
+        """Tạo chuỗi dữ liệu cho mô hình RNN
         
-        for i in range(len(data) - sequence_length):
-            X.append(data[i:i + sequence_length])
-            y.append(data[i + sequence_length])
+        X là view chỉ đọc trên dữ liệu gốc (sliding_window_view), không sao
+        chép N x sequence_length phần tử; sao chép (np.array) trước nếu cần sửa X.
+        """
+        with span("create_sequences", draws=len(data), sequence_length=sequence_length):
+            X = sliding_windows(data, sequence_length)
+            y = window_targets(data, sequence_length)
         
-        return np.array(X), np.array(y)
+        return X, y
+    
+    def _encode_labels(self, labels, num_classes, sparse_labels):
+        """Nhãn lớp dạng số nguyên (sparse) hoặc one-hot cho categorical_crossentropy"""
+        # Cắt phần thập phân giống to_categorical để hai chế độ cho cùng nhãn
+        labels = np.asarray(labels).astype(np.int64)
+        if sparse_labels:
+            return labels.astype(np.int32)
+        return tf.keras.utils.to_categorical(labels, num_classes=num_classes)
     
-    def prepare_raw_numbers_data(self, sequence_length=10):
-        """Chuẩn bị dữ liệu cho dự đoán số nguyên"""
+    def prepare_raw_numbers_data(self, sequence_length=10, sparse_labels=False):
+        """Chuẩn bị dữ liệu cho dự đoán số nguyên
+        
+        sparse_labels=True trả về y là chỉ số lớp (int32) thay vì one-hot 1000 cột.
+        """
         numbers = self.load_data()
         
         # Chuẩn hóa dữ liệu về khoảng [0, 1]
@@ -63,75 +83,89 @@ class LotteryDataProcessor:
         numbers_normalized = self.scaler.fit_transform(numbers_array).flatten()
         
         # Tạo chuỗi
+        self.series = numbers_normalized
         X, y = self.create_sequences(numbers_normalized, sequence_length)
         
-        # Chuyển đổi y về dạng one-hot encoding cho 1000 số (000-999)
-        y_one_hot = tf.keras.utils.to_categorical(y * 999, num_classes=1000)
+        # Chuyển đổi y về nhãn lớp cho 1000 số (000-999)
+        y_labels = self._encode_labels(y * 999, 1000, sparse_labels)
         
-        return X, y_one_hot, self.scaler
+        return X, y_labels, self.scaler
     
-    def prepare_sum_data(self, sequence_length=10):
+    def prepare_sum_data(self, sequence_length=10, sparse_labels=False):
         """Chuẩn bị dữ liệu cho dự đoán tổng các chữ số"""
         numbers = self.load_data()
         
-        # Tính tổng các chữ số
-        sums = []
-        for num in numbers:
-            digit_sum = sum(int(digit) for digit in str(num).zfill(3))
-            sums.append(digit_sum)
+        # Tính tổng các chữ số (vector hóa trên toàn bộ lịch sử)
+        sums = digit_sums(numbers)
         
         # Chuẩn hóa dữ liệu
-        sums_array = np.array(sums).reshape(-1, 1)
+        sums_array = sums.reshape(-1, 1)
         sums_normalized = self.scaler.fit_transform(sums_array).flatten()
         
         # Tạo chuỗi
+        self.series = sums_normalized
         X, y = self.create_sequences(sums_normalized, sequence_length)
         
-        # Chuyển đổi y về dạng one-hot encoding cho 28 số (0-27)
-        y_one_hot = tf.keras.utils.to_categorical(y * 27, num_classes=28)
+        # Chuyển đổi y về nhãn lớp cho 28 số (0-27)
+        y_labels = self._encode_labels(y * 27, 28, sparse_labels)
         
-        return X, y_one_hot, self.scaler
+        return X, y_labels, self.scaler
     
-    def prepare_counts_data(self, sequence_length=10):
+    def prepare_counts_data(self, sequence_length=10, sparse_labels=False):
         """Chuẩn bị dữ liệu cho dự đoán số lần xuất hiện của từng chữ số"""
         numbers = self.load_data()
         
-        # Đếm số lần xuất hiện của từng chữ số (0-9)
-        digit_counts = []
-        for num in numbers:
-            digits = [int(d) for d in str(num).zfill(3)]
-            counts = [digits.count(i) for i in range(10)]
-            digit_counts.append(counts)
+        # Đếm số lần xuất hiện của từng chữ số (0-9), vector hóa bằng bincount
+        counts = digit_counts(numbers)
         
         # Chuẩn hóa dữ liệu
-        digit_counts_normalized = self.scaler.fit_transform(digit_counts)
+        digit_counts_normalized = self.scaler.fit_transform(counts)
         
         # Tạo chuỗi
+        self.series = digit_counts_normalized
         X, y = self.create_sequences(digit_counts_normalized, sequence_length)
         
-        # Chuyển đổi y về dạng one-hot encoding cho 10 số (0-9)
+        # Chuyển đổi y về nhãn lớp cho 10 số (0-9)
         # Lấy chữ số xuất hiện nhiều nhất làm target (trước khi chuẩn hóa)
         y_digit = np.argmax(y, axis=1)
-        y_one_hot = tf.keras.utils.to_categorical(y_digit, num_classes=10)
+        y_labels = self._encode_labels(y_digit, 10, sparse_labels)
         
         print(f"Phân bố chữ số trong dữ liệu counts:")
         unique, counts = np.unique(y_digit, return_counts=True)
         for digit, count in zip(unique, counts):
             print(f"  Chữ số {digit}: {count} lần")
         
-        return X, y_one_hot, self.scaler
+        return X, y_labels, self.scaler
 
 class LotteryLSTMModel:
     """Mô hình LSTM cho dự đoán xổ số"""
     
-    def __init__(self, input_shape, output_shape, model_type="raw_numbers"):
+    def __init__(self, input_shape, output_shape, model_type="raw_numbers", sparse_labels=False,
+                 head="softmax"):
         self.input_shape = input_shape
         self.output_shape = output_shape
         self.model_type = model_type
+        # sparse_labels=True: nhãn là chỉ số lớp, dùng sparse_categorical_crossentropy
+        self.sparse_labels = sparse_labels
+        # head: "softmax" (Dense 1000 lớp), "digits" (3 softmax 10 lớp) hoặc "digits_chained"
+        if head not in HEADS:
+            raise ValueError(f"Đầu ra không hợp lệ: {head}")
+        if head != "softmax" and (model_type != "raw_numbers" or not sparse_labels):
+            raise ValueError("Đầu ra theo chữ số chỉ dùng cho raw_numbers với sparse_labels=True")
+        self.head = head
         self.model = None
         self.history = None
         self.scaler = None  # Thêm thuộc tính scaler
         
+    def _loss_name(self):
+        """Hàm loss theo dạng nhãn (mô hình giữ nguyên kiến trúc)"""
+        if self.head != "softmax":
+            # Ba loss sparse, một cho mỗi chữ số; tổng là -log P(số)
+            return {name: 'sparse_categorical_crossentropy' for name in OUTPUT_NAMES}
+        if self.sparse_labels:
+            return 'sparse_categorical_crossentropy'
+        return 'categorical_crossentropy'
+    
     def build_model(self, lstm_units=128, dropout_rate=0.3):
         """Xây dựng mô hình LSTM"""
         if self.model_type == "counts":
@@ -139,7 +173,7 @@ class LotteryLSTMModel:
             dropout_rate = 0.5  # Tăng dropout cho counts
             lstm_units = 64     # Giảm units để tránh overfitting
             
-            model = keras.Sequential([
+            trunk = [
                 # Input layer với noise
                 layers.GaussianNoise(0.1, input_shape=self.input_shape),
                 
@@ -167,15 +201,13 @@ class LotteryLSTMModel:
                            kernel_regularizer=keras.regularizers.l2(0.01)),
                 layers.Dropout(dropout_rate),
                 layers.BatchNormalization(),
-                
-                layers.Dense(self.output_shape, activation='softmax')
-            ])
+            ]
         else:
             # Kiến trúc cải tiến cho raw_numbers và sum
             dropout_rate = 0.4  # Tăng dropout
             lstm_units = 96     # Giảm units để tránh overfitting
             
-            model = keras.Sequential([
+            trunk = [
                 # Input layer với noise nhẹ
                 layers.GaussianNoise(0.05, input_shape=self.input_shape),
                 
@@ -203,9 +235,12 @@ class LotteryLSTMModel:
                            kernel_regularizer=keras.regularizers.l2(0.005)),
                 layers.Dropout(dropout_rate),
                 layers.BatchNormalization(),
-                
-                layers.Dense(self.output_shape, activation='softmax')
-            ])
+            ]
+        
+        if self.head == "softmax":
+            model = keras.Sequential(trunk + [layers.Dense(self.output_shape, activation='softmax')])
+        else:
+            model = self._build_digit_model(trunk)
         
         # Compile model với class weights nếu là counts
         if self.model_type == "counts":
@@ -219,7 +254,7 @@ class LotteryLSTMModel:
             
             model.compile(
                 optimizer=optimizer,
-                loss='categorical_crossentropy',
+                loss=self._loss_name(),
                 metrics=['accuracy']  # Chỉ sử dụng accuracy cơ bản
             )
         else:
@@ -233,19 +268,34 @@ class LotteryLSTMModel:
             
             model.compile(
                 optimizer=optimizer,
-                loss='categorical_crossentropy',
-                metrics=['accuracy']
+                loss=self._loss_name(),
+                metrics=['accuracy'] if self.head == "softmax" else {name: ['accuracy'] for name in OUTPUT_NAMES}
             )
         
         self.model = model
         return model
     
-    def train(self, X_train, y_train, X_val, y_val, epochs=100, batch_size=32):
-        """Huấn luyện mô hình"""
-        if self.model is None:
-            self.build_model()
-        
-        # Callbacks
+    def _build_digit_model(self, trunk):
+        """Mô hình functional: cùng phần LSTM, đầu ra là ba softmax 10 lớp (DigitHead)
+        
+        Với digits_chained, mô hình nhận thêm hai chữ số đầu thật của nhãn
+        (teacher forcing) để học P(chục | trăm) và P(đơn vị | trăm, chục).
+        """
+        window = keras.Input(shape=self.input_shape, name="window")
+        h = window
+        for layer in trunk:
+            h = layer(h)
+        
+        head = DigitHead(chained=self.head == "digits_chained", name="digit_head")
+        if head.chained:
+            previous = keras.Input(shape=(2,), dtype="int32", name="previous_digits")
+            inputs, outputs = [window, previous], head([h, previous])
+        else:
+            inputs, outputs = window, head(h)
+        return keras.Model(inputs, dict(zip(OUTPUT_NAMES, outputs)))
+    
+    def _training_callbacks(self):
+        """Callbacks dùng chung cho mọi cách huấn luyện"""
         early_stopping = keras.callbacks.EarlyStopping(
             monitor='val_loss',
             patience=15,
@@ -259,133 +309,157 @@ class LotteryLSTMModel:
             min_lr=1e-7
         )
         
-        # Training với class weights nếu là counts
+        return [early_stopping, reduce_lr]
+    
+    def _class_weight_dict(self, y_train):
+        """Class weights thực tế (balanced) từ nhãn huấn luyện"""
+        from sklearn.utils.class_weight import compute_class_weight # type: ignore
+        y_train_labels = y_train if self.sparse_labels else np.argmax(y_train, axis=1)
+        class_weights = compute_class_weight(
+            'balanced',
+            classes=np.unique(y_train_labels),
+            y=y_train_labels
+        )
+        return dict(zip(range(10), class_weights))
+    
+    def train_streaming(self, series, targets, train_indices, val_indices,
+                        sequence_length, epochs=100, batch_size=32):
+        """Huấn luyện từ pipeline tf.data thay vì mảng đã augmentation sẵn
+        
+        Cửa sổ được gather từ series theo chỉ số, augmentation (nhiễu và
+        xoay) được áp dụng theo từng batch và sinh mới ở mỗi epoch.
+        """
+        if self.model is None:
+            self.build_model()
+        
+        class_weight_dict = None
         if self.model_type == "counts":
-            # Tính class weights thực tế từ dữ liệu
-            from sklearn.utils.class_weight import compute_class_weight # type: ignore
-            y_train_labels = np.argmax(y_train, axis=1)
-            class_weights = compute_class_weight(
-                'balanced',
-                classes=np.unique(y_train_labels),
-                y=y_train_labels
-            )
-            class_weight_dict = dict(zip(range(10), class_weights))
-            
+            class_weight_dict = self._class_weight_dict(np.take(targets, train_indices, axis=0))
             print(f"Class weights thực tế: {class_weight_dict}")
-            
-            # Data augmentation cho counts
-            X_train_aug, y_train_aug = self._augment_counts_data(X_train, y_train)
-            print(f"Dữ liệu sau augmentation: {X_train_aug.shape}")
-            
             # Giảm epochs cho counts để tránh overfitting
-            counts_epochs = min(epochs, 50)
-            print(f"Sử dụng {counts_epochs} epochs cho counts")
-            
-            self.history = self.model.fit(
-                X_train_aug, y_train_aug,
-                validation_data=(X_val, y_val),
-                epochs=counts_epochs,
-                batch_size=batch_size,
-                callbacks=[early_stopping, reduce_lr],
-                class_weight=class_weight_dict,
-                verbose=1
-            )
+            train_epochs = min(epochs, 50)
         else:
-            # Data augmentation nhẹ cho raw_numbers và sum
-            X_train_aug, y_train_aug = self._augment_other_data(X_train, y_train)
-            print(f"Dữ liệu sau augmentation: {X_train_aug.shape}")
-            
             # Giảm epochs để tránh overfitting
-            other_epochs = min(epochs, 80)
-            print(f"Sử dụng {other_epochs} epochs cho {self.model_type}")
-            
-            self.history = self.model.fit(
-                X_train_aug, y_train_aug,
-                validation_data=(X_val, y_val),
-                epochs=other_epochs,
-                batch_size=batch_size,
-                callbacks=[early_stopping, reduce_lr],
-                verbose=1
+            train_epochs = min(epochs, 80)
+        print(f"Sử dụng {train_epochs} epochs cho {self.model_type}")
+        
+        # Nhiễu và xoay được áp dụng theo batch bên trong từng epoch; span này
+        # chỉ đo việc dựng pipeline augmentation
+        with span("augmentation", model_type=self.model_type, windows=len(train_indices)):
+            train_dataset = make_training_dataset(
+                series, targets, train_indices, sequence_length,
+                batch_size=batch_size, model_type=self.model_type,
+                class_weight=class_weight_dict, head=self.head
             )
+        val_dataset = make_training_dataset(
+            series, targets, val_indices, sequence_length,
+            batch_size=batch_size, model_type=self.model_type,
+            augment=False, shuffle=False, head=self.head
+        )
+        
+        self.history = self.model.fit(
+            train_dataset,
+            validation_data=val_dataset,
+            epochs=train_epochs,
+            callbacks=self._training_callbacks() + keras_callbacks("train"),
+            verbose=1
+        )
         
         return self.history
     
-    def _augment_counts_data(self, X, y):
-        """Data augmentation cho dữ liệu counts"""
-        if self.model_type != "counts":
-            return X, y
-        
-        print("Đang thực hiện data augmentation cho counts...")
-        
-        # Tạo dữ liệu mới bằng cách thêm noise nhỏ
-        X_aug = []
-        y_aug = []
-        
-        # Thêm dữ liệu gốc
-        X_aug.extend(X)
-        y_aug.extend(y)
-        
-        # Tạo dữ liệu mới với noise
-        for i in range(len(X)):
-            # Thêm noise nhỏ vào input
-            noise = np.random.normal(0, 0.01, X[i].shape)
-            X_noisy = X[i] + noise
-            X_noisy = np.clip(X_noisy, 0, 1)  # Giữ trong khoảng [0, 1]
-            
-            X_aug.append(X_noisy)
-            y_aug.append(y[i])
-        
-        # Thêm dữ liệu với rotation nhỏ
-        for i in range(len(X) // 2):  # Chỉ lấy một nửa để tránh quá nhiều
-            # Xoay chuỗi một chút
-            X_rotated = np.roll(X[i], shift=np.random.randint(-2, 3), axis=0)
-            X_aug.append(X_rotated)
-            y_aug.append(y[i])
-        
-        return np.array(X_aug), np.array(y_aug)
+    @classmethod
+    def from_saved(cls, model_path, model_type="raw_numbers", sparse_labels=False):
+        """Tải mô hình đã lưu (.keras, kèm trạng thái optimizer) để huấn luyện tiếp"""
+        model = keras.models.load_model(model_path)
+        digit_head = find_digit_head(model)
+        if digit_head is None:
+            head, output_shape = "softmax", model.output_shape[-1]
+        else:
+            head, output_shape = ("digits_chained" if digit_head.chained else "digits"), 1000
+        builder = cls(
+            input_shape=tuple(window_input(model).shape[1:]),
+            output_shape=output_shape,
+            model_type=model_type,
+            sparse_labels=sparse_labels,
+            head=head
+        )
+        builder.model = model
+        return builder
     
-    def _augment_other_data(self, X, y):
-        """Data augmentation nhẹ cho raw_numbers và sum"""
-        if self.model_type == "counts":
-            return X, y
-        
-        print(f"Đang thực hiện data augmentation nhẹ cho {self.model_type}...")
-        
-        # Tạo dữ liệu mới bằng cách thêm noise nhỏ
-        X_aug = []
-        y_aug = []
+    def fine_tune(self, series, targets, train_indices, val_indices,
+                  sequence_length, epochs=3, batch_size=32):
+        """Huấn luyện tiếp (warm-start) vài epoch trên cửa sổ mới + mẫu replay
         
-        # Thêm dữ liệu gốc
-        X_aug.extend(X)
-        y_aug.extend(y)
+        Dùng lại trọng số và trạng thái optimizer của mô hình đã tải, nên chỉ
+        cần vài epoch ngắn thay vì huấn luyện lại từ đầu trên toàn bộ lịch sử.
+        """
+        if self.model is None:
+            raise ValueError("Chưa có mô hình để huấn luyện tiếp")
         
-        # Tạo dữ liệu mới với noise nhỏ
-        for i in range(len(X)):
-            # Thêm noise nhỏ vào input
-            noise = np.random.normal(0, 0.005, X[i].shape)  # Noise nhỏ hơn counts
-            X_noisy = X[i] + noise
-            X_noisy = np.clip(X_noisy, 0, 1)  # Giữ trong khoảng [0, 1]
-            
-            X_aug.append(X_noisy)
-            y_aug.append(y[i])
+        class_weight_dict = None
+        if self.model_type == "counts":
+            class_weight_dict = self._class_weight_dict(np.take(targets, train_indices, axis=0))
+        
+        # Nhiễu và xoay được áp dụng theo batch bên trong từng epoch; span này
+        # chỉ đo việc dựng pipeline augmentation
+        with span("augmentation", model_type=self.model_type, windows=len(train_indices)):
+            train_dataset = make_training_dataset(
+                series, targets, train_indices, sequence_length,
+                batch_size=batch_size, model_type=self.model_type,
+                class_weight=class_weight_dict, head=self.head
+            )
+        val_dataset = make_training_dataset(
+            series, targets, val_indices, sequence_length,
+            batch_size=batch_size, model_type=self.model_type,
+            augment=False, shuffle=False, head=self.head
+        )
         
-        # Thêm dữ liệu với rotation nhỏ
-        for i in range(len(X) // 3):  # Chỉ lấy 1/3 để tránh quá nhiều
-            # Xoay chuỗi một chút
-            X_rotated = np.roll(X[i], shift=np.random.randint(-1, 2), axis=0)
-            X_aug.append(X_rotated)
-            y_aug.append(y[i])
+        self.history = self.model.fit(
+            train_dataset,
+            validation_data=val_dataset,
+            epochs=epochs,
+            callbacks=keras_callbacks("fine_tune"),
+            verbose=1
+        )
         
-        return np.array(X_aug), np.array(y_aug)
+        return self.history
+    
+    def evaluate(self, series, targets, indices, sequence_length, batch_size=32):
+        """(loss, accuracy) trên các cửa sổ cho trước, cho mọi loại đầu ra
+        
+        Với đầu ra theo chữ số, loss là tổng ba loss (-log P(số)) và accuracy
+        là tỉ lệ đoán đúng cả số (argmax của phân phối kết hợp 1000 lớp).
+        """
+        dataset = make_training_dataset(
+            series, targets, indices, sequence_length,
+            batch_size=batch_size, model_type=self.model_type,
+            augment=False, shuffle=False, head=self.head
+        )
+        if self.head == "softmax":
+            loss, accuracy = self.model.evaluate(dataset, verbose=0)
+            return loss, accuracy
+        
+        loss = self.model.evaluate(dataset, verbose=0, return_dict=True)["loss"]
+        predict_fn = joint_predict_fn(self.model)
+        windows = sliding_windows(series, sequence_length)
+        correct = 0
+        for start in range(0, len(indices), 1024):
+            batch = np.take(windows, indices[start:start + 1024], axis=0).astype(np.float32)
+            joint = predict_fn(tf.constant(batch.reshape(len(batch), sequence_length, -1))).numpy()
+            correct += int((joint.argmax(axis=-1) == np.take(targets, indices[start:start + 1024])).sum())
+        return loss, correct / max(len(indices), 1)
     
     def predict(self, X):
         """Dự đoán"""
         if self.model is None:
             raise ValueError("Mô hình chưa được huấn luyện")
+        if self.head != "softmax":
+            # Phân phối kết hợp 1000 lớp, cùng dạng với đầu ra softmax
+            return joint_predict_fn(self.model)(tf.constant(np.asarray(X, dtype=np.float32))).numpy()
         return self.model.predict(X)
     
-    def save_model(self, filepath):
-        """Lưu mô hình"""
+    def save_model(self, filepath, metadata=None):
+        """Lưu mô hình (và metadata huấn luyện nếu có)"""
         if self.model is None:
             raise ValueError("Mô hình chưa được huấn luyện")
         
@@ -393,16 +467,37 @@ class LotteryLSTMModel:
         if filepath.endswith('.h5'):
             filepath = filepath.replace('.h5', '.keras')
         
-        self.model.save(filepath)
+        with span("save_model", model_type=self.model_type):
+            self.model.save(filepath)
         print(f"Đã lưu mô hình tại: {filepath}")
         
         # Lưu thêm scaler để sử dụng sau này (nếu có)
         if self.scaler is not None:
-            scaler_path = filepath.replace('.keras', '_scaler.npy')
-            np.save(scaler_path, self.scaler, allow_pickle=True)
+            # Lưu tham số dạng JSON (không cần sklearn/pickle khi dự đoán)
+            scaler = self.scaler
+            if not isinstance(scaler, LotteryScaler):
+                scaler = LotteryScaler.from_sklearn(scaler)
+            scaler_path = scaler_path_for(filepath)
+            scaler.save(scaler_path)
             print(f"Đã lưu scaler tại: {scaler_path}")
         else:
             print("⚠️  Cảnh báo: Không có scaler để lưu")
+        
+        # Metadata dùng cho lần huấn luyện tăng dần tiếp theo
+        meta_path = None
+        if metadata is not None:
+            meta_path = metadata_path_for(filepath)
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, ensure_ascii=False, indent=2)
+            print(f"Đã lưu metadata tại: {meta_path}")
+        
+        # Đăng ký vào registry để tra cứu mô hình mới nhất và scaler tương ứng
+        ModelRegistry().register(
+            filepath, self.model_type,
+            scaler_path=scaler_path if self.scaler is not None else None,
+            metadata_path=meta_path, metadata=metadata
+        )
+        print("Đã đăng ký mô hình vào registry")
     
     def plot_training_history(self):
         """Vẽ biểu đồ quá trình huấn luyện"""
@@ -410,6 +505,9 @@ class LotteryLSTMModel:
             print("Chưa có lịch sử huấn luyện")
             return
         
+        # Chỉ import matplotlib khi thực sự vẽ biểu đồ
+        import matplotlib.pyplot as plt # type: ignore
+        
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 5))
         
         # Loss
@@ -421,9 +519,11 @@ class LotteryLSTMModel:
         ax1.legend()
         ax1.grid(True)
         
-        # Accuracy
-        ax2.plot(self.history.history['accuracy'], label='Training Accuracy')
-        ax2.plot(self.history.history['val_accuracy'], label='Validation Accuracy')
+        # Accuracy (đầu ra theo chữ số: một đường cho mỗi chữ số)
+        prefixes = [""] if self.head == "softmax" else [f"{name}_" for name in OUTPUT_NAMES]
+        for prefix in prefixes:
+            ax2.plot(self.history.history[f'{prefix}accuracy'], label=f'Training {prefix}Accuracy')
+            ax2.plot(self.history.history[f'val_{prefix}accuracy'], label=f'Validation {prefix}Accuracy')
         ax2.set_title('Model Accuracy')
         ax2.set_xlabel('Epoch')
         ax2.set_ylabel('Accuracy')
@@ -433,50 +533,133 @@ class LotteryLSTMModel:
         plt.tight_layout()
         plt.show()
 
+def metadata_path_for(model_path):
+    """Đường dẫn file metadata (.json) đi kèm một file mô hình"""
+    base_path = model_path.replace('.keras', '').replace('.h5', '')
+    return f"{base_path}_meta.json"
+
+def load_model_metadata(model_path):
+    """Đọc metadata của mô hình, trả về None nếu không có hoặc lỗi"""
+    try:
+        with open(metadata_path_for(model_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def find_latest_model_file(model_type):
+    """File mô hình mới nhất của một loại dự đoán theo registry (None nếu chưa có)"""
+    entry = ModelRegistry().latest(model_type)
+    return entry["model_path"] if entry else None
+
+def training_cache_key(numbers, params):
+    """Khóa cache huấn luyện: hash nội dung dãy số + siêu tham số
+    
+    Cùng dữ liệu và cùng cấu hình (SEQUENCE_LENGTH, EPOCHS, ...) cho cùng
+    khóa, nên có thể dùng lại mô hình đã huấn luyện thay vì huấn luyện lại.
+    """
+    payload = json.dumps({"data": content_hash(numbers), "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def find_model_by_cache_key(model_type, cache_key):
+    """File mô hình đã huấn luyện với đúng khóa cache (None nếu chưa có)"""
+    matches = ModelRegistry().find(model_type, cache_key=cache_key)
+    return matches[0]["model_path"] if matches else None
+
+def choose_training_mode(metadata, config, num_draws, scaler, full_retrain_every=7):
+    """Chọn huấn luyện tăng dần hay huấn luyện lại toàn bộ
+    
+    Trả về (chế độ, lý do). Huấn luyện lại toàn bộ khi: chưa có mô hình
+    hoặc metadata, cấu hình (SEQUENCE_LENGTH, loại nhãn...) thay đổi, khoảng
+    chuẩn hóa của scaler thay đổi, dữ liệu bị rút ngắn/sửa, hoặc đã đủ
+    `full_retrain_every` lần tăng dần kể từ lần huấn luyện toàn bộ gần nhất.
+    """
+    if metadata is None:
+        return "full", "chưa có mô hình trước hoặc thiếu metadata"
+    
+    for key, value in config.items():
+        if metadata.get("config", {}).get(key) != value:
+            return "full", f"cấu hình '{key}' đã thay đổi"
+    # Loại đầu ra chỉ ghi vào cấu hình khi khác softmax
+    if metadata.get("config", {}).get("head", "softmax") != config.get("head", "softmax"):
+        return "full", "cấu hình 'head' đã thay đổi"
+    
+    scaler_range = [np.asarray(scaler.data_min_).tolist(), np.asarray(scaler.data_max_).tolist()]
+    if metadata.get("scaler_range") != scaler_range:
+        return "full", "khoảng chuẩn hóa của scaler đã thay đổi"
+    
+    if num_draws < metadata.get("num_draws", 0):
+        return "full", "dữ liệu ít hơn lần huấn luyện trước"
+    
+    if metadata.get("incremental_runs", 0) >= full_retrain_every:
+        return "full", f"đến lịch huấn luyện lại toàn bộ (sau {full_retrain_every} lần tăng dần)"
+    
+    return "incremental", f"{num_draws - metadata.get('num_draws', 0)} kết quả mới"
+
+def split_indices(num_windows, validation_fraction=0.2):
+    """Chia cửa sổ thành (train, validation) cố định theo chỉ số cửa sổ
+    
+    Cửa sổ i thuộc tập validation khi hash nhân (Knuth) của i rơi vào phần
+    validation_fraction đầu của [0, 2^32). Khác train_test_split xáo trộn
+    lại mỗi khi số cửa sổ thay đổi, một cửa sổ luôn giữ nguyên tập của nó
+    khi lịch sử dài thêm, nên val_loss và kiểm tra drift chỉ tính trên các
+    cửa sổ mà mọi mô hình trước đó chưa từng huấn luyện.
+    """
+    indices = np.arange(num_windows, dtype=np.uint64)
+    buckets = (indices * np.uint64(2654435761)) % np.uint64(1 << 32)
+    is_validation = buckets < np.uint64(int(validation_fraction * (1 << 32)))
+    return np.flatnonzero(~is_validation), np.flatnonzero(is_validation)
+
+def incremental_indices(previous_draws, sequence_length, num_windows, train_indices, replay_size, seed=42):
+    """Chỉ số cửa sổ cho một lần huấn luyện tăng dần
+    
+    Cửa sổ i chứa các kết quả i..i+sequence_length (kể cả giá trị đích),
+    nên các cửa sổ chạm vào kết quả mới là i >= previous_draws - sequence_length.
+    Các cửa sổ mới thuộc tập huấn luyện được huấn luyện (cửa sổ mới thuộc
+    tập validation vẫn được giữ lại để đánh giá), cộng thêm một mẫu replay
+    ngẫu nhiên từ các cửa sổ cũ trong tập huấn luyện để mô hình không quên
+    lịch sử.
+    Trả về (chỉ số cửa sổ mới, chỉ số dùng để huấn luyện tiếp).
+    """
+    first_new = min(max(previous_draws - sequence_length, 0), num_windows)
+    train_indices = np.asarray(train_indices)
+    new_indices = train_indices[train_indices >= first_new]
+    
+    old_indices = train_indices[train_indices < first_new]
+    rng = np.random.default_rng(seed)
+    replay_size = min(replay_size, len(old_indices))
+    replay_indices = rng.choice(old_indices, size=replay_size, replace=False)
+    return new_indices, np.concatenate([new_indices, replay_indices])
+
 def cleanup_old_models(model_type, keep_latest=True):
-    """Xóa các model cũ, chỉ giữ lại model mới nhất"""
+    """Xóa các model cũ, chỉ giữ lại model mới nhất (theo registry)"""
     print(f"\n🧹 Đang dọn dẹp model cũ cho {model_type}...")
     
     try:
-        # Tìm tất cả file model và scaler
-        model_pattern = f"lottery_model_{model_type}_*.keras"
-        scaler_pattern = f"lottery_model_{model_type}_*_scaler.npy"
+        registry = ModelRegistry()
+        entries = registry.entries(model_type)
         
-        model_files = glob.glob(model_pattern)
-        scaler_files = glob.glob(scaler_pattern)
+        print(f"📁 Tìm thấy {len(entries)} model trong registry")
         
-        print(f"📁 Tìm thấy {len(model_files)} file model và {len(scaler_files)} file scaler")
-        
-        if len(model_files) <= 1:
+        if len(entries) <= 1 and keep_latest:
             print("✅ Chỉ có 1 model hoặc không có model, không cần dọn dẹp")
             return
         
-        # Sắp xếp theo thời gian tạo (mới nhất trước)
-        model_files.sort(key=os.path.getmtime, reverse=True)
-        scaler_files.sort(key=os.path.getmtime, reverse=True)
-        
-        # Xóa tất cả model cũ (trừ model mới nhất nếu keep_latest=True)
-        files_to_delete = []
-        
+        # Registry đã sắp xếp mới nhất trước
         if keep_latest:
-            # Giữ lại model mới nhất
-            files_to_delete.extend(model_files[1:])
-            files_to_delete.extend(scaler_files[1:])
-            print(f"📌 Giữ lại model mới nhất: {os.path.basename(model_files[0])}")
+            entries_to_delete = entries[1:]
+            print(f"📌 Giữ lại model mới nhất: {os.path.basename(entries[0]['model_path'])}")
         else:
-            # Xóa tất cả
-            files_to_delete.extend(model_files)
-            files_to_delete.extend(scaler_files)
+            entries_to_delete = entries
         
-        # Xóa các file
+        # Xóa mô hình cùng scaler và metadata đi kèm
         deleted_count = 0
-        for file_path in files_to_delete:
+        for entry in entries_to_delete:
             try:
-                os.remove(file_path)
-                print(f"🗑️  Đã xóa: {os.path.basename(file_path)}")
-                deleted_count += 1
+                for file_path in registry.remove(entry["model_path"]):
+                    print(f"🗑️  Đã xóa: {os.path.basename(file_path)}")
+                    deleted_count += 1
             except Exception as e:
-                print(f"❌ Không thể xóa {os.path.basename(file_path)}: {str(e)}")
+                print(f"❌ Không thể xóa {os.path.basename(entry['model_path'])}: {str(e)}")
         
         print(f"✅ Đã xóa {deleted_count} file cũ")
         
@@ -486,155 +669,159 @@ def cleanup_old_models(model_type, keep_latest=True):
 class LotteryPredictor:
     """Lớp dự đoán xổ số"""
     
-    def __init__(self, model, scaler, model_type):
+    def __init__(self, model, scaler, model_type, stateful=False):
         self.model = model
         self.scaler = scaler
         self.model_type = model_type
+        # stateful=True: giữ trạng thái LSTM giữa các bước thay vì chạy lại cả cửa sổ
+        self.stateful = stateful
+        # Phiên suy luận dùng chung với các script dự đoán
+        self.session = LotterySession(model, scaler)
     
-    def predict_next_numbers(self, recent_numbers, num_predictions=5):
-        """Dự đoán số tiếp theo"""
+    def predict_next_numbers(self, recent_numbers, num_predictions=5, rng=None):
+        """Dự đoán số tiếp theo
+        
+        rng: numpy.random.Generator của chuỗi này (hoặc seed); cùng luồng cho cùng kết quả.
+        """
+        rng = np.random.default_rng(rng)
         if self.model_type == "raw_numbers":
-            return self._predict_raw_numbers(recent_numbers, num_predictions)
+            return self._predict_raw_numbers(recent_numbers, num_predictions, rng)
         elif self.model_type == "sum":
-            return self._predict_sum(recent_numbers, num_predictions)
+            return self._predict_sum(recent_numbers, num_predictions, rng)
         elif self.model_type == "counts":
-            return self._predict_counts(recent_numbers, num_predictions)
+            return self._predict_counts(recent_numbers, num_predictions, rng)
         else:
             raise ValueError("Loại dự đoán không hợp lệ")
     
-    def _predict_raw_numbers(self, recent_numbers, num_predictions):
+    def _predict_raw_numbers(self, recent_numbers, num_predictions, rng):
         """Dự đoán số nguyên với randomness"""
-        # Chuẩn hóa dữ liệu đầu vào
-        numbers_normalized = self.scaler.transform(np.array(recent_numbers).reshape(-1, 1)).flatten()
+        if self.stateful:
+            return self._predict_raw_numbers_stateful(recent_numbers, num_predictions, rng)
         
-        # Dự đoán với randomness
-        predictions = []
-        current_sequence = numbers_normalized[-10:].reshape(1, 10, 1)
+        # Lấy mẫu qua phiên dùng chung (hàm predict đã biên dịch)
+        return self.session.sample(num_predictions, chains=1, seed=rng, recent_numbers=recent_numbers,
+                                   temperature=1.5, top_k=5)[0]
+    
+    def _predict_raw_numbers_stateful(self, recent_numbers, num_predictions, rng):
+        """Dự đoán số nguyên theo từng bước, giữ trạng thái LSTM giữa các lần rút"""
+        step_model = self.session.step_model
         
+        # Chuẩn hóa và mồi trạng thái một lần trên cửa sổ gần nhất
+        sequence_length = self.session.sequence_length
+        numbers_normalized = normalize(recent_numbers, self.scaler)
+        pred = step_model.prime(numbers_normalized[-sequence_length:].reshape(1, -1, 1))
+        
+        predictions = []
         for _ in range(num_predictions):
-            pred = self.model.predict(current_sequence, verbose=0)
-            
-            # Sử dụng temperature scaling để tăng randomness
-            temperature = 1.5
-            pred_scaled = pred[0] / temperature
-            pred_probs = np.exp(pred_scaled) / np.sum(np.exp(pred_scaled))
-            
-            # Lấy top 5 predictions và chọn ngẫu nhiên
-            top_5_indices = np.argsort(pred_probs)[-5:][::-1]
-            top_5_probs = pred_probs[top_5_indices]
-            
-            # Chọn ngẫu nhiên từ top 5 với xác suất tương ứng
-            chosen_idx = np.random.choice(top_5_indices, p=top_5_probs/np.sum(top_5_probs))
+            # Temperature scaling (1.5) và chọn ngẫu nhiên trong top 5
+            pred_probs = temperature_softmax(pred, 1.5)
+            chosen_idx = sample_top_k(pred_probs, 5, rng)[0]
             pred_normalized = chosen_idx / 999.0
             
-            # Chuyển về số nguyên
-            pred_original = int(self.scaler.inverse_transform([[pred_normalized]])[0][0])
+            pred_original = int(index_to_value(chosen_idx, self.scaler, 999.0))
             predictions.append(pred_original)
             
-            # Cập nhật chuỗi
-            current_sequence = np.roll(current_sequence, -1, axis=1)
-            current_sequence[0, -1, 0] = pred_normalized
+            # Chỉ đưa giá trị mới vào, trạng thái LSTM được giữ lại
+            pred = step_model.step([pred_normalized])
         
         return predictions
     
-    def _predict_sum(self, recent_numbers, num_predictions):
+    def _predict_sum(self, recent_numbers, num_predictions, rng):
         """Dự đoán tổng các chữ số với randomness"""
         # Tính tổng các chữ số
-        sums = []
-        for num in recent_numbers:
-            digit_sum = sum(int(digit) for digit in str(num).zfill(3))
-            sums.append(digit_sum)
+        sums = digit_sums(recent_numbers)
         
         # Chuẩn hóa dữ liệu
-        sums_normalized = self.scaler.transform(np.array(sums).reshape(-1, 1)).flatten()
+        sums_normalized = normalize(sums, self.scaler)
         
         # Dự đoán với randomness
         predictions = []
-        current_sequence = sums_normalized[-10:].reshape(1, 10, 1)
+        sequence_length = self.session.sequence_length
+        current_sequence = sums_normalized[-sequence_length:].reshape(1, sequence_length, 1)
         
         for _ in range(num_predictions):
-            pred = self.model.predict(current_sequence, verbose=0)
+            pred = self.session.predict_fn(current_sequence.astype(np.float32)).numpy()
             
-            # Sử dụng temperature scaling để tăng randomness
-            temperature = 1.5
-            pred_scaled = pred[0] / temperature
-            pred_probs = np.exp(pred_scaled) / np.sum(np.exp(pred_scaled))
-            
-            # Lấy top 5 predictions và chọn ngẫu nhiên
-            top_5_indices = np.argsort(pred_probs)[-5:][::-1]
-            top_5_probs = pred_probs[top_5_indices]
-            
-            # Chọn ngẫu nhiên từ top 5 với xác suất tương ứng
-            chosen_idx = np.random.choice(top_5_indices, p=top_5_probs/np.sum(top_5_probs))
+            # Temperature scaling (1.5) và chọn ngẫu nhiên trong top 5
+            pred_probs = temperature_softmax(pred, 1.5)
+            chosen_idx = sample_top_k(pred_probs, 5, rng)[0]
             pred_normalized = chosen_idx / 27.0
             
             # Chuyển về tổng gốc
-            pred_original = int(self.scaler.inverse_transform([[pred_normalized]])[0][0])
+            pred_original = int(index_to_value(chosen_idx, self.scaler, 27.0))
             predictions.append(pred_original)
             
             # Cập nhật chuỗi
-            current_sequence = np.roll(current_sequence, -1, axis=1)
+            current_sequence[0, :-1] = current_sequence[0, 1:]
             current_sequence[0, -1, 0] = pred_normalized
         
         return predictions
     
-    def _predict_counts(self, recent_numbers, num_predictions):
+    def _predict_counts(self, recent_numbers, num_predictions, rng):
         """Dự đoán chữ số xuất hiện nhiều nhất tiếp theo"""
         # Đếm số lần xuất hiện của từng chữ số
-        digit_counts = []
-        for num in recent_numbers:
-            digits = [int(d) for d in str(num).zfill(3)]
-            counts = [digits.count(i) for i in range(10)]
-            digit_counts.append(counts)
+        counts = digit_counts(recent_numbers)
         
         # Chuẩn hóa dữ liệu
-        digit_counts_normalized = self.scaler.transform(digit_counts)
+        digit_counts_normalized = normalize(counts, self.scaler)
         
         # Dự đoán với randomness
         predictions = []
-        current_sequence = digit_counts_normalized[-10:].reshape(1, 10, 10)
+        sequence_length = self.session.sequence_length
+        current_sequence = digit_counts_normalized[-sequence_length:].reshape(1, sequence_length, 10)
         
         for i in range(num_predictions):
-            pred = self.model.predict(current_sequence, verbose=0)
-            
-            # Sử dụng temperature scaling để tăng randomness
-            temperature = 2.0
-            pred_scaled = pred[0] / temperature
-            pred_probs = np.exp(pred_scaled) / np.sum(np.exp(pred_scaled))
-            
-            # Lấy top 3 predictions và chọn ngẫu nhiên
-            top_3_indices = np.argsort(pred_probs)[-3:][::-1]
-            top_3_probs = pred_probs[top_3_indices]
+            pred = self.session.predict_fn(current_sequence.astype(np.float32)).numpy()
             
-            # Chọn ngẫu nhiên từ top 3 với xác suất tương ứng
-            chosen_idx = np.random.choice(top_3_indices, p=top_3_probs/np.sum(top_3_probs))
+            # Temperature scaling (2.0) và chọn ngẫu nhiên trong top 3
+            pred_probs = temperature_softmax(pred, 2.0)
+            chosen_idx = sample_top_k(pred_probs, 3, rng)[0]
             predictions.append(chosen_idx)
             
             # Cập nhật chuỗi (sử dụng one-hot encoding)
-            one_hot = np.zeros(10)
-            one_hot[chosen_idx] = 1
-            current_sequence = np.roll(current_sequence, -1, axis=1)
-            current_sequence[0, -1, :] = one_hot
+            current_sequence[0, :-1] = current_sequence[0, 1:]
+            current_sequence[0, -1, :] = 0
+            current_sequence[0, -1, chosen_idx] = 1
         
         return predictions
 
-def main():
-    """Hàm chính"""
+def main(numbers=None):
+    """Hàm chính
+    
+    numbers: dãy kết quả đã đọc sẵn (tùy chọn). Trả về dict loại dự đoán ->
+    {"model", "scaler", "model_path"} để bước dự đoán dùng lại trong cùng
+    tiến trình; "model" là None nếu dùng lại mô hình đã có (bỏ qua huấn luyện).
+    """
     print("=== MÔ HÌNH DỰ ĐOÁN XỔ SỐ SỬ DỤNG RNN-LSTM ===\n")
     
-    # Cấu hình
+    # Cấu hình (xem training_config.py, dùng chung với fingerprint của pipeline)
     DATA_FILE = "data-dacbiet.txt"
-    SEQUENCE_LENGTH = 10
-    EPOCHS = 100
-    BATCH_SIZE = 32
+    config = training_settings()
+    SEQUENCE_LENGTH = config["sequence_length"]
+    EPOCHS = config["epochs"]
+    BATCH_SIZE = config["batch_size"]
+    SPARSE_LABELS = config["sparse_labels"]
+    HEAD = config["head"]
+    
+    # Huấn luyện tăng dần
+    INCREMENTAL = config["incremental"]
+    FINE_TUNE_EPOCHS = config["fine_tune_epochs"]
+    REPLAY_SIZE = config["replay_size"]
+    FULL_RETRAIN_EVERY = config["full_retrain_every"]
+    DRIFT_WINDOWS = config["drift_windows"]
+    DRIFT_TOLERANCE = config["drift_tolerance"]
+    VALIDATION_FRACTION = config["validation_fraction"]
+    # Cách chia train/validation (ghi vào cấu hình: đổi cách chia -> huấn luyện lại toàn bộ)
+    VALIDATION_SPLIT = f"index-hash-{VALIDATION_FRACTION}"
     
     # Kiểm tra file dữ liệu
-    if not os.path.exists(DATA_FILE):
+    if numbers is None and not os.path.exists(DATA_FILE):
         print(f"Không tìm thấy file dữ liệu: {DATA_FILE}")
-        return
+        return {}
     
     # Xử lý dữ liệu
-    processor = LotteryDataProcessor(DATA_FILE)
+    processor = LotteryDataProcessor(DATA_FILE, numbers=numbers)
+    artifacts = {}
     
     # Danh sách các loại dự đoán - chỉ sử dụng raw_numbers
     prediction_types = ["raw_numbers"]
@@ -645,23 +832,39 @@ def main():
         print(f"{'='*50}")
         
         try:
+            # Bỏ qua nếu đã có mô hình huấn luyện trên đúng dữ liệu và cấu hình này
+            numbers = processor.load_data()
+            cache_key = training_cache_key(numbers, {
+                "model_type": pred_type,
+                "sequence_length": SEQUENCE_LENGTH,
+                "epochs": EPOCHS,
+                "batch_size": BATCH_SIZE,
+                "sparse_labels": SPARSE_LABELS,
+                "validation_split": VALIDATION_SPLIT,
+                **({"head": HEAD} if HEAD != "softmax" else {}),
+            })
+            cached_model = find_model_by_cache_key(pred_type, cache_key)
+            if cached_model is not None:
+                print(f"⏭️  Dữ liệu và cấu hình không đổi, dùng lại mô hình: {cached_model}")
+                artifacts[pred_type] = {"model": None, "scaler": None, "model_path": cached_model}
+                continue
+            
             # Chuẩn bị dữ liệu
             if pred_type == "raw_numbers":
-                X, y, scaler = processor.prepare_raw_numbers_data(SEQUENCE_LENGTH)
+                X, y, scaler = processor.prepare_raw_numbers_data(SEQUENCE_LENGTH, sparse_labels=SPARSE_LABELS)
                 output_shape = 1000
             elif pred_type == "sum":
-                X, y, scaler = processor.prepare_sum_data(SEQUENCE_LENGTH)
+                X, y, scaler = processor.prepare_sum_data(SEQUENCE_LENGTH, sparse_labels=SPARSE_LABELS)
                 output_shape = 28
             elif pred_type == "counts":
-                X, y, scaler = processor.prepare_counts_data(SEQUENCE_LENGTH)
+                X, y, scaler = processor.prepare_counts_data(SEQUENCE_LENGTH, sparse_labels=SPARSE_LABELS)
                 output_shape = 10
             
             print(f"Kích thước dữ liệu: X={X.shape}, y={y.shape}")
             
-            # Chia dữ liệu
-            X_train, X_val, y_train, y_val = train_test_split(
-                X, y, test_size=0.2, random_state=42
-            )
+            # Chia dữ liệu theo chỉ số cửa sổ (X là view, không sao chép); mỗi cửa
+            # sổ giữ nguyên tập train/validation khi có thêm kết quả mới
+            train_indices, val_indices = split_indices(len(y), VALIDATION_FRACTION)
             
             # Xây dựng mô hình
             if pred_type == "counts":
@@ -669,32 +872,111 @@ def main():
             else:
                 input_features = 1  # 1 feature cho raw_numbers và sum
             
-            model_builder = LotteryLSTMModel(
-                input_shape=(SEQUENCE_LENGTH, input_features),
-                output_shape=output_shape,
-                model_type=pred_type
-            )
+            num_draws = len(processor.series)
+            train_config = {
+                "model_type": pred_type,
+                "sequence_length": SEQUENCE_LENGTH,
+                "input_features": int(input_features),
+                "output_shape": output_shape,
+                "sparse_labels": SPARSE_LABELS,
+                "validation_split": VALIDATION_SPLIT,
+            }
+            if HEAD != "softmax":
+                train_config["head"] = HEAD
+            
+            # Chọn huấn luyện tăng dần hay huấn luyện lại toàn bộ
+            previous_model = find_latest_model_file(pred_type) if INCREMENTAL else None
+            metadata = load_model_metadata(previous_model) if previous_model else None
+            if INCREMENTAL:
+                mode, reason = choose_training_mode(metadata, train_config, num_draws, scaler,
+                                                    full_retrain_every=FULL_RETRAIN_EVERY)
+            else:
+                mode, reason = "full", "đã tắt huấn luyện tăng dần"
+            
+            model_builder = None
+            if mode == "incremental":
+                model_builder = LotteryLSTMModel.from_saved(previous_model, pred_type, SPARSE_LABELS)
+                
+                # Phát hiện drift: loss của mô hình cũ trên các cửa sổ validation gần
+                # nhất (mô hình cũ chưa huấn luyện trên chúng)
+                recent_indices = val_indices[-DRIFT_WINDOWS:]
+                recent_loss, _ = model_builder.evaluate(
+                    processor.series, y, recent_indices, SEQUENCE_LENGTH, batch_size=BATCH_SIZE
+                )
+                drift_limit = metadata.get("baseline_val_loss", metadata["val_loss"]) * (1 + DRIFT_TOLERANCE)
+                print(f"📉 Loss {len(recent_indices)} cửa sổ validation gần nhất: {recent_loss:.4f} "
+                      f"(ngưỡng drift: {drift_limit:.4f})")
+                if recent_loss > drift_limit:
+                    mode, reason = "full", "phát hiện drift trên dữ liệu gần đây"
+                    model_builder = None
+            
+            print(f"🔧 Chế độ huấn luyện: {mode} ({reason})")
+            
+            if mode == "incremental":
+                new_indices, fine_tune_indices = incremental_indices(
+                    metadata["num_draws"], SEQUENCE_LENGTH, len(y), train_indices, REPLAY_SIZE
+                )
+                print(f"\nHuấn luyện tiếp mô hình {pred_type} từ {os.path.basename(previous_model)}: "
+                      f"{len(new_indices)} cửa sổ mới + {len(fine_tune_indices) - len(new_indices)} cửa sổ replay")
+                history = model_builder.fine_tune(
+                    processor.series, y, fine_tune_indices, val_indices,
+                    SEQUENCE_LENGTH, epochs=FINE_TUNE_EPOCHS, batch_size=BATCH_SIZE
+                )
+            else:
+                model_builder = LotteryLSTMModel(
+                    input_shape=(SEQUENCE_LENGTH, input_features),
+                    output_shape=output_shape,
+                    model_type=pred_type,
+                    sparse_labels=SPARSE_LABELS,
+                    head=HEAD
+                )
+                
+                # Huấn luyện mô hình
+                print(f"\nBắt đầu huấn luyện mô hình {pred_type}...")
+                history = model_builder.train_streaming(
+                    processor.series, y, train_indices, val_indices,
+                    SEQUENCE_LENGTH, epochs=EPOCHS, batch_size=BATCH_SIZE
+                )
             
             # Lưu scaler vào model_builder
             model_builder.scaler = scaler
             
-            # Huấn luyện mô hình
-            print(f"\nBắt đầu huấn luyện mô hình {pred_type}...")
-            history = model_builder.train(
-                X_train, y_train, X_val, y_val,
-                epochs=EPOCHS, batch_size=BATCH_SIZE
-            )
-            
             # Đánh giá mô hình
-            val_loss, val_accuracy = model_builder.model.evaluate(X_val, y_val, verbose=0)
+            val_loss, val_accuracy = model_builder.evaluate(
+                processor.series, y, val_indices, SEQUENCE_LENGTH, batch_size=BATCH_SIZE
+            )
             print(f"\nKết quả huấn luyện:")
             print(f"Validation Loss: {val_loss:.4f}")
             print(f"Validation Accuracy: {val_accuracy:.4f}")
             
+            # Metadata cho lần huấn luyện tăng dần tiếp theo
+            now = datetime.now()
+            model_metadata = {
+                "config": train_config,
+                "cache_key": cache_key,
+                "dataset_hash": content_hash(numbers),
+                "num_draws": num_draws,
+                "scaler_range": [np.asarray(scaler.data_min_).tolist(), np.asarray(scaler.data_max_).tolist()],
+                "val_loss": float(val_loss),
+                "val_accuracy": float(val_accuracy),
+                "training_mode": mode,
+                "trained_at": now.isoformat(timespec="seconds"),
+            }
+            if mode == "incremental":
+                model_metadata["incremental_runs"] = metadata.get("incremental_runs", 0) + 1
+                model_metadata["last_full_retrain_at"] = metadata.get("last_full_retrain_at")
+                # Giữ mốc val_loss của lần huấn luyện toàn bộ để drift không trôi dần
+                model_metadata["baseline_val_loss"] = metadata.get("baseline_val_loss", metadata["val_loss"])
+            else:
+                model_metadata["incremental_runs"] = 0
+                model_metadata["last_full_retrain_at"] = model_metadata["trained_at"]
+                model_metadata["baseline_val_loss"] = float(val_loss)
+            
             # Lưu mô hình
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = now.strftime("%Y%m%d_%H%M%S")
             model_filename = f"lottery_model_{pred_type}_{timestamp}.keras"
-            model_builder.save_model(model_filename)
+            model_builder.save_model(model_filename, metadata=model_metadata)
+            artifacts[pred_type] = {"model": model_builder.model, "scaler": scaler, "model_path": model_filename}
             
             # Dọn dẹp model cũ sau khi train thành công
             cleanup_old_models(pred_type, keep_latest=True)
@@ -706,12 +988,12 @@ def main():
             print(f"\nDự đoán mẫu cho {pred_type}:")
             predictor = LotteryPredictor(model_builder.model, scaler, pred_type)
             
-            # Lấy 10 số gần nhất để dự đoán
-            recent_data = processor.load_data()[-10:]
+            # Lấy SEQUENCE_LENGTH số gần nhất để dự đoán
+            recent_data = processor.load_data()[-SEQUENCE_LENGTH:]
             
             if pred_type == "raw_numbers":
                 predictions = predictor.predict_next_numbers(recent_data, 255)
-                print(f"10 số gần nhất: {recent_data}")
+                print(f"{len(recent_data)} số gần nhất: {recent_data}")
                 print(f"255 số dự đoán tiếp theo (hiển thị 10 số đầu): {predictions[:10]}...")
                 print(f"Tổng cộng: {len(predictions)} số dự đoán")
             
@@ -722,6 +1004,8 @@ def main():
     print(f"\n{'='*50}")
     print("HOÀN THÀNH HUẤN LUYỆN TẤT CẢ MÔ HÌNH!")
     print(f"{'='*50}")
+    
+    return artifacts
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kernel lấy mẫu dùng chung: temperature softmax, top-k, chọn ngẫu nhiên và
+chuyển đổi chuẩn hóa/khôi phục theo MinMaxScaler, vector hóa theo batch
+"""
+
+import numpy as np # type: ignore
+
+def temperature_softmax(pred, temperature):
+    """Temperature scaling trên đầu ra của mô hình, áp dụng theo từng hàng
+
+    Giữ đúng công thức cũ của các predictor: exp(pred / T) chuẩn hóa lại.
+    pred có dạng (output,) hoặc (batch, output).
+    """
+    pred_scaled = np.asarray(pred, dtype=np.float64) / temperature
+    pred_scaled = pred_scaled - pred_scaled.max(axis=-1, keepdims=True)
+    exp_scaled = np.exp(pred_scaled)
+    return exp_scaled / exp_scaled.sum(axis=-1, keepdims=True)
+
+def tempered_log_probs(probs, temperature):
+    """Temperature scaling đúng nghĩa trên log-xác suất: log(p) / T
+
+    Khác temperature_softmax (exp(p / T) trên xác suất, gần như phẳng vì p
+    nằm trong [0, 1]), nên giữ được độ chênh giữa các lớp: softmax của kết
+    quả tỉ lệ với p^(1/T). Xác suất bằng 0 được chặn dưới để không ra -inf.
+    """
+    probs = np.asarray(probs, dtype=np.float64)
+    return np.log(np.maximum(probs, np.finfo(np.float64).tiny)) / temperature
+
+def top_k_indices(probs, k):
+    """Chỉ số của k xác suất lớn nhất mỗi hàng, sắp xếp giảm dần
+
+    Dùng argpartition (O(n)) thay vì argsort toàn bộ vector rồi chỉ sắp
+    xếp k phần tử được chọn.
+    """
+    probs = np.atleast_2d(probs)
+    k = min(k, probs.shape[-1])
+    top = np.argpartition(-probs, k - 1, axis=-1)[:, :k]
+    order = np.argsort(-np.take_along_axis(probs, top, axis=-1), axis=-1, kind='stable')
+    return np.take_along_axis(top, order, axis=-1)
+
+def chain_generators(seed, chains):
+    """Một numpy.random.Generator độc lập cho mỗi chuỗi
+
+    Các luồng được tách bằng SeedSequence(seed).spawn(chains): luồng của chuỗi
+    i chỉ phụ thuộc vào seed gốc và i, nên các chuỗi có thể chạy song song
+    (thread hoặc process) mà vẫn cho kết quả giống hệt với cùng seed gốc.
+    seed có thể là None, số nguyên, SeedSequence hoặc Generator (tách luồng con, Generator.spawn cần NumPy >= 1.25).
+    """
+    if isinstance(seed, np.random.Generator):
+        return seed.spawn(chains)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.default_rng(child) for child in seed.spawn(chains)]
+
+def sample_top_k(probs, k, rng=None, mask=None):
+    """Chọn ngẫu nhiên một chỉ số mỗi hàng trong top-k theo xác suất tương ứng
+
+    probs: (batch, output) hoặc (output,). mask (cùng dạng, bool) đánh dấu các
+    chỉ số bị loại (xác suất về 0) trước khi chọn top-k. rng là một
+    numpy.random.Generator dùng chung cho cả batch, hoặc danh sách Generator
+    (mỗi hàng một luồng riêng); mặc định là Generator mới không có seed.
+    Trả về mảng chỉ số dạng (batch,).
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    probs = np.array(np.atleast_2d(probs), dtype=np.float64)
+    if mask is not None:
+        probs[np.atleast_2d(mask)] = 0.0
+
+    top = top_k_indices(probs, k)
+    top_probs = np.take_along_axis(probs, top, axis=-1)
+    cumulative = np.cumsum(top_probs, axis=-1)
+    cumulative /= cumulative[:, -1:]
+
+    # Lấy mẫu theo hàm phân phối tích lũy: một số ngẫu nhiên cho mỗi hàng
+    if isinstance(rng, np.random.Generator):
+        u = rng.random(top.shape[0])
+    else:
+        u = np.array([row_rng.random() for row_rng in rng])
+    chosen = (u[:, np.newaxis] >= cumulative).sum(axis=-1)
+    chosen = np.minimum(chosen, top.shape[1] - 1)
+    return top[np.arange(top.shape[0]), chosen]
+
+def scaler_params(scaler):
+    """Tham số (min_, scale_) của MinMaxScaler: X_chuẩn = X * scale_ + min_
+
+    Với scaler một đặc trưng, trả về số vô hướng để giữ nguyên dạng đầu vào.
+    """
+    data_min = np.asarray(scaler.min_, dtype=np.float64)
+    scale = np.asarray(scaler.scale_, dtype=np.float64)
+    if data_min.size == 1:
+        return float(data_min[0]), float(scale[0])
+    return data_min, scale
+
+def normalize(values, scaler):
+    """Chuẩn hóa bằng công thức đóng, không qua scaler.transform"""
+    data_min, scale = scaler_params(scaler)
+    return np.asarray(values, dtype=np.float64) * scale + data_min
+
+def denormalize(values, scaler):
+    """Khôi phục giá trị gốc bằng công thức đóng, không qua inverse_transform"""
+    data_min, scale = scaler_params(scaler)
+    return (np.asarray(values, dtype=np.float64) - data_min) / scale
+
+def index_to_value(indices, scaler, max_index):
+    """Chỉ số lớp -> giá trị nguyên gốc (giống int(inverse_transform(idx / max_index)))"""
+    normalized = np.asarray(indices, dtype=np.float64) / max_index
+    return denormalize(normalized, scaler).astype(int)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scaler min-max thuần NumPy, lưu dưới dạng file tham số JSON nhỏ
+
+Thay cho MinMaxScaler của sklearn được lưu bằng pickle (_scaler.npy): chỉ
+cần data_min/data_max/scale/feature_range để áp dụng x * scale + min, nên
+các predictor không phải import sklearn hay giải tuần tự hóa pickle.
+File _scaler.npy cũ vẫn đọc được (chỉ khi đó mới cần sklearn).
+"""
+
+import os
+import json
+import numpy as np # type: ignore
+
+SCALER_FORMAT = "minmax"
+SCALER_VERSION = 1
+
+class LotteryScaler:
+    """Tương đương MinMaxScaler (cùng thuộc tính min_, scale_, data_min_, ...)"""
+
+    def __init__(self, feature_range=(0, 1)):
+        self.feature_range = tuple(feature_range)
+
+    def _set_params(self, data_min, data_max):
+        self.data_min_ = np.asarray(data_min, dtype=np.float64)
+        self.data_max_ = np.asarray(data_max, dtype=np.float64)
+        self.data_range_ = self.data_max_ - self.data_min_
+        self.n_features_in_ = self.data_min_.shape[0]
+
+        # Khoảng bằng 0 được thay bằng 1 giống sklearn
+        data_range = np.where(self.data_range_ == 0.0, 1.0, self.data_range_)
+        range_min, range_max = self.feature_range
+        self.scale_ = (range_max - range_min) / data_range
+        self.min_ = range_min - self.data_min_ * self.scale_
+        return self
+
+    def fit(self, X):
+        """Học data_min/data_max theo từng cột của X dạng (mẫu, đặc trưng)"""
+        X = np.asarray(X, dtype=np.float64)
+        return self._set_params(X.min(axis=0), X.max(axis=0))
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64) * self.scale_ + self.min_
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+    def inverse_transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.min_) / self.scale_
+
+    @classmethod
+    def from_sklearn(cls, scaler):
+        """Chuyển MinMaxScaler đã fit của sklearn sang LotteryScaler"""
+        return cls(scaler.feature_range)._set_params(scaler.data_min_, scaler.data_max_)
+
+    def to_dict(self):
+        return {
+            "format": SCALER_FORMAT,
+            "version": SCALER_VERSION,
+            "feature_range": list(self.feature_range),
+            "data_min": self.data_min_.tolist(),
+            "data_max": self.data_max_.tolist(),
+            "scale": self.scale_.tolist(),
+            "min": self.min_.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, params):
+        if params.get("format") != SCALER_FORMAT:
+            raise ValueError(f"Định dạng scaler không hỗ trợ: {params.get('format')}")
+        return cls(params["feature_range"])._set_params(params["data_min"], params["data_max"])
+
+    def save(self, path):
+        """Ghi tham số ra file JSON"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+def scaler_path_for(model_path):
+    """Đường dẫn file scaler (.json) đi kèm một file mô hình"""
+    base_path = model_path.replace('.keras', '').replace('.h5', '')
+    return f"{base_path}_scaler.json"
+
+def find_scaler_path(model_path):
+    """File scaler của mô hình: ưu tiên .json, nếu không có thì _scaler.npy cũ"""
+    json_path = scaler_path_for(model_path)
+    if os.path.exists(json_path):
+        return json_path
+    return json_path[:-len(".json")] + ".npy"
+
+def load_scaler(path):
+    """Đọc scaler từ file .json, hoặc file _scaler.npy cũ (pickle của sklearn)"""
+    if path.endswith(".npy"):
+        # Chỉ định dạng cũ mới cần pickle (và import sklearn khi giải tuần tự hóa)
+        return LotteryScaler.from_sklearn(np.load(path, allow_pickle=True).item())
+
+    with open(path, "r", encoding="utf-8") as f:
+        return LotteryScaler.from_dict(json.load(f))
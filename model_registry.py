@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sổ đăng ký mô hình (model-registry.json)
+
+Mỗi lần save_model ghi một mục gồm loại mô hình, đường dẫn scaler và
+metadata, hash dữ liệu, chỉ số validation và thời điểm tạo. Việc tìm
+"mô hình mới nhất của loại X" và ghép mô hình với scaler chỉ là tra cứu
+trong file này, không còn glob + sắp xếp theo mtime hay đoán loại từ tên file.
+"""
+
+import os
+import re
+import glob
+import json
+from datetime import datetime
+
+REGISTRY_FILE = "model-registry.json"
+REGISTRY_VERSION = 1
+
+# Tên file cũ: lottery_model_<loại>_<YYYYmmdd_HHMMSS>.keras
+_LEGACY_NAME = re.compile(r"lottery_model_(raw_numbers|sum|counts)_(\d{8}_\d{6})")
+
+# Các khóa đường dẫn trong một mục (lưu tương đối so với thư mục registry)
+_PATH_KEYS = ("model_path", "scaler_path", "metadata_path")
+
+def infer_model_type(model_path):
+    """Đoán loại mô hình từ tên file (chỉ dùng cho mô hình chưa đăng ký)"""
+    match = _LEGACY_NAME.search(os.path.basename(model_path))
+    return match.group(1) if match else "raw_numbers"
+
+class ModelRegistry:
+    """Danh sách các mô hình đã lưu, ghi nguyên tử vào một file JSON"""
+
+    def __init__(self, path=REGISTRY_FILE):
+        self.path = path
+        self.directory = os.path.dirname(os.path.abspath(path))
+
+    def _relative(self, path):
+        return os.path.relpath(os.path.abspath(path), self.directory) if path else None
+
+    def _resolve(self, entry):
+        """Bản sao của mục với đường dẫn đầy đủ"""
+        resolved = dict(entry)
+        for key in _PATH_KEYS:
+            if resolved.get(key):
+                resolved[key] = os.path.join(self.directory, resolved[key])
+        return resolved
+
+    def _load(self):
+        """Đọc manifest; lần đầu (chưa có file) sẽ đăng ký các mô hình cũ có sẵn"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == REGISTRY_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+
+        manifest = {"version": REGISTRY_VERSION, "models": self._discover()}
+        if manifest["models"]:
+            self._save(manifest)
+        return manifest
+
+    def _save(self, manifest):
+        """Ghi ra file tạm rồi thay thế nguyên tử"""
+        manifest["models"].sort(key=lambda entry: entry.get("created_at") or "")
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _discover(self):
+        """Tạo mục cho các file mô hình cũ (đoán loại và scaler theo tên file)"""
+        entries = []
+        model_files = (glob.glob(os.path.join(self.directory, "lottery_model_*.keras")) +
+                       glob.glob(os.path.join(self.directory, "lottery_model_*.h5")))
+        for model_path in model_files:
+            base_path = model_path.replace('.keras', '').replace('.h5', '')
+            scaler_path = f"{base_path}_scaler.json"
+            if not os.path.exists(scaler_path):
+                scaler_path = f"{base_path}_scaler.npy"
+            metadata_path = f"{base_path}_meta.json"
+
+            metadata = {}
+            if os.path.exists(metadata_path):
+                try:
+                    with open(metadata_path, "r", encoding="utf-8") as f:
+                        metadata = json.load(f)
+                except (OSError, ValueError):
+                    metadata = {}
+
+            # Ưu tiên thời điểm ghi trong metadata/tên file thay vì mtime
+            created_at = metadata.get("trained_at")
+            match = _LEGACY_NAME.search(os.path.basename(model_path))
+            if created_at is None and match:
+                created_at = datetime.strptime(match.group(2), "%Y%m%d_%H%M%S").isoformat()
+            if created_at is None:
+                created_at = datetime.fromtimestamp(os.path.getmtime(model_path)).isoformat(timespec="seconds")
+
+            entries.append(self._make_entry(
+                model_path, infer_model_type(model_path),
+                scaler_path if os.path.exists(scaler_path) else None,
+                metadata_path if os.path.exists(metadata_path) else None,
+                metadata, created_at
+            ))
+        return entries
+
+    def _make_entry(self, model_path, model_type, scaler_path, metadata_path, metadata, created_at):
+        return {
+            "model_path": self._relative(model_path),
+            "model_type": model_type,
+            "scaler_path": self._relative(scaler_path),
+            "metadata_path": self._relative(metadata_path),
+            "dataset_hash": metadata.get("dataset_hash"),
+            "cache_key": metadata.get("cache_key"),
+            "val_loss": metadata.get("val_loss"),
+            "val_accuracy": metadata.get("val_accuracy"),
+            "created_at": created_at,
+        }
+
+    def register(self, model_path, model_type, scaler_path=None, metadata_path=None, metadata=None):
+        """Thêm (hoặc thay thế) mục cho một file mô hình vừa lưu"""
+        metadata = metadata or {}
+        created_at = metadata.get("trained_at") or datetime.now().isoformat(timespec="seconds")
+        entry = self._make_entry(model_path, model_type, scaler_path, metadata_path, metadata, created_at)
+
+        manifest = self._load()
+        manifest["models"] = [e for e in manifest["models"] if e["model_path"] != entry["model_path"]]
+        manifest["models"].append(entry)
+        self._save(manifest)
+        return self._resolve(entry)
+
+    def entries(self, model_type=None):
+        """Các mục (đường dẫn đầy đủ), mới nhất trước"""
+        models = self._load()["models"]
+        if model_type is not None:
+            models = [e for e in models if e["model_type"] == model_type]
+        return [self._resolve(e) for e in reversed(models)]
+
+    def get(self, model_path):
+        """Mục của một file mô hình (None nếu chưa đăng ký)"""
+        relative = self._relative(model_path)
+        for entry in self._load()["models"]:
+            if entry["model_path"] == relative:
+                return self._resolve(entry)
+        return None
+
+    def find(self, model_type=None, **fields):
+        """Các mục còn file mô hình và khớp mọi trường cho trước, mới nhất trước"""
+        return [e for e in self.entries(model_type)
+                if os.path.exists(e["model_path"])
+                and all(e.get(key) == value for key, value in fields.items())]
+
+    def latest(self, model_type=None):
+        """Mục mới nhất (còn file mô hình) của một loại, None nếu chưa có"""
+        matches = self.find(model_type)
+        return matches[0] if matches else None
+
+    def remove(self, model_path, delete_files=True):
+        """Bỏ một mục khỏi registry, xóa luôn các file đi kèm nếu cần
+
+        Trả về danh sách file đã xóa.
+        """
+        entry = self.get(model_path)
+        manifest = self._load()
+        relative = self._relative(model_path)
+        manifest["models"] = [e for e in manifest["models"] if e["model_path"] != relative]
+        self._save(manifest)
+
+        deleted = []
+        if delete_files and entry is not None:
+            for key in _PATH_KEYS:
+                path = entry.get(key)
+                if path and os.path.exists(path):
+                    os.remove(path)
+                    deleted.append(path)
+        return deleted
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chạy toàn bộ quy trình hằng ngày trong một tiến trình: fetch -> train -> predict -> readme
+
+Dữ liệu đã đọc, mô hình vừa huấn luyện và scaler được truyền trực tiếp
+giữa các bước trong bộ nhớ, nên TensorFlow chỉ import một lần và mô hình
+không phải tải lại từ đĩa. Mỗi bước lưu dấu vân tay (fingerprint) của đầu
+vào vào pipeline-state.json; chạy lại với đầu vào không đổi sẽ bỏ qua bước đó.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from draw_store import load_numbers, content_hash
+from instrumentation import span
+from training_config import training_settings
+
+STATE_FILE = "pipeline-state.json"
+DATA_FILE = "data-dacbiet.txt"
+LAST_DATA_FILE = "last-data-dacbiet.txt"
+SEQUENCE_LENGTH = 10
+
+# Các file đầu vào của update_readme.py
+README_INPUTS = ("data-predict.json", "results.json", "results-giai6.json")
+
+def fingerprint(*parts):
+    """Dấu vân tay của các đầu vào một bước (sha256 của JSON)"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def file_fingerprint(path):
+    """sha256 nội dung file (None nếu không tồn tại)"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+class PipelineState:
+    """Fingerprint của lần chạy thành công gần nhất cho từng bước"""
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.stages = json.load(f).get("stages", {})
+        except (OSError, ValueError):
+            self.stages = {}
+
+    def is_fresh(self, stage, stage_fingerprint):
+        return self.stages.get(stage, {}).get("fingerprint") == stage_fingerprint
+
+    def record(self, stage, stage_fingerprint, seconds, **outputs):
+        """Ghi nhận bước đã chạy xong (ghi file tạm rồi thay thế nguyên tử)
+
+        outputs: thông tin thêm của bước (ví dụ file mô hình của bước train)
+        để các lần chạy sau bỏ qua bước đó vẫn biết kết quả của nó.
+        """
+        self.stages[stage] = {
+            "fingerprint": stage_fingerprint,
+            "completed_at": datetime.now().isoformat(timespec="seconds"),
+            "seconds": round(seconds, 3),
+            **outputs,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"stages": self.stages}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+def _run_stage(state, stage, stage_fingerprint, func, force=False, outputs=None):
+    """Chạy một bước nếu đầu vào thay đổi; trả về (đã chạy, kết quả)
+
+    outputs(result) trả về dict thông tin được lưu kèm fingerprint.
+    """
+    print(f"\n{'#'*60}")
+    if not force and state.is_fresh(stage, stage_fingerprint):
+        print(f"⏭️  [{stage}] Đầu vào không đổi, bỏ qua")
+        return False, None
+
+    print(f"▶️  [{stage}] Đang chạy...")
+    start = time.perf_counter()
+    with span(f"pipeline.{stage}"):
+        result = func()
+    seconds = time.perf_counter() - start
+
+    # Bước không có kết quả (ví dụ fetch chưa lấy được số) sẽ chạy lại lần sau
+    if result is not None:
+        state.record(stage, stage_fingerprint, seconds, **(outputs(result) if outputs else {}))
+    print(f"⏱️  [{stage}] {seconds:.2f} s")
+    return True, result
+
+def run_pipeline(force=False, use_gumbel=False, seed=None, state_path=STATE_FILE):
+    """Chạy fetch -> train -> predict -> readme, trả về dict các artifact"""
+    state = PipelineState(state_path)
+    artifacts = {}
+
+    # 1. Fetch: đầu vào là ngày (giờ Việt Nam) và nội dung last-data-dacbiet.txt
+    today = datetime.now(timezone(timedelta(hours=7))).strftime("%Y-%m-%d")
+    def fetch_stage():
+        import fetch
+        return fetch.main()
+    _run_stage(state, "fetch", fingerprint(today, file_fingerprint(LAST_DATA_FILE)), fetch_stage, force)
+
+    # Đọc dữ liệu một lần, dùng chung cho các bước sau
+    with span("load_data", data_file=DATA_FILE):
+        numbers = load_numbers(DATA_FILE)
+    artifacts["numbers"] = numbers
+    data_hash = content_hash(numbers)
+
+    # 2. Train: đầu vào là nội dung dãy số và cấu hình huấn luyện (kể cả LOTTERY_*)
+    def train_stage():
+        import lottery_prediction_model
+        trained = lottery_prediction_model.main(numbers=numbers)
+        # main() bắt lỗi bên trong và trả về dict rỗng: coi là thất bại để lần sau chạy lại
+        return trained if trained.get("raw_numbers") else None
+    _, trained = _run_stage(state, "train", fingerprint(data_hash, training_settings()), train_stage, force,
+                            outputs=lambda result: {"model_path": result["raw_numbers"]["model_path"]})
+    raw_numbers = (trained or {}).get("raw_numbers") or {}
+
+    # Mô hình dùng để dự đoán: mô hình của bước train (vừa huấn luyện, dùng lại từ
+    # cache hoặc ghi trong pipeline-state.json); mô hình mới nhất nếu không còn file
+    from model_registry import ModelRegistry
+    registry = ModelRegistry()
+    model_path = raw_numbers.get("model_path") or state.stages.get("train", {}).get("model_path")
+    entry = registry.get(model_path) if model_path else None
+    if entry is None or not os.path.exists(entry["model_path"]):
+        entry = registry.latest("raw_numbers")
+        raw_numbers = {}
+    model_path = entry["model_path"] if entry else None
+    artifacts["model_path"] = model_path
+
+    # 3. Predict: đầu vào là dữ liệu, mô hình, chế độ và ngày dự đoán
+    prediction_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+    def predict_stage():
+        import predict_255_unique_from_model
+        from lottery_inference import LotterySession
+        if raw_numbers.get("model") is not None:
+            # Dùng lại mô hình và scaler còn trong bộ nhớ, không tải lại từ đĩa
+            session = LotterySession(raw_numbers["model"], raw_numbers["scaler"])
+        elif entry is not None:
+            session = LotterySession.load(entry["model_path"], entry["scaler_path"])
+        else:
+            print("❌ Không tìm thấy mô hình raw_numbers!")
+            return None
+        recent_data = [int(n) for n in numbers[-SEQUENCE_LENGTH:]]
+        return predict_255_unique_from_model.main(use_gumbel=use_gumbel, session=session,
+                                                  recent_data=recent_data, seed=seed,
+                                                  model_path=model_path)
+    predict_fingerprint = fingerprint(data_hash, os.path.basename(model_path or ""),
+                                      file_fingerprint(model_path) if model_path else None,
+                                      use_gumbel, seed, prediction_date)
+    _, artifacts["predictions"] = _run_stage(state, "predict", predict_fingerprint, predict_stage, force)
+
+    # 4. Readme: đầu vào là các file JSON mà update_readme.py đọc
+    def readme_stage():
+        import update_readme
+        # README không cập nhật được: không ghi nhận để lần sau chạy lại
+        return True if update_readme.main() else None
+    readme_fingerprint = fingerprint(*(file_fingerprint(path) for path in README_INPUTS))
+    _run_stage(state, "readme", readme_fingerprint, readme_stage, force)
+
+    print(f"\n{'='*60}")
+    print("🎯 HOÀN THÀNH PIPELINE!")
+    print(f"{'='*60}")
+    return artifacts
+
+def main(force=False, use_gumbel=False, seed=None):
+    """Hàm chính"""
+    print("=== PIPELINE DỰ ĐOÁN 3 CÀNG (MỘT TIẾN TRÌNH) ===\n")
+    run_pipeline(force=force, use_gumbel=use_gumbel, seed=seed)
+
+if __name__ == "__main__":
+    from prediction_cache import parse_seed
+    main(force="--force" in sys.argv, use_gumbel="--gumbel" in sys.argv, seed=parse_seed(sys.argv))
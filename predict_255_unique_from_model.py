@@ -4,115 +4,128 @@
 Script dự đoán 255 số khác nhau từ mô hình raw_numbers
 """
 
-import numpy as np # type: ignore
-import tensorflow as tf # type: ignore
-from sklearn.preprocessing import MinMaxScaler # type: ignore
 import os
-import glob
-import random
+import sys
 import json
 from datetime import datetime, timedelta
 
+from draw_store import tail_numbers
+from lottery_inference import LotterySession
+from model_registry import ModelRegistry
+from instrumentation import span
+from prediction_cache import get_cache, model_hash, default_seed, prediction_key, parse_seed
+
 def load_recent_data(data_file="data-dacbiet.txt", num_recent=10):
     """Đọc dữ liệu gần nhất từ file"""
     if not os.path.exists(data_file):
         print(f"Không tìm thấy file dữ liệu: {data_file}")
         return []
     
-    with open(data_file, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    # Lọc và chuyển đổi dữ liệu
-    numbers = []
-    for line in lines:
-        line = line.strip()
-        if line.isdigit() and len(line) == 3:
-            numbers.append(int(line))
-    
-    # Trả về số gần nhất
-    return numbers[-num_recent:]
+    # Chỉ đọc ngược phần cuối file, không phụ thuộc độ dài lịch sử
+    return tail_numbers(data_file, num_recent)
 
-def predict_255_unique_numbers(model_path, scaler_path, recent_data):
-    """Dự đoán 255 số khác nhau từ mô hình raw_numbers"""
+def predict_255_unique_numbers(model_path, scaler_path, recent_data, rng=None):
+    """Dự đoán 255 số khác nhau từ mô hình raw_numbers
+    
+    rng: numpy.random.Generator (hoặc seed) của lần dự đoán này.
+    """
     print(f"\n🔢 DỰ ĐOÁN TỪ MÔ HÌNH RAW_NUMBERS:")
     print(f"Model: {os.path.basename(model_path)}")
     
     try:
-        # Load model và scaler
-        model = tf.keras.models.load_model(model_path)
-        scaler = np.load(scaler_path, allow_pickle=True).item()
-        
-        # Chuẩn hóa dữ liệu đầu vào
-        numbers_normalized = scaler.transform(np.array(recent_data).reshape(-1, 1)).flatten()
-        
-        # Dự đoán với randomness cao để tăng đa dạng
-        predictions = []
-        used_numbers = set()  # Để theo dõi số đã sử dụng
-        current_sequence = numbers_normalized[-10:].reshape(1, 10, 1)
+        # Phiên được cache: mô hình và scaler chỉ tải một lần cho nhiều lần gọi
+        session = LotterySession.load(model_path, scaler_path)
         
         print("🔄 Đang thực hiện dự đoán 255 số khác nhau...")
         
-        attempts = 0
-        max_attempts = 1000  # Giới hạn số lần thử để tránh vòng lặp vô hạn
+        # Temperature cao (3.0) và top-10 để tăng đa dạng
+        predictions = session.sample(255, chains=1, seed=rng, recent_numbers=recent_data,
+                                     temperature=3.0, top_k=10, unique=True, masked=True)[0]
         
-        while len(predictions) < 255 and attempts < max_attempts:
-            attempts += 1
-            
-            if attempts % 100 == 0:
-                print(f"  Đã thử {attempts} lần, đã dự đoán {len(predictions)}/255 số...")
-            
-            pred = model.predict(current_sequence, verbose=0)
-            
-            # Sử dụng temperature scaling cao để tăng randomness
-            temperature = 3.0  # Tăng từ 1.5 lên 3.0
-            pred_scaled = pred[0] / temperature
-            pred_probs = np.exp(pred_scaled) / np.sum(np.exp(pred_scaled))
-            
-            # Lấy top 10 predictions thay vì top 5 để tăng đa dạng
-            top_10_indices = np.argsort(pred_probs)[-10:][::-1]
-            top_10_probs = pred_probs[top_10_indices]
-            
-            # Chọn ngẫu nhiên từ top 10 với xác suất tương ứng
-            chosen_idx = np.random.choice(top_10_indices, p=top_10_probs/np.sum(top_10_probs))
-            pred_normalized = chosen_idx / 999.0
-            
-            # Chuyển về số nguyên
-            pred_original = int(scaler.inverse_transform([[pred_normalized]])[0][0])
-            
-            # Chỉ thêm nếu số chưa được sử dụng
-            if pred_original not in used_numbers:
-                predictions.append(pred_original)
-                used_numbers.add(pred_original)
-                
-                # Cập nhật chuỗi
-                current_sequence = np.roll(current_sequence, -1, axis=1)
-                current_sequence[0, -1, 0] = pred_normalized
+        print(f"✅ Dự đoán thành công: {len(predictions)} số")
+        print(f"🧠 Số lấy từ mô hình: {session.last_model_draws[0]}/{len(predictions)}")
+        _report_diversity(predictions)
+        
+        return predictions
             
-            # Nếu đã thử quá nhiều lần mà không đủ 255 số, thêm số ngẫu nhiên
-            if attempts > 500 and len(predictions) < 255:
-                remaining_numbers = set(range(1000)) - used_numbers
-                if remaining_numbers:
-                    random_number = random.choice(list(remaining_numbers))
-                    predictions.append(random_number)
-                    used_numbers.add(random_number)
+    except Exception as e:
+        print(f"❌ Lỗi: {str(e)}")
+        return []
+
+def _report_diversity(predictions, num_numbers=255):
+    """In thông tin về tính đa dạng của một chuỗi dự đoán"""
+    unique_predictions = len(set(predictions))
+    print(f"📊 Số dự đoán khác nhau: {unique_predictions}/{num_numbers}")
+    
+    if unique_predictions == num_numbers:
+        print(f"🎉 Hoàn hảo! Tất cả {num_numbers} số đều khác nhau!")
+    elif unique_predictions >= num_numbers - 5:
+        print("👍 Tuyệt vời! Hầu hết số đều khác nhau!")
+    elif unique_predictions >= int(num_numbers * 0.8):
+        print("👍 Tốt! Mô hình đã đa dạng hơn!")
+    else:
+        print("⚠️  Mô hình vẫn còn lặp lại nhiều")
+
+def predict_unique_numbers_batched(session, recent_data, num_chains=4, num_numbers=255,
+                                   temperature=3.0, top_k=10, seed=None, masked=True, digitwise=False):
+    """Dự đoán nhiều chuỗi 255 số khác nhau cùng lúc
+
+    Tất cả các chuỗi (chain) được ghép thành một batch và tiến cùng nhau:
+    mỗi bước chỉ gọi mô hình đúng một lần qua hàm đã biên dịch của phiên.
+    Với masked=True, số đã dùng bị loại khỏi phân phối trước khi chọn nên
+    đúng num_numbers bước cho ra num_numbers số khác nhau từ mô hình.
+    Với digitwise=True (mô hình có đầu ra theo chữ số), mỗi số được lấy lần
+    lượt từng chữ số và top_k là số chữ số được xét ở mỗi vị trí.
+    Trả về danh sách num_chains danh sách số (cùng cấu trúc data_1..data_N).
+    """
+    print(f"\n🔢 DỰ ĐOÁN THEO BATCH TỪ MÔ HÌNH RAW_NUMBERS:")
+    print(f"Số chuỗi song song: {num_chains}")
+    print(f"🔄 Đang thực hiện dự đoán {num_chains} x {num_numbers} số khác nhau...")
+    
+    try:
+        with span("sampling_round", mode="batched", chains=num_chains, numbers=num_numbers) as round_span:
+            predictions = session.sample(num_numbers, chains=num_chains, seed=seed,
+                                         recent_numbers=recent_data,
+                                         temperature=temperature, top_k=top_k,
+                                         unique=True, masked=masked, digitwise=digitwise)
+            if round_span is not None:
+                round_span.fields["model_calls"] = session.last_steps
         
-        print(f"✅ Dự đoán thành công: {len(predictions)} số")
+        print(f"✅ Hoàn thành sau {session.last_steps} lần gọi mô hình (batch {num_chains} chuỗi)")
+        for chain, chain_predictions in enumerate(predictions, 1):
+            print(f"\n📦 Chuỗi {chain}: {len(chain_predictions)} số")
+            print(f"🧠 Số lấy từ mô hình: {session.last_model_draws[chain - 1]}/{len(chain_predictions)}")
+            _report_diversity(chain_predictions, num_numbers)
         
-        # Kiểm tra tính đa dạng
-        unique_predictions = len(set(predictions))
-        print(f"📊 Số dự đoán khác nhau: {unique_predictions}/255")
+        return predictions
+    
+    except Exception as e:
+        print(f"❌ Lỗi: {str(e)}")
+        return []
+  
+def predict_unique_numbers_gumbel(session, recent_data, num_chains=4, num_numbers=255,
+                                  temperature=3.0, seed=None):
+    """Dự đoán nhiều bộ 255 số khác nhau chỉ với một lần gọi mô hình
+
+    Không hồi quy: mô hình chạy một lần trên cửa sổ thật gần nhất, mỗi bộ
+    data_N được rút bằng Gumbel-top-k với một bộ nhiễu độc lập.
+    """
+    print(f"\n🔢 DỰ ĐOÁN GUMBEL-TOP-K TỪ MÔ HÌNH RAW_NUMBERS:")
+    print(f"🔄 Đang rút {num_chains} x {num_numbers} số khác nhau từ một lần gọi mô hình...")
+    
+    try:
+        with span("sampling_round", mode="gumbel", chains=num_chains, numbers=num_numbers):
+            predictions = session.sample_gumbel_top_k(num_numbers, chains=num_chains, seed=seed,
+                                                      recent_numbers=recent_data,
+                                                      temperature=temperature)
         
-        if unique_predictions == 255:
-            print("🎉 Hoàn hảo! Tất cả 255 số đều khác nhau!")
-        elif unique_predictions >= 250:
-            print("👍 Tuyệt vời! Hầu hết số đều khác nhau!")
-        elif unique_predictions >= 200:
-            print("👍 Tốt! Mô hình đã đa dạng hơn!")
-        else:
-            print("⚠️  Mô hình vẫn còn lặp lại nhiều")
+        print(f"✅ Hoàn thành sau {session.last_steps} lần gọi mô hình")
+        for chain, chain_predictions in enumerate(predictions, 1):
+            print(f"\n📦 Bộ {chain}: {len(chain_predictions)} số")
+            _report_diversity(chain_predictions, num_numbers)
         
         return predictions
-            
+    
     except Exception as e:
         print(f"❌ Lỗi: {str(e)}")
         return []
@@ -145,60 +158,116 @@ def save_to_json(numbers, filename):
     print(f"✅ Đã lưu thành công vào file JSON: {filename}")
     print(f"📅 Ngày tạo: {date_str}")
     
-def main():
-    """Hàm chính"""
+def main(use_gumbel=False, session=None, recent_data=None, seed=None, model_path=None, use_cache=True,
+         digitwise=False):
+    """Hàm chính (use_gumbel=True: chế độ Gumbel-top-k, một lần gọi mô hình)
+    
+    digitwise=True: lấy mẫu từng chữ số với mô hình có đầu ra theo chữ số
+    (LOTTERY_HEAD=digits/digits_chained); không áp dụng cho chế độ Gumbel.
+    
+    session/recent_data: phiên suy luận và dữ liệu gần nhất đã có sẵn trong
+    bộ nhớ (ví dụ do pipeline truyền vào); mặc định tải mô hình mới nhất từ
+    registry và đọc phần cuối file dữ liệu. model_path là file của mô hình
+    trong session (dùng cho khóa cache). seed mặc định lấy từ ngày dự đoán.
+    Trả về 4 bộ số (None nếu lỗi).
+    """
     print("=== DỰ ĐOÁN 255 SỐ TỪ MÔ HÌNH RAW_NUMBERS ===\n")
     
+    # Cấu hình lấy mẫu (cũng là một phần của khóa cache)
+    NUM_CHAINS = 4
+    NUM_NUMBERS = 255
+    TEMPERATURE = 3.0
+    TOP_K = 10
+    DIGIT_TOP_K = 3  # Top-k theo từng chữ số (10 lớp) khi digitwise=True
+    if seed is None:
+        seed = default_seed((datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d"))
+    print(f"🎲 Seed: {seed}")
+    
     # Tải dữ liệu gần nhất
-    recent_data = load_recent_data()
-    if not recent_data:
+    if recent_data is None:
+        recent_data = load_recent_data()
+    if not len(recent_data):
         print("Không thể đọc dữ liệu gần nhất")
-        return
-    
-    print(f"📊 Dữ liệu gần nhất ({len(recent_data)} số): {recent_data}")
-    
-    # Tìm mô hình raw_numbers mới nhất
-    raw_models = glob.glob("lottery_model_raw_numbers_*.keras")
-    if not raw_models:
-        print("❌ Không tìm thấy mô hình raw_numbers!")
-        print("Vui lòng chạy script lottery_prediction_model.py trước")
-        return
-    
-    # Sắp xếp theo thời gian sửa đổi
-    raw_models.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-    latest_model = raw_models[0]
-    
-    print(f"\n🔍 Tìm thấy mô hình:")
-    print(f"  raw_numbers: {os.path.basename(latest_model)}")
-    
-    # Dự đoán 255 số khác nhau
-    scaler_path = latest_model.replace('.keras', '_scaler.npy')
-    if os.path.exists(scaler_path):
-        all_predictions = []  # mảng để chứa toàn bộ 4 lần dự đoán
-        for step in range(4):
-            print(f"\n🔄 Lần dự đoán {step+1}/4 ...")
-            predictions = predict_255_unique_numbers(latest_model, scaler_path, recent_data)
-            
-            if len(predictions) == 255:
-                # ✅ Lưu vào mảng tổng
-                all_predictions.append(predictions)
-                
-                print(f"\n{'='*60}")
-                print("🎯 HOÀN THÀNH!")
-                print("✅ 255 số khác nhau đã được dự đoán từ mô hình raw_numbers")
-                print("✅ Đã ghi tạm vào mảng all_predictions")
-                print(f"{'='*60}")
-            else:
-                print(f"\n❌ Không thể dự đoán đủ 255 số khác nhau")
-                
-        if len(all_predictions) == 4:
-            # Tạo 1 file
-            filename = "data-predict.json"
-            save_to_json(all_predictions, filename)
-        else:
-            print(f"⚠️ Chỉ có {len(all_predictions)} lần dự đoán, chưa đủ 4.")
+        return None
+    
+    print(f"📊 Dữ liệu gần nhất ({len(recent_data)} số): {list(recent_data)}")
+    
+    if session is None:
+        # Tìm mô hình raw_numbers mới nhất trong registry
+        entry = ModelRegistry().latest("raw_numbers")
+        if entry is None:
+            print("❌ Không tìm thấy mô hình raw_numbers!")
+            print("Vui lòng chạy script lottery_prediction_model.py trước")
+            return None
+        
+        model_path = entry["model_path"]
+        print(f"\n🔍 Tìm thấy mô hình:")
+        print(f"  raw_numbers: {os.path.basename(model_path)}")
+        
+        # Scaler đã được ghép sẵn trong registry
+        scaler_path = entry["scaler_path"]
+        if not scaler_path or not os.path.exists(scaler_path):
+            print(f"\n❌ Không tìm thấy scaler cho raw_numbers")
+            return None
+    else:
+        scaler_path = None
+    
+    # Cùng mô hình, cửa sổ, cấu hình và seed -> dùng lại kết quả đã lưu
+    cache_key = None
+    if use_cache and model_path is not None:
+        settings = {"mode": "gumbel" if use_gumbel else "batched", "temperature": TEMPERATURE,
+                    "chains": NUM_CHAINS, "numbers": NUM_NUMBERS, "seed": int(seed)}
+        if not use_gumbel and digitwise:
+            settings["digitwise"] = True
+            settings["digit_top_k"] = DIGIT_TOP_K
+        elif not use_gumbel:
+            settings["top_k"] = TOP_K
+        cache_key = prediction_key(model_hash(model_path), recent_data, **settings)
+    cached_predictions = get_cache().get(cache_key) if cache_key else None
+    
+    # Dự đoán cả 4 lần trong một batch (mỗi bước chỉ một lần gọi mô hình)
+    all_predictions = []  # mảng để chứa toàn bộ 4 lần dự đoán
+    if cached_predictions is not None:
+        print(f"\n⚡ Dùng lại dự đoán đã lưu trong cache (khóa {cache_key[:12]})")
+        batched_predictions = cached_predictions
     else:
-        print(f"\n❌ Không tìm thấy scaler cho raw_numbers")
+        if session is None:
+            session = LotterySession.load(model_path, scaler_path)
+        if use_gumbel:
+            # Chế độ không hồi quy: một lần gọi mô hình cho cả 4 bộ số
+            batched_predictions = predict_unique_numbers_gumbel(session, recent_data, num_chains=NUM_CHAINS,
+                                                                num_numbers=NUM_NUMBERS, temperature=TEMPERATURE,
+                                                                seed=seed)
+        else:
+            batched_predictions = predict_unique_numbers_batched(session, recent_data, num_chains=NUM_CHAINS,
+                                                                 num_numbers=NUM_NUMBERS, temperature=TEMPERATURE,
+                                                                 top_k=DIGIT_TOP_K if digitwise else TOP_K,
+                                                                 seed=seed, digitwise=digitwise)
+    
+    for step, predictions in enumerate(batched_predictions):
+        # Chỉ nhận bộ đủ 255 số và không có số trùng
+        if len(predictions) == 255 and len(set(predictions)) == 255:
+            # ✅ Lưu vào mảng tổng
+            all_predictions.append(predictions)
+        else:
+            print(f"\n❌ Lần dự đoán {step+1}/4: không thể dự đoán đủ 255 số khác nhau")
+    
+    if len(all_predictions) == 4:
+        print(f"\n{'='*60}")
+        print("🎯 HOÀN THÀNH!")
+        print("✅ 4 x 255 số khác nhau đã được dự đoán từ mô hình raw_numbers")
+        print(f"{'='*60}")
+        
+        if cache_key and cached_predictions is None:
+            get_cache().put(cache_key, all_predictions, model=os.path.basename(model_path), seed=int(seed))
+        
+        # Tạo 1 file
+        filename = "data-predict.json"
+        save_to_json(all_predictions, filename)
+        return all_predictions
+    
+    print(f"⚠️ Chỉ có {len(all_predictions)} lần dự đoán, chưa đủ 4.")
+    return None
 
 if __name__ == "__main__":
-    main()
+    main(use_gumbel="--gumbel" in sys.argv, seed=parse_seed(sys.argv), digitwise="--digitwise" in sys.argv)
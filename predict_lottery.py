@@ -5,227 +5,134 @@ Script dự đoán xổ số sử dụng mô hình LSTM đã huấn luyện
 """
 
 import numpy as np
-import tensorflow as tf
-from sklearn.preprocessing import MinMaxScaler
 import os
-import glob
+import sys
+from datetime import datetime, timedelta
+
+from draw_store import tail_numbers
+from model_registry import ModelRegistry, infer_model_type
+from lottery_inference import LotterySession
+from lottery_scaler import LotteryScaler, find_scaler_path
+from lottery_sampling import temperature_softmax, sample_top_k, normalize, index_to_value, chain_generators
+from prediction_cache import get_cache, model_hash, default_seed, prediction_key, parse_seed
 
 class LotteryPredictor:
     """Lớp dự đoán xổ số sử dụng mô hình đã huấn luyện"""
     
-    def __init__(self, model_path, scaler_path=None):
-        self.model = tf.keras.models.load_model(model_path)
-        self.scaler = None
+    def __init__(self, model_path, scaler_path=None, stateful=False, model_type=None):
+        # stateful=True: giữ trạng thái LSTM giữa các bước thay vì chạy lại cả cửa sổ
+        self.stateful = stateful
+        
+        # Lấy loại mô hình và scaler đã ghép sẵn trong registry
+        entry = ModelRegistry().get(model_path)
+        if entry is not None:
+            scaler_path = scaler_path or entry["scaler_path"]
+            model_type = model_type or entry["model_type"]
         
-        # Tự động tìm scaler tương ứng
+        # Mô hình chưa đăng ký: đoán scaler tương ứng theo tên file
         if scaler_path is None:
-            base_path = model_path.replace('.keras', '').replace('.h5', '')
-            scaler_path = f"{base_path}_scaler.npy"
+            scaler_path = find_scaler_path(model_path)
+        
+        # Phiên suy luận dùng chung: mô hình và scaler chỉ tải một lần
+        self.session = LotterySession.load(model_path, scaler_path)
+        self.model = self.session.model
+        self.scaler = self.session.scaler
         
-        if os.path.exists(scaler_path):
-            self.scaler = np.load(scaler_path, allow_pickle=True).item()
+        if self.scaler is not None:
             print(f"Đã tải scaler từ: {scaler_path}")
         else:
             print("Không tìm thấy scaler, sẽ tạo mới khi cần")
         
-        # Xác định loại mô hình từ tên file
-        if "raw_numbers" in model_path:
-            self.model_type = "raw_numbers"
-        elif "sum" in model_path:
-            self.model_type = "sum"
-        elif "counts" in model_path:
-            self.model_type = "counts"
-        else:
-            self.model_type = "raw_numbers"  # Mặc định
+        # Mô hình chưa đăng ký: đoán loại từ tên file
+        self.model_type = model_type or infer_model_type(model_path)
+        self.model_path = model_path
         
         print(f"Đã tải mô hình: {self.model_type}")
     
-    def predict_next_numbers(self, recent_numbers, num_predictions=255):
-        """Dự đoán số tiếp theo"""
+    def predict_next_numbers(self, recent_numbers, num_predictions=255, rng=None):
+        """Dự đoán số tiếp theo
+        
+        rng: numpy.random.Generator của chuỗi này (hoặc seed); cùng luồng cho cùng kết quả.
+        """
+        rng = np.random.default_rng(rng)
         if self.model_type == "raw_numbers":
-            return self._predict_raw_numbers(recent_numbers, num_predictions)
+            return self._predict_raw_numbers(recent_numbers, num_predictions, rng)
         else:
             raise ValueError("Chỉ hỗ trợ dự đoán raw_numbers")
     
-    def _predict_raw_numbers(self, recent_numbers, num_predictions):
+    def _predict_raw_numbers(self, recent_numbers, num_predictions, rng):
         """Dự đoán số nguyên với randomness"""
         if self.scaler is None:
             # Tạo scaler mới nếu không có
-            self.scaler = MinMaxScaler()
+            self.scaler = LotteryScaler()
             self.scaler.fit(np.array(recent_numbers).reshape(-1, 1))
         
-        # Chuẩn hóa dữ liệu đầu vào
-        numbers_normalized = self.scaler.transform(np.array(recent_numbers).reshape(-1, 1)).flatten()
-        
-        # Dự đoán với randomness
-        predictions = []
-        current_sequence = numbers_normalized[-10:].reshape(1, 10, 1)
-        
-        for _ in range(num_predictions):
-            pred = self.model.predict(current_sequence, verbose=0)
-            
-            # Sử dụng temperature scaling để tăng randomness
-            temperature = 1.5
-            pred_scaled = pred[0] / temperature
-            pred_probs = np.exp(pred_scaled) / np.sum(np.exp(pred_scaled))
-            
-            # Lấy top 5 predictions và chọn ngẫu nhiên
-            top_5_indices = np.argsort(pred_probs)[-5:][::-1]
-            top_5_probs = pred_probs[top_5_indices]
-            
-            # Chọn ngẫu nhiên từ top 5 với xác suất tương ứng
-            chosen_idx = np.random.choice(top_5_indices, p=top_5_probs/np.sum(top_5_probs))
-            pred_normalized = chosen_idx / 999.0
-            
-            # Chuyển về số nguyên
-            pred_original = int(self.scaler.inverse_transform([[pred_normalized]])[0][0])
-            predictions.append(pred_original)
-            
-            # Cập nhật chuỗi
-            current_sequence = np.roll(current_sequence, -1, axis=1)
-            current_sequence[0, -1, 0] = pred_normalized
+        if self.stateful:
+            return self._predict_raw_numbers_stateful(recent_numbers, num_predictions, rng)
         
-        return predictions
+        # Lấy mẫu qua phiên dùng chung (hàm predict đã biên dịch); scaler truyền
+        # theo lần gọi để không ghi đè scaler của phiên được cache
+        return self.session.sample(num_predictions, chains=1, seed=rng, recent_numbers=recent_numbers,
+                                   temperature=1.5, top_k=5, scaler=self.scaler)[0]
     
-    def _predict_sum(self, recent_numbers, num_predictions):
-        """Dự đoán tổng các chữ số với randomness"""
-        if self.scaler is None:
-            # Tạo scaler mới nếu không có
-            self.scaler = MinMaxScaler()
-            sums = [sum(int(digit) for digit in str(num).zfill(3)) for num in recent_numbers]
-            self.scaler.fit(np.array(sums).reshape(-1, 1))
-        
-        # Tính tổng các chữ số
-        sums = []
-        for num in recent_numbers:
-            digit_sum = sum(int(digit) for digit in str(num).zfill(3))
-            sums.append(digit_sum)
+    def _predict_raw_numbers_stateful(self, recent_numbers, num_predictions, rng):
+        """Dự đoán số nguyên theo từng bước, giữ trạng thái LSTM giữa các lần rút"""
+        step_model = self.session.step_model
         
-        # Chuẩn hóa dữ liệu
-        sums_normalized = self.scaler.transform(np.array(sums).reshape(-1, 1)).flatten()
+        # Chuẩn hóa và mồi trạng thái một lần trên cửa sổ gần nhất
+        sequence_length = self.session.sequence_length
+        numbers_normalized = normalize(recent_numbers, self.scaler)
+        pred = step_model.prime(numbers_normalized[-sequence_length:].reshape(1, -1, 1))
         
-        # Dự đoán với randomness
         predictions = []
-        current_sequence = sums_normalized[-10:].reshape(1, 10, 1)
-        
         for _ in range(num_predictions):
-            pred = self.model.predict(current_sequence, verbose=0)
-            
-            # Sử dụng temperature scaling để tăng randomness
-            temperature = 1.5
-            pred_scaled = pred[0] / temperature
-            pred_probs = np.exp(pred_scaled) / np.sum(np.exp(pred_scaled))
-            
-            # Lấy top 5 predictions và chọn ngẫu nhiên
-            top_5_indices = np.argsort(pred_probs)[-5:][::-1]
-            top_5_probs = pred_probs[top_5_indices]
-            
-            # Chọn ngẫu nhiên từ top 5 với xác suất tương ứng
-            chosen_idx = np.random.choice(top_5_indices, p=top_5_probs/np.sum(top_5_probs))
-            pred_normalized = chosen_idx / 27.0
+            # Temperature scaling (1.5) và chọn ngẫu nhiên trong top 5
+            pred_probs = temperature_softmax(pred, 1.5)
+            chosen_idx = sample_top_k(pred_probs, 5, rng)[0]
+            pred_normalized = chosen_idx / 999.0
             
-            # Chuyển về tổng gốc
-            pred_original = int(self.scaler.inverse_transform([[pred_normalized]])[0][0])
+            pred_original = int(index_to_value(chosen_idx, self.scaler, 999.0))
             predictions.append(pred_original)
             
-            # Cập nhật chuỗi
-            current_sequence = np.roll(current_sequence, -1, axis=1)
-            current_sequence[0, -1, 0] = pred_normalized
+            # Chỉ đưa giá trị mới vào, trạng thái LSTM được giữ lại
+            pred = step_model.step([pred_normalized])
         
         return predictions
     
-    def _predict_counts(self, recent_numbers, num_predictions):
-        """Dự đoán chữ số xuất hiện nhiều nhất tiếp theo"""
-        if self.scaler is None:
-            # Tạo scaler mới nếu không có
-            self.scaler = MinMaxScaler()
-            digit_counts = []
-            for num in recent_numbers:
-                digits = [int(d) for d in str(num).zfill(3)]
-                counts = [digits.count(i) for i in range(10)]
-                digit_counts.append(counts)
-            self.scaler.fit(digit_counts)
-        
-        # Đếm số lần xuất hiện của từng chữ số
-        digit_counts = []
-        for num in recent_numbers:
-            digits = [int(d) for d in str(num).zfill(3)]
-            counts = [digits.count(i) for i in range(10)]
-            digit_counts.append(counts)
-        
-        # Chuẩn hóa dữ liệu
-        digit_counts_normalized = self.scaler.transform(digit_counts)
-        
-        # Dự đoán với randomness
-        predictions = []
-        current_sequence = digit_counts_normalized[-10:].reshape(1, 10, 10)
-        
-        for i in range(num_predictions):
-            pred = self.model.predict(current_sequence, verbose=0)
-            
-            # Sử dụng temperature scaling để tăng randomness
-            temperature = 2.0
-            pred_scaled = pred[0] / temperature
-            pred_probs = np.exp(pred_scaled) / np.sum(np.exp(pred_scaled))
-            
-            # Lấy top 3 predictions và chọn ngẫu nhiên
-            top_3_indices = np.argsort(pred_probs)[-3:][::-1]
-            top_3_probs = pred_probs[top_3_indices]
-            
-            # Chọn ngẫu nhiên từ top 3 với xác suất tương ứng
-            chosen_idx = np.random.choice(top_3_indices, p=top_3_probs/np.sum(top_3_probs))
-            predictions.append(chosen_idx)
-            
-            # Cập nhật chuỗi (sử dụng one-hot encoding)
-            one_hot = np.zeros(10)
-            one_hot[chosen_idx] = 1
-            current_sequence = np.roll(current_sequence, -1, axis=1)
-            current_sequence[0, -1, :] = one_hot
-        
-        return predictions
-
 def load_recent_data(data_file="data-dacbiet.txt", num_recent=10):
     """Đọc dữ liệu gần nhất từ file"""
     if not os.path.exists(data_file):
         print(f"Không tìm thấy file dữ liệu: {data_file}")
         return []
     
-    with open(data_file, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    # Lọc và chuyển đổi dữ liệu
-    numbers = []
-    for line in lines:
-        line = line.strip()
-        if line.isdigit() and len(line) == 3:
-            numbers.append(int(line))
-    
-    # Trả về số gần nhất
-    return numbers[-num_recent:]
+    # Chỉ đọc ngược phần cuối file, không phụ thuộc độ dài lịch sử
+    return tail_numbers(data_file, num_recent)
 
 def find_latest_model():
-    """Tìm mô hình mới nhất"""
-    # Tìm cả file .keras và .h5 để tương thích ngược
-    model_files = glob.glob("lottery_model_*.keras") + glob.glob("lottery_model_*.h5")
-    if not model_files:
-        return None
-    
-    # Sắp xếp theo thời gian sửa đổi
-    model_files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-    return model_files[0]
+    """Tìm mô hình mới nhất (mục trong registry, None nếu chưa có)"""
+    return ModelRegistry().latest()
 
-def main():
-    """Hàm chính"""
+def main(seed=None, stateful=False):
+    """Hàm chính (seed mặc định lấy từ ngày dự đoán)
+    
+    stateful=True: giữ trạng thái LSTM qua 255 bước thay vì trượt cửa sổ
+    SEQUENCE_LENGTH như lúc huấn luyện (nhanh hơn, nhưng xác suất lệch dần
+    so với chế độ cửa sổ sau bước đầu tiên).
+    """
     print("=== DỰ ĐOÁN XỔ SỐ SỬ DỤNG MÔ HÌNH LSTM ===\n")
     
+    if seed is None:
+        seed = default_seed((datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d"))
+    
     # Tìm mô hình mới nhất
-    model_path = find_latest_model()
-    if not model_path:
+    entry = find_latest_model()
+    if not entry:
         print("Không tìm thấy mô hình đã huấn luyện!")
         print("Vui lòng chạy script lottery_prediction_model.py trước")
         return
     
-    print(f"Sử dụng mô hình: {model_path}")
+    model_path = entry["model_path"]
+    print(f"Sử dụng mô hình: {os.path.basename(model_path)}")
     
     # Tải dữ liệu gần nhất
     recent_data = load_recent_data()
@@ -237,13 +144,25 @@ def main():
     
     # Tạo predictor
     try:
-        predictor = LotteryPredictor(model_path)
+        predictor = LotteryPredictor(model_path, entry["scaler_path"], stateful=stateful,
+                                     model_type=entry["model_type"])
         
         # Dự đoán
         print(f"\nDự đoán sử dụng mô hình {predictor.model_type}:")
         
         if predictor.model_type == "raw_numbers":
-            predictions = predictor.predict_next_numbers(recent_data, 255)
+            # Cùng mô hình, cửa sổ và seed -> dùng lại kết quả đã lưu
+            mode = "sequence-stateful" if stateful else "sequence"
+            cache_key = prediction_key(model_hash(model_path), recent_data, mode=mode,
+                                       temperature=1.5, top_k=5, chains=1, numbers=255, seed=int(seed))
+            cached = get_cache().get(cache_key)
+            if cached is not None:
+                print(f"⚡ Dùng lại dự đoán đã lưu trong cache (khóa {cache_key[:12]})")
+                predictions = cached[0]
+            else:
+                # Luồng ngẫu nhiên riêng của chuỗi duy nhất, tách từ seed gốc
+                predictions = predictor.predict_next_numbers(recent_data, 255, rng=chain_generators(seed, 1)[0])
+                get_cache().put(cache_key, [predictions], model=os.path.basename(model_path), seed=int(seed))
             print(f"255 số dự đoán tiếp theo:")
             
             # Hiển thị chi tiết (20 số đầu và 20 số cuối)
@@ -265,4 +184,4 @@ def main():
         print(f"Lỗi khi dự đoán: {str(e)}")
 
 if __name__ == "__main__":
-    main()
+    main(seed=parse_seed(sys.argv), stateful="--stateful" in sys.argv)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache kết quả dự đoán hai tầng: LRU trong tiến trình + file trên đĩa
+
+Khóa là sha256 của (hash nội dung mô hình, cửa sổ dữ liệu gần nhất, chế độ,
+temperature, top-k, số chuỗi, số lượng số, seed). Cùng một yêu cầu (chạy lại
+workflow, sinh lại README, chạy tay) trả về ngay các bộ số đã lưu; mô hình
+hoặc cửa sổ thay đổi thì khóa đổi theo nên cache tự vô hiệu.
+
+Trên đĩa mỗi mục là một file JSON trong .prediction-cache/; khi tổng dung
+lượng vượt giới hạn, các mục lâu không dùng nhất (theo mtime, được cập nhật
+mỗi lần đọc trúng) bị xóa trước.
+"""
+
+import os
+import json
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+
+CACHE_DIR = ".prediction-cache"
+MAX_DISK_BYTES = 20 * 1024 * 1024
+MAX_MEMORY_ENTRIES = 32
+
+# Tăng khi cách lấy mẫu thay đổi (cùng seed cho ra số khác) để bỏ các mục cũ
+SAMPLER_VERSION = 5
+
+# Hash nội dung mô hình theo (đường dẫn, mtime, kích thước) để không đọc lại file
+_model_hashes = {}
+
+def model_hash(model_path):
+    """sha256 nội dung file mô hình, tính một lần cho mỗi phiên bản file"""
+    stat = os.stat(model_path)
+    key = (os.path.abspath(model_path), stat.st_mtime_ns, stat.st_size)
+    if key not in _model_hashes:
+        digest = hashlib.sha256()
+        with open(model_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _model_hashes[key] = digest.hexdigest()
+    return _model_hashes[key]
+
+def default_seed(prediction_date):
+    """Seed mặc định từ ngày dự đoán (YYYY-MM-DD -> YYYYMMDD): chạy lại trong ngày cho cùng kết quả"""
+    return int(prediction_date.replace("-", ""))
+
+def parse_seed(argv):
+    """Giá trị của --seed N trong dòng lệnh (None nếu không có)"""
+    if "--seed" in argv:
+        return int(argv[argv.index("--seed") + 1])
+    return None
+
+def prediction_key(model_digest, window, **settings):
+    """Khóa cache của một yêu cầu dự đoán"""
+    payload = json.dumps({
+        "sampler": SAMPLER_VERSION,
+        "model": model_digest,
+        "window": [int(n) for n in window],
+        "settings": settings,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class PredictionCache:
+    """Cache dự đoán: LRU trong bộ nhớ phía trước, thư mục JSON giới hạn dung lượng phía sau"""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_DISK_BYTES, max_entries=MAX_MEMORY_ENTRIES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _remember(self, key, predictions):
+        self._memory[key] = predictions
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Các bộ số đã lưu cho khóa (None nếu chưa có)"""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                predictions = json.load(f)["predictions"]
+            # Đánh dấu vừa dùng để không bị xóa trước
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        self._remember(key, predictions)
+        return predictions
+
+    def put(self, key, predictions, **info):
+        """Lưu các bộ số vào cả hai tầng (ghi file tạm rồi thay thế nguyên tử)"""
+        predictions = [[int(n) for n in chain] for chain in predictions]
+        self._remember(key, predictions)
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "info": info,
+                "predictions": predictions,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        """Xóa các file lâu không dùng nhất cho đến khi tổng dung lượng dưới giới hạn"""
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            self._memory.pop(os.path.basename(path)[:-len(".json")], None)
+
+    def clear(self):
+        """Xóa toàn bộ cache (cả bộ nhớ và đĩa)"""
+        self._memory.clear()
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.is_file():
+                    os.remove(entry.path)
+
+# Cache dùng chung trong tiến trình (LRU sống qua nhiều lần gọi main())
+_default_cache = None
+
+def get_cache():
+    """Cache dùng chung của tiến trình"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PredictionCache()
+    return _default_cache
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cấu hình huấn luyện dùng chung cho lottery_prediction_model.py và pipeline.py
+
+Không import TensorFlow, nên pipeline có thể đưa cấu hình vào fingerprint
+của bước train (đổi siêu tham số hoặc biến môi trường LOTTERY_* sẽ huấn
+luyện lại) mà không tốn thời gian tải mô hình khi bước đó được bỏ qua.
+"""
+
+import os
+
+def training_settings():
+    """Cấu hình huấn luyện hiện tại, kể cả các biến môi trường LOTTERY_*"""
+    return {
+        "sequence_length": 10,
+        "epochs": 100,
+        "batch_size": 32,
+        # Nhãn số nguyên thay vì one-hot (giảm ~1000 lần bộ nhớ nhãn)
+        "sparse_labels": True,
+        # Đầu ra raw_numbers: softmax (1000 lớp), digits hoặc digits_chained (3 softmax 10 lớp)
+        "head": os.environ.get("LOTTERY_HEAD", "softmax"),
+        # Huấn luyện tăng dần: tiếp tục từ mô hình trước thay vì huấn luyện lại từ đầu
+        "incremental": os.environ.get("LOTTERY_INCREMENTAL", "1") != "0",
+        "fine_tune_epochs": 3,
+        "replay_size": 512,          # Số cửa sổ cũ trộn lẫn khi huấn luyện tăng dần
+        "full_retrain_every": 7,     # Huấn luyện lại toàn bộ sau số lần tăng dần này
+        "drift_windows": 200,        # Số cửa sổ validation gần nhất dùng để phát hiện drift
+        "drift_tolerance": 0.10,     # Loss gần đây tệ hơn val_loss đã lưu quá 10% -> huấn luyện lại
+        "validation_fraction": 0.2,  # Tỉ lệ cửa sổ validation (chia cố định theo chỉ số cửa sổ)
+    }
@@ -9,6 +9,18 @@ import os
 import re
 from datetime import datetime, timedelta
 
+from instrumentation import span
+
+def prediction_numbers(record):
+    """255 số của một bản ghi dự đoán
+
+    predict_255_unique_from_model.py ghi các chuỗi dự đoán vào data_1..data_N,
+    README hiển thị chuỗi đầu tiên; bản ghi cũ dùng formatted_numbers.
+    """
+    if "formatted_numbers" in record:
+        return record["formatted_numbers"]
+    return record.get("data_1", [])
+
 def read_latest_predictions():
     """Đọc dự đoán mới nhất từ data-predict.json"""
     if not os.path.exists("data-predict.json"):
@@ -23,12 +35,12 @@ def read_latest_predictions():
         if "predictions" in data and data["predictions"]:
             latest_prediction = data["predictions"][-1]  # Lấy bản ghi cuối cùng
             date = latest_prediction.get("date", "")
-            numbers = latest_prediction.get("formatted_numbers", [])
+            numbers = prediction_numbers(latest_prediction)
             return date, numbers
         elif "date" in data:
             # Trường hợp file cũ chỉ có 1 bản ghi
             date = data.get("date", "")
-            numbers = data.get("formatted_numbers", [])
+            numbers = prediction_numbers(data)
             return date, numbers
         else:
             print("❌ Không tìm thấy dữ liệu dự đoán trong file")
@@ -225,6 +237,10 @@ def update_readme_section(date, numbers_str):
         with open("README.md", 'r', encoding='utf-8') as f:
             content = f.read()
         
+        if '## Dự đoán ngày' not in content:
+            print("❌ README.md không có phần '## Dự đoán ngày'")
+            return False
+        
         # Cập nhật phần dự đoán
         content = update_prediction_section(content, date, numbers_str)
         
@@ -428,7 +444,7 @@ def update_results_section(content):
     return '\n'.join(new_lines)
 
 def main():
-    """Hàm chính"""
+    """Hàm chính, trả về True nếu README.md đã được cập nhật"""
     print("=== CẬP NHẬT README.MD TỰ ĐỘNG ===\n")
     
     # Đọc dự đoán mới nhất
@@ -436,7 +452,7 @@ def main():
     
     if not date or not numbers:
         print("❌ Không thể đọc dữ liệu dự đoán")
-        return
+        return False
     
     print(f"📅 Ngày dự đoán: {date}")
     print(f"🔢 Số lượng: {len(numbers)}")
@@ -445,7 +461,7 @@ def main():
     numbers_str = format_numbers_for_readme(numbers)
     if not numbers_str:
         print("❌ Không thể format số")
-        return
+        return False
     
     # Chuyển đổi ngày từ YYYY-MM-DD sang DD/MM/YYYY
     try:
@@ -462,14 +478,13 @@ def main():
     print(f"🔍 10 số đầu: {','.join(numbers_list[:10])}")
     print(f"🔍 10 số cuối: {','.join(numbers_list[-10:])}")
     
-    # Hiển thị thông tin kết quả
+    # Hiển thị thông tin kết quả (tháng hiện tại dùng cả khi chưa có kết quả)
+    current_month = datetime.now().month
+    current_year = datetime.now().year
+    current_day = datetime.now().day
     results = read_results_from_json()
     if results:
         # Lọc kết quả của tháng hiện tại
-        current_month = datetime.now().month
-        current_year = datetime.now().year
-        current_day = datetime.now().day
-        
         monthly_results = []
         for result in results:
             try:
@@ -542,7 +557,9 @@ def main():
         print("\n⚠️  Chưa có dữ liệu kết quả giải 6")
     
     # Cập nhật README
-    if update_readme_section(formatted_date, numbers_str):
+    with span("update_readme", numbers=len(numbers)):
+        updated = update_readme_section(formatted_date, numbers_str)
+    if updated:
         print(f"\n{'='*60}")
         print("🎯 HOÀN THÀNH!")
         print(f"✅ Đã cập nhật README.md với dự đoán ngày {formatted_date}")
@@ -552,6 +569,7 @@ def main():
         print(f"{'='*60}")
     else:
         print("\n❌ Không thể cập nhật README.md")
+    return updated
 
 if __name__ == "__main__":
     main()